@@ -0,0 +1,59 @@
+from functools import partial
+from funciones.duplicados import eliminar_duplicados, ALGORITMO_POR_DEFECTO
+from funciones.ordenar import organizar_archivos_carpetas
+from funciones.conversiones import convertir_formatos_archivos
+from funciones.extraer import extraer_archivos_raiz
+from funciones.preprocesador import preprocesar_contenido
+from funciones.limpieza_final import limpiar_carpetas_temporales
+from funciones.inventario import Inventario
+from funciones.planificador import PlanMovimientos
+
+def ejecutar_modo_automatico(ruta, log_func, ejecutar_preprocess=True, update_callback=None, cancel_event=None,
+                             algoritmo=ALGORITMO_POR_DEFECTO, inventario=None, al_cambiar_paso=None):
+    """
+    Ejecuta en orden todas las herramientas de limpieza sobre un único inventario.
+    Los pasos que solo mueven archivos (1 a 4) trabajan sobre un plan de movimientos:
+    cada archivo se renombra una única vez a su destino final antes de pre-procesar.
+    Si se pasa un 'inventario' con plan simulado, ningún paso toca el disco.
+    'al_cambiar_paso(paso, total)' permite a la GUI seguir el avance por pasos.
+    """
+    # (función, argumentos, solo mueve archivos)
+    pasos = [
+        (partial(eliminar_duplicados, algoritmo=algoritmo), [True], True),
+        (organizar_archivos_carpetas, [], True),
+        (convertir_formatos_archivos, [], True),
+        (extraer_archivos_raiz, [True], True),
+        (preprocesar_contenido, [True], False),
+        (limpiar_carpetas_temporales, [], False)
+    ]
+
+    if not ejecutar_preprocess:
+        pasos.pop(4)
+
+    if inventario is None:
+        inventario = Inventario(ruta)
+        inventario.plan = PlanMovimientos()
+
+    try:
+        for i, (func, args, diferible) in enumerate(pasos, 1):
+            if cancel_event and cancel_event.is_set():
+                return {}
+
+            if inventario.plan and not inventario.plan.simulado and not diferible:
+                inventario.plan.aplicar(log_func)
+                inventario.plan = None
+
+            if al_cambiar_paso: al_cambiar_paso(i, len(pasos))
+            args_con_callback = [log_func] + args + [update_callback, cancel_event]
+            res = func(ruta, *args_con_callback, inventario=inventario)
+
+            if isinstance(res, dict) and res.get('error'):
+                res['error'] = f"Error en el paso {i}: {res['error']}"
+                return res
+    finally:
+        # Si se cancela o falla, lo ya decidido se lleva igualmente al disco
+        if inventario.plan and not inventario.plan.simulado:
+            inventario.plan.aplicar(log_func)
+
+    if update_callback: update_callback(1, 1, "")
+    return {}
@@ -0,0 +1,118 @@
+import os
+import sqlite3
+from funciones.dependencias import obtener_ruta_base_real
+
+def obtener_ruta_cache_hashes():
+    """Ruta de la base SQLite con los hashes guardados (carpeta 'cache' del programa)."""
+    return os.path.join(obtener_ruta_base_real(), 'cache', 'hashes.db')
+
+def _rango_prefijo(ruta):
+    """Límites para seleccionar en SQL todas las rutas que cuelgan de 'ruta'."""
+    prefijo = os.path.join(os.path.abspath(ruta), '')
+    return prefijo, prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+# Se incrementa cuando cambia el esquema; una versión distinta descarta el caché
+VERSION_ESQUEMA = 2
+
+class CacheHashes:
+    """
+    Índice persistente de hashes por archivo y algoritmo.
+    Una entrada solo es válida si coinciden ruta, tamaño, mtime_ns e inodo;
+    cualquier cambio en el archivo obliga a recalcular.
+    """
+    def __init__(self, ruta_db=None):
+        self.ruta_db = ruta_db or obtener_ruta_cache_hashes()
+        os.makedirs(os.path.dirname(self.ruta_db), exist_ok=True)
+        self.conexion = sqlite3.connect(self.ruta_db)
+        if self.conexion.execute("PRAGMA user_version").fetchone()[0] != VERSION_ESQUEMA:
+            self.conexion.execute("DROP TABLE IF EXISTS hashes")
+            self.conexion.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "ruta TEXT, algoritmo TEXT, tamano INTEGER, mtime_ns INTEGER, inodo INTEGER, "
+            "parcial TEXT, completo TEXT, PRIMARY KEY (ruta, algoritmo))"
+        )
+        self.aciertos = 0
+        self.fallos = 0
+        self.pendientes = 0
+
+    def consultar(self, ruta, st, tipo, algoritmo):
+        """Retorna el hash guardado ('parcial' o 'completo') si el archivo no cambió."""
+        fila = self.conexion.execute(
+            f"SELECT {tipo} FROM hashes WHERE ruta = ? AND algoritmo = ? AND tamano = ? AND mtime_ns = ? AND inodo = ?",
+            (os.path.abspath(ruta), algoritmo, st.st_size, st.st_mtime_ns, st.st_ino)
+        ).fetchone()
+        if fila and fila[0]:
+            self.aciertos += 1
+            return fila[0]
+        self.fallos += 1
+        return None
+
+    def guardar(self, ruta, st, tipo, algoritmo, digest):
+        """Guarda un hash. Si la clave del archivo cambió se descartan los hashes anteriores."""
+        ruta = os.path.abspath(ruta)
+        clave = (st.st_size, st.st_mtime_ns, st.st_ino)
+        fila = self.conexion.execute(
+            "SELECT tamano, mtime_ns, inodo FROM hashes WHERE ruta = ? AND algoritmo = ?", (ruta, algoritmo)
+        ).fetchone()
+        if fila and tuple(fila) == clave:
+            self.conexion.execute(
+                f"UPDATE hashes SET {tipo} = ? WHERE ruta = ? AND algoritmo = ?", (digest, ruta, algoritmo)
+            )
+        else:
+            self.conexion.execute(
+                f"INSERT OR REPLACE INTO hashes (ruta, algoritmo, tamano, mtime_ns, inodo, {tipo}) VALUES (?, ?, ?, ?, ?, ?)",
+                (ruta, algoritmo, *clave, digest)
+            )
+        self.pendientes += 1
+        if self.pendientes >= 500:
+            self.conexion.commit()
+            self.pendientes = 0
+
+    def purgar(self, ruta_raiz, rutas_vistas):
+        """Elimina las entradas bajo 'ruta_raiz' cuyos archivos ya no existen en el recorrido."""
+        vistas = {os.path.abspath(p) for p in rutas_vistas}
+        desde, hasta = _rango_prefijo(ruta_raiz)
+        guardadas = self.conexion.execute(
+            "SELECT DISTINCT ruta FROM hashes WHERE ruta >= ? AND ruta < ?", (desde, hasta)
+        ).fetchall()
+        obsoletas = [(r,) for (r,) in guardadas if r not in vistas]
+        self.conexion.executemany("DELETE FROM hashes WHERE ruta = ?", obsoletas)
+        self.conexion.commit()
+        return len(obsoletas)
+
+    def invalidar(self, ruta_raiz=None):
+        """Olvida todos los hashes guardados (o solo los de 'ruta_raiz')."""
+        if ruta_raiz is None:
+            cur = self.conexion.execute("DELETE FROM hashes")
+        else:
+            desde, hasta = _rango_prefijo(ruta_raiz)
+            cur = self.conexion.execute("DELETE FROM hashes WHERE ruta >= ? AND ruta < ?", (desde, hasta))
+        self.conexion.commit()
+        return cur.rowcount
+
+    def cerrar(self):
+        self.conexion.commit()
+        self.conexion.close()
+
+def abrir_cache_hashes(log_func):
+    """Abre el caché de hashes. Si no es posible (permisos, disco), retorna None y se trabaja sin caché."""
+    try:
+        return CacheHashes()
+    except Exception as e:
+        log_func(f"No se pudo abrir el caché de hashes: {e}", nivel="warning")
+        return None
+
+def invalidar_cache_hashes(ruta, log_func, update_callback=None, cancel_event=None):
+    """Herramienta: olvida los hashes guardados de la carpeta para forzar un recálculo completo."""
+    cache = abrir_cache_hashes(log_func)
+    if cache is None:
+        return {'error': 'No se pudo abrir el caché de hashes.'}
+    try:
+        eliminadas = cache.invalidar(ruta)
+    finally:
+        cache.cerrar()
+        
+    if update_callback and not (cancel_event and cancel_event.is_set()):
+        update_callback(1, 1, "")
+    return {'entradas_eliminadas': eliminadas}
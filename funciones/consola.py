@@ -0,0 +1,214 @@
+import os
+import sys
+import time
+import argparse
+from functools import partial
+
+from funciones.duplicados import eliminar_duplicados, ALGORITMOS_HASH, ALGORITMO_POR_DEFECTO
+from funciones.similares import eliminar_imagenes_similares, UMBRAL_SIMILITUD
+from funciones.referencia import indexar_referencia, deduplicar_contra_referencia
+from funciones.rendimiento import medir_hash, medir_algoritmos_hash, medir_conversion_imagenes, medir_optimizacion_imagenes
+from funciones.ordenar import organizar_archivos_carpetas
+from funciones.extraer import extraer_archivos_raiz
+from funciones.conversiones import convertir_formatos_archivos
+from funciones.dividir import organizar_archivos_en_subcarpetas
+from funciones.automatico import ejecutar_modo_automatico
+from funciones.simulacion import simular, guardar_plan, ejecutar_plan
+from funciones.diario import ejecutar_con_diario, reanudar_diario, deshacer_diario
+from funciones.progreso import texto_progreso
+
+class ProgresoConsola:
+    """Callback de progreso para la terminal (misma firma que el de la GUI)."""
+    def __init__(self, intervalo=0.5):
+        self.intervalo = intervalo
+        self.ultimo = 0.0
+
+    def __call__(self, current, total, file_info="", explorando=False, detalle=None):
+        ahora = time.monotonic()
+        if ahora - self.ultimo < self.intervalo and current != total:
+            return
+        self.ultimo = ahora
+        texto = f"{int(current)}/{total}" if total else "Calculando..."
+        if explorando and total: texto += "+"
+        if detalle: texto += f" {texto_progreso(detalle)}"
+        print(f"\r{texto} {file_info[:50]:<50}", end="", file=sys.stderr, flush=True)
+
+def _mostrar_resultado(res):
+    print(file=sys.stderr)
+    if isinstance(res, dict) and res.get('error'):
+        print(f"Error: {res['error']}")
+        return 1
+    for clave, valor in (res or {}).items():
+        print(f"{clave}: {valor}")
+    return 0
+
+def _ejecutar_o_simular(args, func, *posicionales, **opciones):
+    """
+    Ejecuta la herramienta con diario (reanudable con 'reanudar' y reversible con 'deshacer'),
+    o con --simular escribe su plan de acciones en JSONL sin tocar el disco.
+    """
+    if not args.simular:
+        ejecutar = func if args.sin_diario else partial(ejecutar_con_diario, func)
+        return _mostrar_resultado(ejecutar(*posicionales, update_callback=ProgresoConsola(), **opciones))
+        
+    resultado = {}
+    def acciones():
+        for accion in simular(func, *posicionales, update_callback=ProgresoConsola(), **opciones):
+            if accion['accion'] == 'resultado':
+                resultado.update(accion['resultado'] or {})
+            yield accion
+    escritas = guardar_plan(acciones(), args.simular)
+    resultado['acciones_en_plan'] = escritas
+    resultado['plan'] = args.simular
+    return _mostrar_resultado(resultado)
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="orgest", description="Orgest sin interfaz gráfica.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    
+    p_dup = sub.add_parser("duplicados", help="Mueve los duplicados a 'basura' o los reemplaza por enlaces.")
+    p_dup.add_argument("ruta")
+    p_dup.add_argument("--accion", choices=["mover", "enlazar"], default="mover")
+    p_dup.add_argument("--algoritmo", choices=list(ALGORITMOS_HASH), default=ALGORITMO_POR_DEFECTO)
+    p_dup.add_argument("--hilos", type=int, default=None)
+    
+    p_ord = sub.add_parser("organizar", help="Clasifica los archivos en carpetas por tipo.")
+    p_ord.add_argument("ruta")
+    
+    p_conv = sub.add_parser("convertir", help="Convierte WebP a PNG y TS/M4S a MP4 con FFmpeg.")
+    p_conv.add_argument("ruta")
+    p_conv.add_argument("--procesos", type=int, default=None, help="Conversiones FFmpeg simultáneas.")
+    p_conv.add_argument("--unir-segmentos", action="store_true",
+                        help="Une los segmentos HLS/DASH (.ts/.m4s) de cada flujo en un solo MP4.")
+    p_conv.add_argument("--reserva-mb", type=int, default=None,
+                        help="Espacio libre (MB) que las conversiones deben dejar en el disco (por defecto 500).")
+    
+    p_ext = sub.add_parser("extraer", help="Saca los archivos de las subcarpetas a la raíz.")
+    p_ext.add_argument("ruta")
+    
+    p_div = sub.add_parser("dividir", help="Reparte los archivos de una carpeta en subcarpetas numeradas.")
+    p_div.add_argument("ruta")
+    p_div.add_argument("--cantidad", type=int, required=True, help="Archivos por subcarpeta.")
+    
+    p_auto = sub.add_parser("auto", help="Ejecuta la secuencia completa del Modo Automático.")
+    p_auto.add_argument("ruta")
+    p_auto.add_argument("--sin-preprocesar", action="store_true")
+    p_auto.add_argument("--algoritmo", choices=list(ALGORITMOS_HASH), default=ALGORITMO_POR_DEFECTO)
+    
+    for p in (p_dup, p_ord, p_conv, p_ext, p_div, p_auto):
+        p.add_argument("--simular", metavar="PLAN.jsonl", default=None,
+                       help="No toca el disco: escribe las acciones previstas en un plan JSONL.")
+        p.add_argument("--sin-diario", action="store_true",
+                       help="Aplica los cambios directamente, sin diario (no se podrá reanudar ni deshacer).")
+    
+    p_plan = sub.add_parser("plan", help="Ejecuta tal cual un plan generado con --simular.")
+    p_plan.add_argument("plan")
+    
+    p_rea = sub.add_parser("reanudar", help="Continúa la última ejecución interrumpida en la carpeta.")
+    p_rea.add_argument("ruta")
+    
+    p_des = sub.add_parser("deshacer", help="Revierte la última ejecución con diario en la carpeta.")
+    p_des.add_argument("ruta")
+    
+    p_sim = sub.add_parser("similares", help="Mueve imágenes casi idénticas a 'basura'.")
+    p_sim.add_argument("ruta")
+    p_sim.add_argument("--umbral", type=int, default=UMBRAL_SIMILITUD, help="Distancia de Hamming máxima (0-64).")
+    p_sim.add_argument("--procesos", type=int, default=None)
+    
+    p_ref = sub.add_parser("referencia", help="Deduplica contra una biblioteca de referencia indexada.")
+    sub_ref = p_ref.add_subparsers(dest="accion_referencia", required=True)
+    p_idx = sub_ref.add_parser("indexar", help="Crea o actualiza el índice de la biblioteca.")
+    p_idx.add_argument("ruta")
+    p_idx.add_argument("--indice", default=None, help="Archivo del índice (por defecto, en la carpeta 'cache').")
+    p_idx.add_argument("--algoritmo", choices=list(ALGORITMOS_HASH), default=ALGORITMO_POR_DEFECTO)
+    p_idx.add_argument("--hilos", type=int, default=None)
+    p_cmp = sub_ref.add_parser("comparar", help="Mueve a 'basura' lo que ya existe en la biblioteca.")
+    p_cmp.add_argument("ruta")
+    grupo = p_cmp.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--referencia", help="Carpeta de la biblioteca ya indexada.")
+    grupo.add_argument("--indice", help="Archivo del índice.")
+    p_cmp.add_argument("--hilos", type=int, default=None)
+    
+    p_bench = sub.add_parser("benchmark", help="Mide el rendimiento en esta máquina.")
+    sub_bench = p_bench.add_subparsers(dest="benchmark", required=True)
+    p_alg = sub_bench.add_parser("algoritmos", help="MB/s de cada algoritmo de hash (en memoria).")
+    p_alg.add_argument("--mb", type=int, default=256)
+    p_img = sub_bench.add_parser("imagenes", help="Imágenes/s de WebP a PNG: FFmpeg por imagen frente a Pillow.")
+    p_img.add_argument("ruta")
+    p_img.add_argument("--procesos", type=int, default=None)
+    p_img.add_argument("--limite", type=int, default=None, help="Medir solo las N primeras imágenes.")
+    p_opt = sub_bench.add_parser("optimizar", help="ms y pico de memoria al optimizar JPEG grandes: completa frente a reducida.")
+    p_opt.add_argument("ruta")
+    p_opt.add_argument("--limite", type=int, default=None, help="Medir solo las N primeras imágenes.")
+    p_hash = sub_bench.add_parser("hash", help="MB/s del hash secuencial frente al pool de hilos.")
+    p_hash.add_argument("ruta")
+    p_hash.add_argument("--hilos", type=int, default=None)
+    p_hash.add_argument("--algoritmo", choices=list(ALGORITMOS_HASH), default=ALGORITMO_POR_DEFECTO)
+    return parser
+
+def ejecutar_consola(argv, log_func):
+    """Punto de entrada no interactivo. Retorna el código de salida del proceso."""
+    args = crear_parser().parse_args(argv)
+    
+    if getattr(args, "ruta", None) and not os.path.isdir(args.ruta):
+        print(f"Error: la ruta no es válida: {args.ruta}")
+        return 1
+        
+    if args.comando == "duplicados":
+        return _ejecutar_o_simular(args, eliminar_duplicados, args.ruta, log_func, True,
+                                   hilos=args.hilos, algoritmo=args.algoritmo, accion=args.accion)
+        
+    if args.comando == "organizar":
+        return _ejecutar_o_simular(args, organizar_archivos_carpetas, args.ruta, log_func)
+        
+    if args.comando == "convertir":
+        return _ejecutar_o_simular(args, convertir_formatos_archivos, args.ruta, log_func, procesos=args.procesos,
+                                   unir_segmentos=args.unir_segmentos, reserva_mb=args.reserva_mb)
+        
+    if args.comando == "extraer":
+        return _ejecutar_o_simular(args, extraer_archivos_raiz, args.ruta, log_func, True)
+        
+    if args.comando == "dividir":
+        return _ejecutar_o_simular(args, organizar_archivos_en_subcarpetas, args.ruta, log_func, args.cantidad)
+        
+    if args.comando == "auto":
+        return _ejecutar_o_simular(args, ejecutar_modo_automatico, args.ruta, log_func, not args.sin_preprocesar,
+                                   algoritmo=args.algoritmo)
+        
+    if args.comando == "plan":
+        if not os.path.isfile(args.plan):
+            print(f"Error: no existe el plan: {args.plan}")
+            return 1
+        return _mostrar_resultado(ejecutar_plan(args.plan, log_func, ProgresoConsola()))
+        
+    if args.comando == "reanudar":
+        return _mostrar_resultado(reanudar_diario(args.ruta, log_func, ProgresoConsola()))
+        
+    if args.comando == "deshacer":
+        return _mostrar_resultado(deshacer_diario(args.ruta, log_func, ProgresoConsola()))
+        
+    if args.comando == "similares":
+        res = eliminar_imagenes_similares(args.ruta, log_func, True, ProgresoConsola(),
+                                          umbral=args.umbral, procesos=args.procesos)
+        return _mostrar_resultado(res)
+        
+    if args.comando == "referencia":
+        if args.accion_referencia == "indexar":
+            res = indexar_referencia(args.ruta, log_func, ProgresoConsola(), ruta_indice=args.indice,
+                                     algoritmo=args.algoritmo, hilos=args.hilos)
+        else:
+            res = deduplicar_contra_referencia(args.ruta, log_func, args.referencia, ProgresoConsola(),
+                                               ruta_indice=args.indice, hilos=args.hilos)
+        return _mostrar_resultado(res)
+        
+    if args.comando == "benchmark":
+        if args.benchmark == "algoritmos":
+            medir_algoritmos_hash(args.mb)
+        elif args.benchmark == "imagenes":
+            medir_conversion_imagenes(args.ruta, args.procesos, args.limite)
+        elif args.benchmark == "optimizar":
+            medir_optimizacion_imagenes(args.ruta, args.limite)
+        elif args.benchmark == "hash":
+            medir_hash(args.ruta, args.hilos, args.algoritmo)
+        return 0
+    return 1
@@ -1,104 +1,392 @@
 import os
-import shutil
-import subprocess
 from funciones.dependencias import verificar_ffmpeg 
+from funciones.inventario import recorrer, mover_archivo, preparar_en_disco, crear_directorio, simulando
+from funciones.nombres import AsignadorNombres
+from funciones.flujo import iniciar_flujo, reportar_progreso
+from funciones.trabajos import PoolComandos, PoolFunciones
+from funciones.segmentos import EXT_SEGMENTOS, agrupar_segmentos, preparar_union, limpiar_union
+from funciones.sondeo import abrir_cache_sondeos, sondear, salida_actualizada
+from funciones.espacio import ControlEspacio, necesidad_conversion, necesidad_union
+from funciones.manifiesto import abrir_manifiesto
 
-def encontrar_archivos_a_convertir(ruta, log_func):
+# Imágenes fijas que se pasan a PNG: en proceso con Pillow y, si no puede leerlas, con FFmpeg
+EXT_IMAGEN_A_PNG = {'.webp'}
+
+def convertir_imagen_pillow(origen, destino):
+    """
+    Convierte una imagen fija a PNG con Pillow (las animadas, a PNG animado).
+    Se ejecuta en procesos aparte: si falla lanza RuntimeError y no deja el destino a medias.
+    """
+    from PIL import Image
+    try:
+        with Image.open(origen) as img:
+            img.save(destino, format='PNG', save_all=getattr(img, 'is_animated', False))
+    except Exception as e:
+        if os.path.exists(destino):
+            os.remove(destino)
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+def iterar_archivos_a_convertir(ruta, log_func, inventario=None):
     """
-    Busca archivos .webp, .ts, .m4s. Prioriza la carpeta 'Sin procesar' 
+    Genera los archivos .webp, .ts, .m4s a medida que se descubren. Prioriza la carpeta 'Sin procesar' 
     si existe; de lo contrario, busca en la ruta raíz.
     """
     targets = ['.webp', '.ts', '.m4s']
-    archivos_targets = []
     
     ruta_a_procesar = os.path.join(ruta, "Sin procesar")
     
-    if os.path.isdir(ruta_a_procesar):
+    es_dir = inventario.es_directorio(ruta_a_procesar) if inventario else os.path.isdir(ruta_a_procesar)
+    if es_dir:
         log_func("Buscando archivos a convertir en la subcarpeta 'Sin procesar'.", nivel="debug")
         ruta_busqueda = ruta_a_procesar
     else:
         log_func("Buscando archivos a convertir en la ruta principal seleccionada.", nivel="debug")
         ruta_busqueda = ruta
     
-    for root, _, files in os.walk(ruta_busqueda):
+    for root, _, files in recorrer(ruta_busqueda, inventario):
         if "basura" in root: continue
             
         for f in files:
             ext = os.path.splitext(f)[1].lower()
             if ext in targets:
-                archivos_targets.append(os.path.join(root, f))
-    return archivos_targets
+                yield os.path.join(root, f)
 
-def convertir_formatos_archivos(ruta, log_func, update_callback=None, cancel_event=None):
+def convertir_formatos_archivos(ruta, log_func, update_callback=None, cancel_event=None, inventario=None, procesos=None,
+                                unir_segmentos=False, reserva_mb=None):
     """
-    Convierte WebP a PNG y TS/M4S a MP4 usando FFmpeg.
-    Verifica espacio en disco (>100MB) antes de iniciar.
+    Convierte WebP a PNG (con Pillow, FFmpeg solo de reserva) y TS/M4S a MP4 (con FFmpeg).
+    Las imágenes se convierten en un pool de procesos de Python y los videos en paralelo
+    (como mucho 'procesos' FFmpeg a la vez, ver trabajos.py); cada original se mueve a
+    'basura' solo cuando su conversión terminó bien.
+    Con 'unir_segmentos', los segmentos HLS/DASH de cada carpeta se agrupan por flujo (ver
+    segmentos.py) y cada flujo se une en un solo MP4 con una única llamada a FFmpeg; los
+    segmentos que no forman flujo se convierten uno a uno como siempre.
+    Si la salida de un archivo ya existe, es posterior al original y el manifiesto (ver manifiesto.py)
+    confirma que salió de él (y FFprobe la lee, si es un video), no se vuelve a convertir: solo se
+    retira el original a 'basura'. Si el nombre lo ocupa otro archivo, se convierte a un nombre nuevo.
+    Cada trabajo estima el espacio que necesita (ver espacio.py) y solo se lanza si el disco sigue
+    por encima de 'reserva_mb' (RESERVA_MB por defecto); los que no caben esperan, de menor a
+    mayor, a que terminen otros, y si aun así no caben se dejan sin convertir.
+    Si recibe un 'inventario' compartido lo usa para recorrer y lo mantiene actualizado.
     """
-    try:
-        libre = shutil.disk_usage(ruta).free / (1024**2)
-        if libre < 100: return {'error': 'Espacio en disco insuficiente (<100MB)'}
-    except Exception: 
-        pass
-
     if not verificar_ffmpeg(log_func):
         return {'error': 'FFmpeg no encontrado. Instálalo para convertir videos/webp.'}
 
+    pillow_ok = True
+    try:
+        import PIL
+    except ImportError:
+        pillow_ok = False
+        log_func("Pillow no instalado. Las imágenes se convertirán con FFmpeg.", nivel="warning")
+
     basura = os.path.join(ruta, "basura")
-    os.makedirs(basura, exist_ok=True)
+    crear_directorio(basura, inventario)
+    asignador = AsignadorNombres(inventario)
     
     conv_count = 0
+    ya_convertidos = 0
+    omitidos_sin_espacio = 0
+    flujos_unidos = 0
+    segmentos_unidos = 0
+    # carpeta -> segmentos .ts/.m4s descubiertos en ella (se agrupan al terminar el recorrido)
+    segmentos_por_carpeta = {}
     
-    archivos_targets = encontrar_archivos_a_convertir(ruta, log_func)
-    total_archivos = len(archivos_targets)
+    flujo = iniciar_flujo(iterar_archivos_a_convertir(ruta, log_func, inventario), inventario)
     archivos_procesados = 0
-    
-    # --- CONFIGURACIÓN PARA OCULTAR CONSOLA EN WINDOWS ---
-    startup_args = {}
-    if os.name == 'nt':
-        startup_args['creationflags'] = subprocess.CREATE_NO_WINDOW
-    # -----------------------------------------------------
-    
-    for src in archivos_targets:
-        # 1. Verificar si el usuario pulsó "Cancelar" en la GUI
-        if cancel_event and cancel_event.is_set():
-            return {}
-            
-        # 2. Desglosar la ruta del archivo
-        root, f = os.path.split(src)             
-        ext = os.path.splitext(f)[1].lower()     
-        dst = None
-        cmd = []
-        
-        # 3. Preparar el comando según el tipo de archivo
-        if ext == '.webp':
+    pool = None if simulando(inventario) else PoolComandos(procesos, cancel_event)
+    pool_imagenes = PoolFunciones(cancel_event=cancel_event) if pool and pillow_ok else None
+    cache = abrir_cache_sondeos(log_func)
+    manifiesto = abrir_manifiesto(log_func)
+    control = ControlEspacio(ruta, reserva_mb, simulado=simulando(inventario))
+
+    def ya_convertido(src, dst):
+        """
+        True si 'dst' es una conversión de 'src' hecha en una ejecución anterior: debe constar en el
+        manifiesto como salida de este mismo original (un 'foo.png' ajeno junto a 'foo.webp' no cuenta).
+        """
+        if manifiesto is None:
+            return False
+        try:
+            st_src = inventario.stat(src) if inventario else os.stat(src)
+            st_dst = inventario.stat(dst) if inventario else os.stat(dst)
+        except OSError:
+            return False
+        if not salida_actualizada(src, dst, st_src, st_dst):
+            return False
+        # En simulación las rutas pueden no existir aún en disco: entonces no se puede confirmar
+        if not (os.path.isfile(src) and os.path.isfile(dst)) or not manifiesto.es_conversion(src, st_src, dst, st_dst):
+            return False
+        if dst.lower().endswith('.mp4'):
+            info = sondear(dst, st_dst, cache)
+            return bool(info and info.get('duracion'))
+        return True
+
+    def anotar_conversion(src, dst):
+        if manifiesto is None:
+            return
+        try:
+            manifiesto.registrar_conversion(src, dst)
+        except Exception as e:
+            log_func(f"No se pudo anotar la conversión de {os.path.basename(src)}: {e}", nivel="warning")
+
+    def terminar(trabajo, error):
+        """Cierra una conversión acabada: registra el destino y manda el original a 'basura'."""
+        nonlocal conv_count, archivos_procesados
+        if isinstance(trabajo, dict):
+            return terminar_union(trabajo, error)
+        src, dst, f, _, necesidad = trabajo
+        control.liberar(*necesidad)
+        if error is None:
+            if inventario: inventario.agregar(dst)
+            anotar_conversion(src, dst)
+            try:
+                mover_archivo(src, asignador.reservar(basura, f), inventario)
+            except: pass
+            conv_count += 1
+        else:
+            # Salida a medias (error o proceso cancelado): no debe quedar como si fuera válida
+            if os.path.exists(dst):
+                try: os.remove(dst)
+                except OSError: pass
+            if not (cancel_event and cancel_event.is_set()):
+                log_func(f"Error FFmpeg {f}: {error}", nivel="error")
+        archivos_procesados += 1
+        reportar_progreso(update_callback, archivos_procesados, flujo, f)
+
+    def terminar_union(flujo_seg, error):
+        """Cierra la unión de un flujo: registra el MP4 y manda todas sus piezas a 'basura'."""
+        nonlocal flujos_unidos, segmentos_unidos, archivos_procesados
+        control.liberar(*flujo_seg['necesidad'])
+        dst = flujo_seg['destino']
+        limpiar_union(dst, flujo_seg['formato'])
+        if error is None:
+            if inventario: inventario.agregar(dst)
+            for pieza in flujo_seg['piezas']:
+                try:
+                    mover_archivo(pieza, asignador.reservar(basura, os.path.basename(pieza)), inventario)
+                except: pass
+            flujos_unidos += 1
+            segmentos_unidos += len(flujo_seg['segmentos'])
+        else:
+            if os.path.exists(dst):
+                try: os.remove(dst)
+                except OSError: pass
+            if not (cancel_event and cancel_event.is_set()):
+                log_func(f"Error FFmpeg uniendo {os.path.basename(dst)}: {error}", nivel="error")
+        archivos_procesados += len(flujo_seg['segmentos'])
+        reportar_progreso(update_callback, archivos_procesados, flujo, os.path.basename(dst))
+
+    def tamano(ruta_archivo):
+        return (inventario.stat(ruta_archivo) if inventario else os.stat(ruta_archivo)).st_size
+
+    def lanzar(trabajo):
+        """Lanza un trabajo ya admitido en su pool (en simulación, registra sus acciones)."""
+        nonlocal conv_count, flujos_unidos, segmentos_unidos, archivos_procesados
+        if isinstance(trabajo, dict):
+            origenes, dst = trabajo['origenes'], trabajo['destino']
+            cmd, preparar = preparar_union(origenes, dst, trabajo['formato'])
+            log_func(f"Uniendo {len(trabajo['segmentos'])} segmentos en {os.path.basename(dst)}", nivel="info")
+            if simulando(inventario):
+                inventario.plan.registrar('unir', origenes=origenes, destino=dst, formato=trabajo['formato'], comando=cmd,
+                                          espacio=sum(trabajo['necesidad']))
+                inventario.agregar(dst, inventario.stat(origenes[0]))
+                for pieza in trabajo['piezas']:
+                    mover_archivo(pieza, asignador.reservar(basura, os.path.basename(pieza)), inventario)
+                control.liberar(*trabajo['necesidad'])
+                flujos_unidos += 1
+                segmentos_unidos += len(trabajo['segmentos'])
+                archivos_procesados += len(trabajo['segmentos'])
+                reportar_progreso(update_callback, archivos_procesados, flujo, os.path.basename(dst))
+                return
+            try:
+                for pieza in origenes + [dst]:
+                    preparar_en_disco(pieza, inventario)
+                pool.enviar(cmd, trabajo, rutas=origenes + [dst], antes=preparar)
+            except Exception as e:
+                control.liberar(*trabajo['necesidad'])
+                log_func(f"Excepción uniendo {os.path.basename(dst)}: {e}", nivel="error")
+                archivos_procesados += len(trabajo['segmentos'])
+            return
+
+        src, dst, f, cmd, necesidad = trabajo
+        con_pillow = pillow_ok and os.path.splitext(f)[1].lower() in EXT_IMAGEN_A_PNG
+        # En simulación (dry-run) solo se registra la conversión y el traslado del original
+        if simulando(inventario):
+            datos = {'motor': 'pillow'} if con_pillow else {}
+            inventario.plan.registrar('convertir', origen=src, destino=dst, comando=cmd, espacio=sum(necesidad), **datos)
+            inventario.agregar(dst, inventario.stat(src))
+            mover_archivo(src, asignador.reservar(basura, f), inventario)
+            control.liberar(*necesidad)
+            conv_count += 1
+            archivos_procesados += 1
+            reportar_progreso(update_callback, archivos_procesados, flujo, f)
+            return
+
+        # Lanzar la conversión en su pool (espera si el pool ya está lleno)
+        try:
+            # Con movimientos diferidos, el original y el destino deben estar ya en su sitio
+            preparar_en_disco(src, inventario)
+            preparar_en_disco(dst, inventario)
+            if con_pillow:
+                pool_imagenes.enviar(convertir_imagen_pillow, src, dst, dato=trabajo, rutas=(src, dst))
+            else:
+                pool.enviar(cmd, trabajo, rutas=(src, dst))
+        except Exception as e:
+            control.liberar(*necesidad)
+            log_func(f"Excepción convirtiendo {f}: {e}", nivel="error")
+            archivos_procesados += 1
+
+    def planificar(trabajo, necesidad):
+        """Lanza el trabajo si su espacio cabe; si no, queda en espera hasta que quepa."""
+        if control.admitir(*necesidad):
+            lanzar(trabajo)
+        else:
+            control.encolar(trabajo, *necesidad)
+
+    def admitir_en_espera():
+        for trabajo in control.admitibles():
+            lanzar(trabajo)
+
+    def unir_carpeta(carpeta, segmentos):
+        """Agrupa los segmentos de una carpeta y planifica una unión por flujo. Retorna los que quedan sueltos."""
+        nombres = inventario.nombres(carpeta) if inventario else None
+        if nombres is None:
+            try: nombres = os.listdir(carpeta)
+            except OSError: nombres = []
+        flujos_seg, sueltos = agrupar_segmentos(carpeta, segmentos, set(nombres))
+        for flujo_seg in flujos_seg:
+            if cancel_event and cancel_event.is_set():
+                return []
+            origenes = ([flujo_seg['init']] if flujo_seg['init'] else []) + flujo_seg['segmentos']
+            dst = asignador.reservar(carpeta, flujo_seg['nombre'] + '.mp4')
+            necesidad = necesidad_union(sum(tamano(o) for o in origenes), flujo_seg['formato'])
+            flujo_seg.update(origenes=origenes, destino=dst, piezas=origenes + flujo_seg['extras'], necesidad=necesidad)
+            planificar(flujo_seg, necesidad)
+            if pool: recoger()
+        return sueltos
+
+    def recoger(esperar=False):
+        """Cierra las conversiones acabadas en ambos pools y lanza las que esperaban espacio."""
+        if pool_imagenes:
+            for trabajo, error in pool_imagenes.terminados(esperar):
+                if error and not (cancel_event and cancel_event.is_set()):
+                    # Pillow no pudo con el archivo: se reintenta con FFmpeg
+                    log_func(f"Pillow no pudo convertir {trabajo[2]} ({error}); se usa FFmpeg.", nivel="debug")
+                    pool.enviar(trabajo[3], trabajo, rutas=trabajo[:2])
+                else:
+                    terminar(trabajo, error)
+        for trabajo, error in pool.terminados(esperar):
+            terminar(trabajo, error)
+        if not (cancel_event and cancel_event.is_set()):
+            admitir_en_espera()
+
+    def convertir(src):
+        """Prepara la conversión de un archivo suelto y la planifica según el espacio libre."""
+        nonlocal ya_convertidos, archivos_procesados
+        # Desglosar la ruta del archivo
+        root, f = os.path.split(src)
+        ext = os.path.splitext(f)[1].lower()
+
+        # Salida según el tipo de archivo
+        if ext in EXT_IMAGEN_A_PNG:
             dst = src.rsplit('.', 1)[0] + '.png'
-            cmd = ['ffmpeg', '-i', src, dst, '-y', '-loglevel', 'error']
-            
-        elif ext in ['.ts', '.m4s']:
+        elif ext in EXT_SEGMENTOS:
             dst = src.rsplit('.', 1)[0] + '.mp4'
-            cmd = ['ffmpeg', '-i', src, '-c', 'copy', dst, '-y', '-loglevel', 'error']
-        
-        # 4. Ejecutar la conversión si se generó un comando válido
-        if cmd:
+        else:
+            return
+
+        # Ya convertido en una ejecución anterior: solo falta retirar el original
+        if ya_convertido(src, dst):
             try:
-                # Ejecutamos el comando pasando los argumentos para ocultar la ventana
-                res = subprocess.run(cmd, capture_output=True, **startup_args)
-                
-                if res.returncode == 0:
-                    try:
-                        shutil.move(src, os.path.join(basura, os.path.basename(src)))
-                    except: pass
-                    conv_count += 1
-                else:
-                    log_func(f"Error FFmpeg {f}: {res.stderr.decode()}", nivel="error")
+                mover_archivo(src, asignador.reservar(basura, f), inventario)
+                ya_convertidos += 1
             except Exception as e:
-                log_func(f"Excepción convirtiendo {f}: {e}", nivel="error")
+                log_func(f"No se pudo mover {f} a basura: {e}", nivel="error")
+            archivos_procesados += 1
+            reportar_progreso(update_callback, archivos_procesados, flujo, f)
+            return
 
-        # 5. Actualizar barra de progreso en la interfaz
-        archivos_procesados += 1
-        if update_callback: update_callback(archivos_procesados, total_archivos, f)
+        # Si otro archivo ocupa ya ese nombre, la conversión va a un nombre nuevo (no se sobrescribe)
+        dst = asignador.reservar(root, os.path.basename(dst))
+        if ext in EXT_IMAGEN_A_PNG:
+            cmd = ['ffmpeg', '-i', src, dst, '-y', '-loglevel', 'error']
+        else:
+            cmd = ['ffmpeg', '-i', src, '-c', 'copy', dst, '-y', '-loglevel', 'error']
+        try:
+            necesidad = necesidad_conversion(tamano(src), ext)
+        except OSError as e:
+            log_func(f"Excepción convirtiendo {f}: {e}", nivel="error")
+            archivos_procesados += 1
+            return
+        planificar((src, dst, f, cmd, necesidad), necesidad)
+
+    try:
+        for src in flujo:
+            # 1. Verificar si el usuario pulsó "Cancelar" en la GUI
+            if cancel_event and cancel_event.is_set():
+                return {}
+
+            # 2. Los segmentos se guardan hasta conocer la carpeta entera; el resto se convierte ya
+            if unir_segmentos and os.path.splitext(src)[1].lower() in EXT_SEGMENTOS:
+                segmentos_por_carpeta.setdefault(os.path.dirname(src), []).append(src)
+            else:
+                convertir(src)
 
-    if update_callback and not (cancel_event and cancel_event.is_set()):
+            # 3. Cerrar las conversiones acabadas y actualizar la barra de progreso
+            if pool: recoger()
+
+        # 4. Un FFmpeg por flujo de segmentos; los sueltos, uno a uno
+        for carpeta, segmentos in segmentos_por_carpeta.items():
+            for src in unir_carpeta(carpeta, segmentos):
+                if cancel_event and cancel_event.is_set():
+                    return {}
+                convertir(src)
+                if pool: recoger()
+
+        # 5. Lo que esperaba espacio entra a medida que terminan los demás; si ya no queda nada
+        #    en marcha y sigue sin caber, no va a caber: se deja sin convertir (sin abortar)
+        while True:
+            if pool: recoger(esperar=True)
+            else: admitir_en_espera()
+            if cancel_event and cancel_event.is_set():
+                return {}
+            if pool and (pool.en_vuelo() or (pool_imagenes and pool_imagenes.en_vuelo())):
+                continue
+            for trabajo in control.descartar_espera():
+                omitidos_sin_espacio += len(trabajo['segmentos']) if isinstance(trabajo, dict) else 1
+                nombre = os.path.basename(trabajo['destino'] if isinstance(trabajo, dict) else trabajo[0])
+                log_func(f"Sin espacio en disco para convertir {nombre} "
+                         f"({sum(trabajo['necesidad'] if isinstance(trabajo, dict) else trabajo[4]) / 1048576:.1f} MB); "
+                         f"se deja sin convertir.", nivel="warning")
+            break
+    finally:
+        if pool:
+            if cancel_event and cancel_event.is_set():
+                for p in (pool_imagenes, pool):
+                    if p: p.cancelar()
+                recoger(esperar=True)
+            if pool_imagenes: pool_imagenes.cerrar()
+            pool.cerrar()
+        if cache: cache.cerrar()
+        if manifiesto: manifiesto.cerrar()
+
+    if cancel_event and cancel_event.is_set():
+        return {}
+
+    if update_callback:
         update_callback(1, 1, "")
-        
-    return {'convertidos': conv_count}
\ No newline at end of file
+
+    res = {'convertidos': conv_count}
+    if ya_convertidos:
+        res['omitidos_ya_convertidos'] = ya_convertidos
+    if omitidos_sin_espacio:
+        res['omitidos_sin_espacio'] = omitidos_sin_espacio
+    if unir_segmentos:
+        res.update(flujos_unidos=flujos_unidos, segmentos_unidos=segmentos_unidos)
+    return res
+
+def unir_segmentos_archivos(ruta, log_func, update_callback=None, cancel_event=None, inventario=None, procesos=None,
+                            reserva_mb=None):
+    """convertir_formatos_archivos uniendo los segmentos TS/M4S de cada flujo en un solo MP4."""
+    return convertir_formatos_archivos(ruta, log_func, update_callback, cancel_event, inventario, procesos,
+                                       unir_segmentos=True, reserva_mb=reserva_mb)
@@ -0,0 +1,240 @@
+import os
+import sys
+import time
+import errno
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from funciones.enlaces import enlazar_sin_copia
+
+# Bloque por llamada a copy_file_range/sendfile (el núcleo copia sin pasar por Python)
+BLOQUE_COPIA = 64 * 1024 * 1024
+# Búfer del último recurso (lectura/escritura en Python), mayor que el de shutil
+BUFFER_COPIA = 8 * 1024 * 1024
+# Por debajo de este tamaño las copias van al pool de hilos (dominan las llamadas al sistema, no los bytes)
+UMBRAL_PEQUENO = 4 * 1024 * 1024
+HILOS_COPIA = 4
+# Copias lanzadas y aún sin recoger; al llegar aquí se espera a la más antigua
+MAXIMO_EN_VUELO = 256
+
+# Errores con los que copy_file_range/sendfile "no aplican" y se pasa al siguiente método
+_NO_SOPORTADO = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.EPERM,
+                 getattr(errno, 'ENOTSUP', errno.EOPNOTSUPP)}
+
+class EstadisticasCopia:
+    """Contadores de rendimiento del motor de copia (seguros entre hilos)."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.archivos_copiados = 0
+        self.bytes_copiados = 0
+        self.archivos_renombrados = 0
+        # Backups hechos con reflink/hardlink: bytes que no hubo que escribir
+        self.archivos_enlazados = 0
+        self.bytes_ahorrados = 0
+        self.inicio = None
+        self.fin = None
+
+    def anotar_copia(self, tamano, inicio):
+        with self._lock:
+            self.archivos_copiados += 1
+            self.bytes_copiados += tamano
+            self.inicio = inicio if self.inicio is None else min(self.inicio, inicio)
+            self.fin = time.perf_counter()
+
+    def anotar_renombrado(self):
+        with self._lock:
+            self.archivos_renombrados += 1
+
+    def anotar_enlace(self, tamano):
+        with self._lock:
+            self.archivos_enlazados += 1
+            self.bytes_ahorrados += tamano
+
+    @property
+    def mb_por_segundo(self):
+        if not self.bytes_copiados or self.fin is None:
+            return 0.0
+        return (self.bytes_copiados / 1048576) / max(self.fin - self.inicio, 1e-9)
+
+    def resumen(self):
+        return {
+            'archivos_copiados': self.archivos_copiados,
+            'mb_copiados': round(self.bytes_copiados / 1048576, 1),
+            'archivos_renombrados': self.archivos_renombrados,
+            'archivos_enlazados': self.archivos_enlazados,
+            'mb_ahorrados': round(self.bytes_ahorrados / 1048576, 1),
+            'mb_por_segundo': round(self.mb_por_segundo, 1)
+        }
+
+def _copiar_datos(fd_origen, fd_destino, tamano):
+    """Copia 'tamano' bytes entre descriptores. Retorna los bytes copiados."""
+    copiado = 0
+    # 1. copy_file_range: copia dentro del núcleo (y reflink/copia en servidor si el FS lo soporta)
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copiado < tamano:
+                n = os.copy_file_range(fd_origen, fd_destino, min(BLOQUE_COPIA, tamano - copiado))
+                if n == 0: break
+                copiado += n
+            return copiado
+        except OSError as e:
+            if copiado or e.errno not in _NO_SOPORTADO: raise
+
+    # 2. sendfile: en Linux acepta un archivo normal como destino
+    if sys.platform.startswith('linux') and hasattr(os, 'sendfile'):
+        try:
+            while copiado < tamano:
+                n = os.sendfile(fd_destino, fd_origen, copiado, min(BLOQUE_COPIA, tamano - copiado))
+                if n == 0: break
+                copiado += n
+            os.lseek(fd_destino, copiado, os.SEEK_SET)
+            return copiado
+        except OSError as e:
+            if copiado or e.errno not in _NO_SOPORTADO: raise
+
+    # 3. Lectura/escritura con un búfer grande reutilizado
+    buffer = bytearray(min(BUFFER_COPIA, max(tamano, 1)))
+    vista = memoryview(buffer)
+    with open(fd_origen, 'rb', buffering=0, closefd=False) as f_origen, \
+         open(fd_destino, 'wb', buffering=0, closefd=False) as f_destino:
+        while True:
+            n = f_origen.readinto(buffer)
+            if not n: break
+            f_destino.write(vista[:n])
+            copiado += n
+    return copiado
+
+def copiar_archivo(origen, destino, estadisticas=None):
+    """
+    Equivalente rápido de shutil.copy2: copia el contenido en el núcleo (copy_file_range o
+    sendfile) con bloques grandes, conserva fechas y permisos, y comprueba que el tamaño
+    copiado coincide. Si algo falla no deja un destino a medias.
+    """
+    inicio = time.perf_counter()
+    try:
+        with open(origen, 'rb') as f_origen, open(destino, 'wb') as f_destino:
+            tamano = os.fstat(f_origen.fileno()).st_size
+            copiado = _copiar_datos(f_origen.fileno(), f_destino.fileno(), tamano)
+            if copiado != tamano or os.fstat(f_destino.fileno()).st_size != tamano:
+                raise OSError(errno.EIO, f"Copia incompleta ({copiado} de {tamano} bytes)", destino)
+        shutil.copystat(origen, destino)
+    except BaseException:
+        try: os.remove(destino)
+        except OSError: pass
+        raise
+    if estadisticas: estadisticas.anotar_copia(tamano, inicio)
+    return destino
+
+def mover_entre_dispositivos(origen, destino, estadisticas=None):
+    """Mueve copiando y borrando el origen (para cuando os.rename falla con EXDEV)."""
+    if os.path.isdir(origen) and not os.path.islink(origen):
+        return shutil.move(origen, destino)
+    copiar_archivo(origen, destino, estadisticas)
+    os.remove(origen)
+    return destino
+
+def mover_rapido(origen, destino, estadisticas=None):
+    """
+    Sustituto de shutil.move: intenta primero os.rename (instantáneo en el mismo disco)
+    y solo si el destino está en otro volumen recurre a la copia rápida.
+    """
+    try:
+        os.rename(origen, destino)
+    except OSError as e:
+        if e.errno != errno.EXDEV: raise
+        return mover_entre_dispositivos(origen, destino, estadisticas)
+    if estadisticas: estadisticas.anotar_renombrado()
+    return destino
+
+def enlazar_backup(origen, destino, estadisticas=None):
+    """
+    Crea el backup 'destino' sin escribir datos: reflink o, si no, hardlink al mismo inodo.
+    Solo es seguro si 'origen' después se sustituye (os.replace) y nunca se reescribe en su sitio.
+    Retorna 'reflink', 'hardlink' o None (otro sistema de archivos o sin soporte).
+    """
+    metodo = enlazar_sin_copia(origen, destino)
+    if metodo is None:
+        return None
+    if metodo == 'reflink':
+        # El reflink es un archivo propio: como copy2, conserva fechas y permisos
+        shutil.copystat(origen, destino)
+    if estadisticas: estadisticas.anotar_enlace(os.path.getsize(destino))
+    return metodo
+
+def crear_backup(origen, destino, estadisticas=None):
+    """Backup con enlazar_backup y, si no es posible, con copiar_archivo. Retorna el método usado."""
+    metodo = enlazar_backup(origen, destino, estadisticas)
+    if metodo is None:
+        copiar_archivo(origen, destino, estadisticas)
+        metodo = 'copia'
+    return metodo
+
+class CopiadorArchivos:
+    """
+    Copias con un pequeño pool de hilos para los archivos pequeños (los grandes se copian
+    en el hilo que llama, porque varias copias grandes a la vez solo compiten por el disco).
+    'esperar(ruta)' bloquea hasta que termine la copia que lee o escribe esa ruta, y
+    'terminados()' entrega (dato, error) de cada copia acabada, en el hilo que llama.
+    """
+    def __init__(self, hilos=HILOS_COPIA, estadisticas=None):
+        self.hilos = hilos
+        self.estadisticas = estadisticas or EstadisticasCopia()
+        self._pool = None
+        # clave de ruta (origen y destino) -> futuro de la copia en curso
+        self._en_curso = {}
+        self._futuros = deque()
+
+    @staticmethod
+    def _clave(ruta):
+        return os.path.normcase(os.path.normpath(ruta))
+
+    def copiar(self, origen, destino, dato=None):
+        """Lanza la copia de 'origen' a 'destino'; 'dato' se devuelve junto al resultado en terminados()."""
+        if len(self._futuros) >= MAXIMO_EN_VUELO:
+            wait([self._futuros[0][0]])
+        futuro = Future()
+        claves = ()
+        try:
+            tamano = os.path.getsize(origen)
+        except OSError as e:
+            futuro.set_exception(e)
+            tamano = None
+
+        if tamano is not None and self.hilos > 1 and tamano < UMBRAL_PEQUENO:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.hilos)
+            futuro = self._pool.submit(copiar_archivo, origen, destino, self.estadisticas)
+            claves = (self._clave(origen), self._clave(destino))
+            for clave in claves: self._en_curso[clave] = futuro
+        elif tamano is not None:
+            try:
+                futuro.set_result(copiar_archivo(origen, destino, self.estadisticas))
+            except Exception as e:
+                futuro.set_exception(e)
+        self._futuros.append((futuro, dato, claves))
+        return futuro
+
+    def esperar(self, ruta=None):
+        """Espera a la copia pendiente que usa 'ruta' (o a todas si no se indica)."""
+        if ruta is None:
+            wait([f for f, _, _ in self._futuros])
+            return
+        futuro = self._en_curso.get(self._clave(ruta))
+        if futuro is not None:
+            wait([futuro])
+
+    def terminados(self, esperar=False):
+        """Genera (dato, error o None) de las copias acabadas, en el orden en que se lanzaron."""
+        if esperar:
+            self.esperar()
+        while self._futuros and self._futuros[0][0].done():
+            futuro, dato, claves = self._futuros.popleft()
+            for clave in claves:
+                if self._en_curso.get(clave) is futuro: del self._en_curso[clave]
+            yield dato, futuro.exception()
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
@@ -1,7 +1,9 @@
 import sys
+import json
 import subprocess
 import os
 import shutil
+import threading
 import urllib.request
 import zipfile
 import io
@@ -53,39 +55,157 @@ def obtener_ruta_local_ffmpeg():
     base_dir = obtener_ruta_base_real()
     return os.path.join(base_dir, 'ffmpeg')
 
+# Herramientas resueltas en este proceso (None = aún sin resolver)
+_herramientas = None
+_lock_herramientas = threading.Lock()
+
+def _ejecutable(nombre):
+    return nombre + '.exe' if os.name == 'nt' else nombre
+
+def _candidatos_ffmpeg():
+    """Rutas posibles de ffmpeg por prioridad: copia portable del programa y luego el PATH."""
+    bin_local = os.path.join(obtener_ruta_local_ffmpeg(), 'bin')
+    # En Linux/macOS la copia portable no lleva '.exe'
+    for nombre in (_ejecutable('ffmpeg'), 'ffmpeg', 'ffmpeg.exe'):
+        ruta = os.path.join(bin_local, nombre)
+        if os.path.isfile(ruta):
+            yield ruta
+    en_path = shutil.which('ffmpeg')
+    if en_path:
+        yield os.path.abspath(en_path)
+
+def _buscar_ffprobe(ruta_ffmpeg):
+    """FFprobe junto al ffmpeg elegido (misma instalación) o, si no, en el PATH."""
+    directorio = os.path.dirname(ruta_ffmpeg)
+    nombre = os.path.basename(ruta_ffmpeg).replace('ffmpeg', 'ffprobe', 1)
+    for ruta in (os.path.join(directorio, nombre), os.path.join(directorio, _ejecutable('ffprobe'))):
+        if os.path.isfile(ruta):
+            return ruta
+    en_path = shutil.which('ffprobe')
+    return os.path.abspath(en_path) if en_path else None
+
+def _firma(ruta):
+    """Identifica un binario concreto: si se actualiza o se sustituye, cambia."""
+    if not ruta: return None
+    st = os.stat(ruta)
+    return [ruta, st.st_size, st.st_mtime_ns]
+
+def _nombres_listados(salida, separador):
+    """Nombres de la salida de 'ffmpeg -encoders' / '-muxers' (segunda columna tras el separador)."""
+    nombres = []
+    empezado = False
+    for linea in salida.splitlines():
+        if not empezado:
+            empezado = linea.strip() == separador
+            continue
+        partes = linea.split()
+        if len(partes) >= 2: nombres.append(partes[1])
+    return nombres
+
+def _sondear_ffmpeg(ruta, startup_args):
+    """Ejecuta el binario para obtener versión, encoders y muxers. Lanza excepción si no funciona."""
+    def salida(*args):
+        return subprocess.run([ruta, '-hide_banner', *args], capture_output=True, check=True, text=True,
+                              errors='replace', **startup_args).stdout
+    version = (salida('-version').splitlines() or [''])[0].strip()
+    try:
+        encoders = _nombres_listados(salida('-encoders'), '------')
+        muxers = _nombres_listados(salida('-muxers'), '--')
+    except subprocess.CalledProcessError:
+        # Builds muy recortados: se sabe que funciona, pero no qué soporta
+        encoders, muxers = [], []
+    return {'version': version, 'encoders': encoders, 'muxers': muxers}
+
+def _ruta_cache_herramientas():
+    return os.path.join(obtener_ruta_base_real(), 'cache', 'herramientas.json')
+
+def _leer_cache_herramientas():
+    try:
+        with open(_ruta_cache_herramientas(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _guardar_cache_herramientas(datos):
+    try:
+        ruta = _ruta_cache_herramientas()
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False)
+        os.replace(temporal, ruta)
+    except OSError:
+        pass
+
+def _resolver_herramientas(log_func):
+    startup_args = {}
+    if os.name == 'nt':
+        startup_args['creationflags'] = subprocess.CREATE_NO_WINDOW
+
+    guardado = _leer_cache_herramientas()
+    for ruta in _candidatos_ffmpeg():
+        try:
+            firma = _firma(ruta)
+            ffprobe = _buscar_ffprobe(ruta)
+            firma_ffprobe = _firma(ffprobe)
+        except OSError:
+            continue
+        # Mismo binario que en un arranque anterior: no hace falta ejecutarlo
+        if guardado.get('firma') == firma and guardado.get('firma_ffprobe') == firma_ffprobe:
+            log_func(f"FFmpeg (desde caché): {ruta}", nivel="debug")
+            return guardado
+        try:
+            datos = _sondear_ffmpeg(ruta, startup_args)
+        except Exception as e:
+            log_func(f"Fallo al ejecutar FFmpeg en {ruta}: {e}", nivel="warning")
+            continue
+        datos.update(ffmpeg=ruta, ffprobe=ffprobe, firma=firma, firma_ffprobe=firma_ffprobe)
+        _guardar_cache_herramientas(datos)
+        log_func(f"FFmpeg verificado: {ruta} ({datos['version']})", nivel="debug")
+        if not ffprobe:
+            log_func("FFprobe no encontrado: no se podrá analizar el contenido de los videos.", nivel="warning")
+        return datos
+    return None
+
+def obtener_herramientas(log_func=None, refrescar=False):
+    """
+    Resuelve FFmpeg una sola vez por proceso: ruta absoluta, versión, encoders, muxers y FFprobe.
+    Entre arranques se reutiliza lo guardado mientras el binario no cambie (tamaño y mtime).
+    Retorna un dict o None si FFmpeg no está disponible.
+    """
+    global _herramientas
+    with _lock_herramientas:
+        if _herramientas is None or refrescar:
+            _herramientas = _resolver_herramientas(log_func or (lambda *a, **k: None)) or {}
+        return _herramientas or None
+
+def resolver_comando(cmd):
+    """Sustituye 'ffmpeg'/'ffprobe' al inicio de un comando por el binario resuelto."""
+    herramientas = obtener_herramientas()
+    if herramientas and cmd and cmd[0] in ('ffmpeg', 'ffprobe') and herramientas.get(cmd[0]):
+        return [herramientas[cmd[0]], *cmd[1:]]
+    return list(cmd)
+
+def ffmpeg_soporta(encoder=None, muxer=None):
+    """True si el FFmpeg resuelto tiene ese encoder/muxer (o si no se pudo saber qué soporta)."""
+    herramientas = obtener_herramientas()
+    if not herramientas:
+        return False
+    if encoder and herramientas['encoders'] and encoder not in herramientas['encoders']:
+        return False
+    if muxer and herramientas['muxers'] and muxer not in herramientas['muxers']:
+        return False
+    return True
+
 def verificar_ffmpeg(log_func):
     """
-    Verifica si ffmpeg está instalado.
+    Verifica si ffmpeg está instalado (ver obtener_herramientas).
     Prioridad: 
     1. Ruta local del proyecto (portable).
     2. PATH del sistema.
     """
-    local_ffmpeg_dir = obtener_ruta_local_ffmpeg()
-    local_exe = os.path.join(local_ffmpeg_dir, 'bin', 'ffmpeg.exe')
-    
-    # 1. Verificar Localmente
-    if os.path.exists(local_exe):
-        try:
-            subprocess.run([local_exe, '-version'], 
-                           capture_output=True, 
-                           check=True, 
-                           text=True)
-            log_func(f"FFmpeg verificado en ruta local: {local_exe}", nivel="debug")
-            return True 
-        except Exception as e:
-            log_func(f"Fallo al ejecutar FFmpeg local: {e}", nivel="warning")
-            
-    # 2. Verificar en el Sistema (PATH)
-    try:
-        subprocess.run(['ffmpeg', '-version'], 
-                       capture_output=True, 
-                       check=True, 
-                       text=True)
-        log_func("FFmpeg verificado en el PATH del sistema.", nivel="debug")
-        return True 
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        pass 
-            
+    if obtener_herramientas(log_func):
+        return True
     log_func("FFmpeg no encontrado ni localmente ni en el sistema.", nivel="warning")
     return False
 
@@ -146,6 +266,7 @@ def descargar_e_instalar_ffmpeg_portable(log_func):
             # 4. Limpieza final
             shutil.rmtree(temp_extract_path)
             
+        obtener_herramientas(log_func, refrescar=True)
         print("✅ FFmpeg instalado correctamente en la carpeta del programa.")
         log_func("Instalación portable de FFmpeg completada con éxito.", nivel="info")
         return True
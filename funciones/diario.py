@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import hashlib
+from array import array
+from funciones.dependencias import obtener_ruta_base_real
+from funciones.simulacion import simular, ejecutar_plan, ACCIONES_INFORMATIVAS
+from funciones.copiado import copiar_archivo, mover_rapido
+
+# Las confirmaciones se agrupan: un fsync cada LOTE_FSYNC registros o cada INTERVALO_FSYNC segundos
+LOTE_FSYNC = 256
+INTERVALO_FSYNC = 1.0
+
+def obtener_ruta_diario(ruta):
+    """Ruta del diario de una carpeta de trabajo (carpeta 'diarios' del programa)."""
+    clave = hashlib.blake2b(os.path.abspath(ruta).encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(obtener_ruta_base_real(), 'diarios', f"{clave}.jsonl")
+
+class Diario:
+    """
+    Diario de escritura anticipada (append-only, JSONL) de una ejecución.
+    Primero se escribe el plan completo (qué se va a hacer) y se fuerza a disco; después,
+    cada acción terminada se confirma. Si el programa muere, el diario indica exactamente
+    qué falta, sin volver a recorrer ni a hashear la carpeta.
+    """
+    def __init__(self, ruta_diario, nuevo=False):
+        self.ruta_diario = ruta_diario
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_diario)), exist_ok=True)
+        self.archivo = open(ruta_diario, 'w' if nuevo else 'a', encoding='utf-8')
+        self.sin_sincronizar = 0
+        self.ultimo_fsync = time.monotonic()
+        self.acciones = 0
+
+    def _escribir(self, registro, forzar=False):
+        self.archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self.sin_sincronizar += 1
+        if forzar or self.sin_sincronizar >= LOTE_FSYNC or time.monotonic() - self.ultimo_fsync >= INTERVALO_FSYNC:
+            self.sincronizar()
+
+    def sincronizar(self):
+        self.archivo.flush()
+        os.fsync(self.archivo.fileno())
+        self.sin_sincronizar = 0
+        self.ultimo_fsync = time.monotonic()
+
+    def cabecera(self, ruta, herramienta):
+        self._escribir({'registro': 'cabecera', 'ruta': os.path.abspath(ruta), 'herramienta': herramienta, 'fecha': time.time()})
+
+    def anotar(self, accion):
+        """Añade una acción al plan y devuelve su número."""
+        self.acciones += 1
+        self._escribir({'registro': 'accion', 'n': self.acciones, **accion})
+        return self.acciones
+
+    def plan_completo(self, resultado):
+        # A partir de aquí se puede tocar el disco: el plan entero ya es persistente
+        self._escribir({'registro': 'plan_completo', 'acciones': self.acciones, 'resultado': resultado}, forzar=True)
+
+    def confirmar(self, n, error=None):
+        registro = {'registro': 'hecho', 'n': n}
+        if error: registro['error'] = error
+        self._escribir(registro)
+
+    def fin(self, tipo='fin'):
+        self._escribir({'registro': tipo}, forzar=True)
+
+    def cerrar(self):
+        if not self.archivo.closed:
+            self.sincronizar()
+            self.archivo.close()
+
+def leer_estado(ruta_diario):
+    """
+    Resume un diario: estado ('sin_diario', 'incompleto', 'pendiente', 'terminado' o 'deshecho'),
+    cabecera, resultado simulado, total de acciones y números confirmados (con y sin error).
+    """
+    estado = {'estado': 'sin_diario', 'cabecera': None, 'resultado': None, 'acciones': 0, 'hechas': set(), 'fallidas': set()}
+    if not os.path.exists(ruta_diario):
+        return estado
+    estado['estado'] = 'incompleto'
+    with open(ruta_diario, 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                # Última línea a medio escribir cuando se cortó el proceso
+                continue
+            tipo = registro.get('registro')
+            if tipo == 'cabecera':
+                estado['cabecera'] = registro
+            elif tipo == 'plan_completo':
+                estado['estado'] = 'pendiente'
+                estado['acciones'] = registro['acciones']
+                estado['resultado'] = registro.get('resultado')
+            elif tipo == 'hecho':
+                (estado['fallidas'] if registro.get('error') else estado['hechas']).add(registro['n'])
+            elif tipo in ('fin', 'deshecho'):
+                estado['estado'] = 'terminado' if tipo == 'fin' else 'deshecho'
+    return estado
+
+def estado_diario(ruta):
+    """Estado del diario de una carpeta: 'pendiente' significa que una ejecución se interrumpió."""
+    return leer_estado(obtener_ruta_diario(ruta))['estado']
+
+def _acciones_del_diario(ruta_diario, saltar):
+    """Genera las acciones del plan (con su número 'n') que no están en 'saltar'."""
+    with open(ruta_diario, 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                continue
+            if registro.get('registro') == 'accion' and registro['n'] not in saltar:
+                registro.pop('registro')
+                yield registro
+
+def _ejecutar_pendientes(ruta_diario, estado, log_func, update_callback, cancel_event, reanudando, procesos=None):
+    confirmadas = estado['hechas'] | estado['fallidas']
+    diario = Diario(ruta_diario)
+    try:
+        res = ejecutar_plan(_acciones_del_diario(ruta_diario, confirmadas), log_func, update_callback, cancel_event,
+                            total=estado['acciones'] - len(confirmadas), diario=diario, reanudando=reanudando,
+                            procesos=procesos)
+        if cancel_event and cancel_event.is_set():
+            return {}
+        diario.fin()
+    finally:
+        diario.cerrar()
+    resultado = dict(estado['resultado'] or {})
+    if res.get('acciones_fallidas'):
+        resultado['acciones_fallidas'] = res['acciones_fallidas']
+    return resultado
+
+def ejecutar_con_diario(func, ruta, log_func, *args, update_callback=None, cancel_event=None, al_ejecutar=None, **opciones):
+    """
+    Ejecuta una herramienta con diario: primero la simula (sin tocar el disco) escribiendo cada
+    acción en el diario, fuerza el plan a disco y solo entonces lo aplica confirmando cada paso.
+    'al_ejecutar()' se llama al terminar la simulación, justo antes de tocar el disco.
+    Si la herramienta recibe 'procesos', también limita las conversiones FFmpeg simultáneas al aplicar.
+    Retorna el mismo diccionario que la herramienta.
+    """
+    ruta_diario = obtener_ruta_diario(ruta)
+    diario = Diario(ruta_diario, nuevo=True)
+    resultado = None
+    try:
+        diario.cabecera(ruta, getattr(func, '__name__', str(func)))
+        for accion in simular(func, ruta, log_func, *args, update_callback=update_callback, cancel_event=cancel_event, **opciones):
+            if accion['accion'] == 'resultado':
+                resultado = accion['resultado']
+            else:
+                diario.anotar(accion)
+        if (cancel_event and cancel_event.is_set()) or (resultado or {}).get('error'):
+            # Nada se llegó a tocar: el diario no sirve para reanudar
+            diario.cerrar()
+            os.remove(ruta_diario)
+            return resultado or {}
+        diario.plan_completo(resultado or {})
+    finally:
+        diario.cerrar()
+
+    if al_ejecutar: al_ejecutar()
+    return _ejecutar_pendientes(ruta_diario, leer_estado(ruta_diario), log_func, update_callback, cancel_event,
+                                reanudando=False, procesos=opciones.get('procesos'))
+
+def reanudar_diario(ruta, log_func, update_callback=None, cancel_event=None):
+    """Continúa una ejecución interrumpida desde la última acción confirmada en su diario."""
+    ruta_diario = obtener_ruta_diario(ruta)
+    estado = leer_estado(ruta_diario)
+    if estado['estado'] != 'pendiente':
+        return {'error': 'No hay ninguna ejecución interrumpida que reanudar en esta carpeta.'}
+    log_func(f"Reanudando: {len(estado['hechas'])} de {estado['acciones']} acciones ya estaban hechas.", nivel="info")
+    res = _ejecutar_pendientes(ruta_diario, estado, log_func, update_callback, cancel_event, reanudando=True)
+    if res: res['acciones_reanudadas'] = estado['acciones'] - len(estado['hechas']) - len(estado['fallidas'])
+    return res
+
+def _deshacer_accion(accion, copias):
+    """Aplica la operación inversa de una acción ya hecha. Retorna False si no se puede deshacer."""
+    tipo = accion['accion']
+    origen = accion.get('origen')
+    destino = accion.get('destino')
+
+    if tipo == 'mover':
+        if os.path.lexists(origen):
+            raise FileExistsError(f"El origen vuelve a estar ocupado: {origen}")
+        os.makedirs(os.path.dirname(origen), exist_ok=True)
+        mover_rapido(destino, origen)
+    elif tipo == 'crear_directorio':
+        try: os.rmdir(destino)
+        except OSError: pass
+    elif tipo == 'borrar_directorio':
+        os.makedirs(origen, exist_ok=True)
+    elif tipo == 'backup':
+        os.remove(destino)
+    elif tipo in ('convertir', 'unir'):
+        if os.path.exists(destino): os.remove(destino)
+    elif tipo == 'optimizar':
+        # Se recupera el original desde su backup en 'sin_edit' (si aún existe)
+        copia = copias.get(origen)
+        if not copia or not os.path.exists(copia): return False
+        # El backup puede ser un hardlink: se restaura por sustitución, sin reescribir en su sitio
+        if not (os.path.exists(origen) and os.path.samefile(copia, origen)):
+            temporal = os.path.join(os.path.dirname(origen), f".{os.path.basename(origen)}.orgest_tmp")
+            copiar_archivo(copia, temporal)
+            os.replace(temporal, origen)
+        if destino and destino != origen and os.path.exists(destino): os.remove(destino)
+    elif tipo == 'enlazar':
+        # El duplicado vuelve a ser un archivo independiente con el mismo contenido
+        temporal = os.path.join(os.path.dirname(origen), f".{os.path.basename(origen)}.orgest_tmp")
+        copiar_archivo(origen, temporal)
+        os.replace(temporal, origen)
+    else:
+        # 'borrar_arbol' no tiene vuelta atrás
+        return False
+    return True
+
+def deshacer_diario(ruta, log_func, update_callback=None, cancel_event=None):
+    """
+    Deshace la última ejecución con diario de una carpeta, recorriendo sus acciones confirmadas
+    de la última a la primera. Las carpetas temporales ya borradas no se pueden recuperar.
+    """
+    ruta_diario = obtener_ruta_diario(ruta)
+    estado = leer_estado(ruta_diario)
+    if estado['estado'] not in ('pendiente', 'terminado'):
+        return {'error': 'No hay ninguna ejecución que deshacer en esta carpeta.'}
+
+    # Posiciones en el archivo de las acciones hechas (para leerlas al revés sin cargarlas todas)
+    posiciones = array('q')
+    copias = {}
+    with open(ruta_diario, 'rb') as f:
+        while True:
+            posicion = f.tell()
+            linea = f.readline()
+            if not linea: break
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                continue
+            if registro.get('registro') == 'accion' and registro['n'] in estado['hechas']:
+                if registro['accion'] not in ACCIONES_INFORMATIVAS:
+                    posiciones.append(posicion)
+                if registro['accion'] == 'backup':
+                    copias[registro['origen']] = registro['destino']
+
+    deshechas = 0
+    irreversibles = 0
+    fallidas = 0
+    total = len(posiciones)
+    with open(ruta_diario, 'rb') as f:
+        for i, posicion in enumerate(reversed(posiciones), 1):
+            if cancel_event and cancel_event.is_set():
+                return {}
+            f.seek(posicion)
+            accion = json.loads(f.readline())
+            try:
+                if _deshacer_accion(accion, copias): deshechas += 1
+                else: irreversibles += 1
+            except Exception as e:
+                fallidas += 1
+                log_func(f"No se pudo deshacer {accion['accion']} ({accion.get('origen')}): {e}", nivel="error")
+            if update_callback: update_callback(i, total, accion['accion'])
+
+    diario = Diario(ruta_diario)
+    diario.fin('deshecho')
+    diario.cerrar()
+    if update_callback and not (cancel_event and cancel_event.is_set()):
+        update_callback(1, 1, "")
+    return {'acciones_deshechas': deshechas, 'acciones_irreversibles': irreversibles, 'acciones_fallidas': fallidas}
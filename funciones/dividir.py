@@ -1,11 +1,12 @@
 import os
-import shutil
 from typing import List, Dict, Union
+from funciones.inventario import recorrer, mover_archivo, crear_directorio
 
-def organizar_archivos_en_subcarpetas(ruta_carpeta: str, log_func, cantidad_archivos: int, update_callback=None, cancel_event=None):
+def organizar_archivos_en_subcarpetas(ruta_carpeta: str, log_func, cantidad_archivos: int, update_callback=None, cancel_event=None, inventario=None):
     """
     Agrupa los archivos de una carpeta en subcarpetas numeradas (0001, 0002...)
     con un límite de 'cantidad_archivos' por carpeta.
+    Con un 'inventario' (p. ej. en simulación) se lista y se actualiza en memoria.
     """
     
     if not os.path.isdir(ruta_carpeta):
@@ -21,10 +22,14 @@ def organizar_archivos_en_subcarpetas(ruta_carpeta: str, log_func, cantidad_arch
     archivos = []
     
     try:
-        for f in os.listdir(ruta_carpeta):
-            full_path = os.path.join(ruta_carpeta, f)
-            if os.path.isfile(full_path) and f not in ignorar:
-                archivos.append(f)
+        if inventario:
+            _, _, nombres = next(recorrer(ruta_carpeta, inventario), (None, [], []))
+            archivos = [f for f in nombres if f not in ignorar]
+        else:
+            for f in os.listdir(ruta_carpeta):
+                full_path = os.path.join(ruta_carpeta, f)
+                if os.path.isfile(full_path) and f not in ignorar:
+                    archivos.append(f)
     except Exception as e:
         return {'error': f'Error leyendo directorio: {e}'}
 
@@ -40,7 +45,7 @@ def organizar_archivos_en_subcarpetas(ruta_carpeta: str, log_func, cantidad_arch
     
     nombre_carpeta = f"{numero_carpeta:04d}"
     ruta_subcarpeta = os.path.join(ruta_carpeta, nombre_carpeta)
-    os.makedirs(ruta_subcarpeta, exist_ok=True)
+    crear_directorio(ruta_subcarpeta, inventario)
     carpetas_creadas += 1
     
     for i, archivo in enumerate(archivos, 1):
@@ -51,7 +56,7 @@ def organizar_archivos_en_subcarpetas(ruta_carpeta: str, log_func, cantidad_arch
             numero_carpeta += 1
             nombre_carpeta = f"{numero_carpeta:04d}"
             ruta_subcarpeta = os.path.join(ruta_carpeta, nombre_carpeta)
-            os.makedirs(ruta_subcarpeta, exist_ok=True)
+            crear_directorio(ruta_subcarpeta, inventario)
             carpetas_creadas += 1
             contador_archivos_carpeta = 0  
 
@@ -59,11 +64,12 @@ def organizar_archivos_en_subcarpetas(ruta_carpeta: str, log_func, cantidad_arch
         ruta_destino = os.path.join(ruta_subcarpeta, archivo)
         
         try:
-            if os.path.exists(ruta_destino):
+            existe = inventario.existe(ruta_destino) if inventario else os.path.exists(ruta_destino)
+            if existe:
                 base, ext = os.path.splitext(archivo)
                 ruta_destino = os.path.join(ruta_subcarpeta, f"{base}_dup{ext}")
 
-            shutil.move(ruta_origen, ruta_destino)
+            mover_archivo(ruta_origen, ruta_destino, inventario)
             total_movidos += 1
             contador_archivos_carpeta += 1
         except Exception as e:
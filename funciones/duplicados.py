@@ -1,96 +1,427 @@
 import os
-import shutil
 import hashlib
+import mmap
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from funciones.cache_hashes import abrir_cache_hashes
+from funciones.enlaces import reemplazar_por_enlace
+from funciones.inventario import recorrer, mover_archivo, crear_directorio, simulando
+from funciones.nombres import AsignadorNombres
+from funciones.flujo import iniciar_flujo, reportar_progreso
 
-def calcular_hash_archivo(ruta_archivo, log_func):
-    """Calcula el hash MD5 de un archivo leyendo por bloques."""
-    hasher = hashlib.md5()
+# Bytes leídos al inicio y al final del archivo en el hash parcial (fase 2)
+TAMANO_BLOQUE_PARCIAL = 64 * 1024
+# Lectura con buffers grandes; por encima del umbral el archivo se mapea en memoria
+TAMANO_BUFFER_HASH = 1024 * 1024
+UMBRAL_MMAP = 64 * 1024 * 1024
+# Algoritmos disponibles. Cada hash se guarda como "algoritmo:hex" para que
+# nunca se comparen resultados de algoritmos distintos.
+ALGORITMOS_HASH = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'blake2b': hashlib.blake2b,
+    'blake2s': hashlib.blake2s,
+}
+ALGORITMO_POR_DEFECTO = 'blake2b'
+# hashlib libera el GIL, así que varios hilos aprovechan mejor discos NVMe/RAID
+HILOS_HASH = min(8, os.cpu_count() or 1)
+
+def _volcar_en_hasher(archivo, hasher, tamano, cancel_event=None):
+    """Pasa todo el contenido de un archivo abierto al hasher. Retorna False si se cancela a mitad."""
+    if tamano >= UMBRAL_MMAP:
+        try:
+            with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                paso = TAMANO_BUFFER_HASH * 8
+                for inicio in range(0, len(mapa), paso):
+                    if cancel_event and cancel_event.is_set():
+                        return False
+                    with memoryview(mapa)[inicio:inicio + paso] as trozo:
+                        hasher.update(trozo)
+            return True
+        except (OSError, ValueError):
+            # mmap no disponible (p. ej. algunas unidades de red): lectura normal
+            archivo.seek(0)
+            
+    buffer = bytearray(TAMANO_BUFFER_HASH)
+    with memoryview(buffer) as vista:
+        while True:
+            if cancel_event and cancel_event.is_set():
+                return False
+            leidos = archivo.readinto(buffer)
+            if not leidos: break
+            hasher.update(vista[:leidos])
+    return True
+
+def crear_hasher(algoritmo):
+    """Instancia el hasher del registro. Lanza ValueError si el algoritmo no existe."""
+    if algoritmo not in ALGORITMOS_HASH:
+        raise ValueError(f"Algoritmo de hash desconocido: {algoritmo}")
+    return ALGORITMOS_HASH[algoritmo]()
+
+def calcular_hash_archivo(ruta_archivo, log_func, cache=None, st=None, cancel_event=None, algoritmo=ALGORITMO_POR_DEFECTO):
+    """
+    Calcula el hash de un archivo leyendo por bloques grandes (o con mmap si es muy grande).
+    Si se pasa un 'cache', reutiliza el hash guardado mientras el archivo no cambie.
+    Retorna "algoritmo:hex", o None si el archivo está vacío, falla la lectura o se cancela.
+    """
+    hasher = crear_hasher(algoritmo)
     try:
-        if not os.path.exists(ruta_archivo) or os.path.getsize(ruta_archivo) == 0:
+        if st is None:
+            if not os.path.exists(ruta_archivo): return None
+            st = os.stat(ruta_archivo)
+        if st.st_size == 0:
             return None
+        if cache:
+            guardado = cache.consultar(ruta_archivo, st, 'completo', algoritmo)
+            if guardado: return guardado
         with open(ruta_archivo, 'rb') as archivo:
-            for bloque in iter(lambda: archivo.read(4096), b""):
-                hasher.update(bloque)
-        return hasher.hexdigest()
+            if not _volcar_en_hasher(archivo, hasher, st.st_size, cancel_event):
+                return None
+        digest = f"{algoritmo}:{hasher.hexdigest()}"
+        if cache: cache.guardar(ruta_archivo, st, 'completo', algoritmo, digest)
+        return digest
     except Exception as e:
         log_func(f"Error hash {ruta_archivo}: {e}", nivel="error")
         return None
 
-def encontrar_archivos(ruta):
-    """Encuentra recursivamente todos los archivos válidos a procesar."""
-    archivos_validos = []
+def calcular_hash_parcial(ruta_archivo, st, log_func, cache=None, algoritmo=ALGORITMO_POR_DEFECTO):
+    """
+    Calcula un hash rápido usando solo el bloque inicial y el final del archivo.
+    Si el archivo cabe en ambos bloques se lee completo (el resultado equivale al hash total).
+    """
+    hasher = crear_hasher(algoritmo)
+    try:
+        if cache:
+            guardado = cache.consultar(ruta_archivo, st, 'parcial', algoritmo)
+            if guardado: return guardado
+        with open(ruta_archivo, 'rb') as archivo:
+            if st.st_size <= 2 * TAMANO_BLOQUE_PARCIAL:
+                hasher.update(archivo.read())
+            else:
+                hasher.update(archivo.read(TAMANO_BLOQUE_PARCIAL))
+                archivo.seek(-TAMANO_BLOQUE_PARCIAL, os.SEEK_END)
+                hasher.update(archivo.read(TAMANO_BLOQUE_PARCIAL))
+        digest = f"{algoritmo}:{hasher.hexdigest()}"
+        if cache: cache.guardar(ruta_archivo, st, 'parcial', algoritmo, digest)
+        return digest
+    except Exception as e:
+        log_func(f"Error hash parcial {ruta_archivo}: {e}", nivel="error")
+        return None
+
+def calcular_en_paralelo(elementos, calcular, hilos=None, cancel_event=None):
+    """
+    Ejecuta 'calcular' sobre cada elemento en un pool de hilos y genera (elemento, resultado)
+    en el mismo orden de entrada. Solo mantiene unas pocas tareas en vuelo por hilo.
+    """
+    hilos = hilos or HILOS_HASH
+    if hilos <= 1:
+        for e in elementos:
+            if cancel_event and cancel_event.is_set(): return
+            yield e, calcular(e)
+        return
+        
+    pool = ThreadPoolExecutor(max_workers=hilos)
+    iterador = iter(elementos)
+    en_vuelo = deque()
+    try:
+        for e in iterador:
+            en_vuelo.append((e, pool.submit(calcular, e)))
+            if len(en_vuelo) >= hilos * 4: break
+            
+        while en_vuelo:
+            if cancel_event and cancel_event.is_set(): return
+            e, futuro = en_vuelo.popleft()
+            yield e, futuro.result()
+            for siguiente in iterador:
+                en_vuelo.append((siguiente, pool.submit(calcular, siguiente)))
+                break
+    finally:
+        # Las tareas en curso revisan cancel_event por bloque, así que terminan enseguida
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def iterar_archivos(ruta, inventario=None):
+    """Genera recursivamente los archivos válidos a procesar, a medida que se descubren."""
     ignorar = ["funciones", "logs"]
-    for root, _, files in os.walk(ruta):
+    for root, _, files in recorrer(ruta, inventario):
         if os.path.basename(root) in ignorar: continue
         for f in files:
-            archivos_validos.append(os.path.join(root, f))
+            yield os.path.join(root, f)
+
+def encontrar_archivos(ruta, inventario=None):
+    """Encuentra recursivamente todos los archivos válidos a procesar."""
+    archivos_validos = list(iterar_archivos(ruta, inventario))
     return archivos_validos, len(archivos_validos)
 
-def encontrar_duplicados(ruta, log_func, update_callback=None, cancel_event=None):
-    """Genera una lista de rutas de archivos que tienen contenido idéntico (hash duplicado)."""
-    archivos_validos, total_archivos = encontrar_archivos(ruta)
-    
-    hashes = {}
-    duplicados = []
-    
-    archivos_procesados = 0
+def _subdividir_grupos(grupos, tipo, algoritmo, calcular, stats, cache, hilos, fase, update_callback=None, cancel_event=None):
+    """
+    Calcula el hash 'tipo' de cada archivo de cada grupo y lo parte según el resultado.
+    Los aciertos del caché se resuelven aquí; el resto se reparte entre los hilos.
+    Descarta los hashes nulos (errores) y los subgrupos de un solo archivo.
+    Retorna None si se cancela.
+    """
+    total = sum(len(g) for g in grupos)
+    claves = {}
+    pendientes = []
     
-    for full_path in archivos_validos:
-        if cancel_event and cancel_event.is_set():
-            return []
-            
-        h = calcular_hash_archivo(full_path, log_func)
-        
-        if h:
-            if h in hashes:
-                duplicados.append(full_path)
+    # El caché SQLite solo se usa desde este hilo
+    for grupo in grupos:
+        for full_path in grupo:
+            guardado = cache.consultar(full_path, stats[full_path], tipo, algoritmo) if cache else None
+            if guardado:
+                claves[full_path] = guardado
             else:
-                hashes[h] = full_path
+                pendientes.append(full_path)
+                
+    procesados = len(claves)
+    if update_callback and procesados:
+        update_callback(procesados, total, f"{fase}: {procesados} en caché")
         
-        archivos_procesados += 1
+    for full_path, digest in calcular_en_paralelo(pendientes, calcular, hilos, cancel_event):
+        if cancel_event and cancel_event.is_set():
+            return None
+        if digest:
+            claves[full_path] = digest
+            if cache: cache.guardar(full_path, stats[full_path], tipo, algoritmo, digest)
+            
+        procesados += 1
         if update_callback:
-            update_callback(archivos_procesados, total_archivos, os.path.basename(full_path))
+            update_callback(procesados, total, f"{fase}: {os.path.basename(full_path)}")
+            
+    if cancel_event and cancel_event.is_set():
+        return None
+        
+    resultado = []
+    for grupo in grupos:
+        por_clave = {}
+        for full_path in grupo:
+            if full_path in claves:
+                por_clave.setdefault(claves[full_path], []).append(full_path)
+        resultado.extend(g for g in por_clave.values() if len(g) > 1)
+    return resultado
+
+def _agrupar(ruta, log_func, update_callback, cancel_event, cache, hilos, algoritmo, enlaces, inventario):
+    """Implementación de agrupar_duplicados. Retorna (grupos, orden de recorrido) o None si se cancela."""
+    crear_hasher(algoritmo)
+    flujo = iniciar_flujo(iterar_archivos(ruta, inventario), inventario)
+    orden = {}
+    stats = {}
+    
+    # --- FASE 1: Tamaño (e inodo), solapada con el recorrido ---
+    # En cuanto un tamaño tiene dos archivos, sus hashes parciales se encargan al pool
+    # mientras el recorrido continúa.
+    por_tamano = {}
+    representantes = {}
+    enlaces_omitidos = 0
+    parciales = {}
+    futuros = {}
+    pool = ThreadPoolExecutor(max_workers=hilos or HILOS_HASH)
+    
+    def encargar_parcial(p):
+        guardado = cache.consultar(p, stats[p], 'parcial', algoritmo) if cache else None
+        if guardado:
+            parciales[p] = guardado
+        else:
+            futuros[p] = pool.submit(calcular_hash_parcial, p, stats[p], log_func, algoritmo=algoritmo)
+    
+    try:
+        for full_path in flujo:
+            if cancel_event and cancel_event.is_set():
+                return None
+            orden[full_path] = len(orden)
+            try:
+                st = inventario.stat(full_path) if inventario else os.stat(full_path)
+            except OSError:
+                st = None
+            # Los archivos vacíos nunca se consideran duplicados
+            if st and st.st_size > 0:
+                inodo = (st.st_dev, st.st_ino)
+                if st.st_ino and inodo in representantes:
+                    enlaces_omitidos += 1
+                    if enlaces is not None:
+                        enlaces.setdefault(representantes[inodo], []).append(full_path)
+                else:
+                    representantes[inodo] = full_path
+                    stats[full_path] = st
+                    mismo_tamano = por_tamano.setdefault(st.st_size, [])
+                    mismo_tamano.append(full_path)
+                    if len(mismo_tamano) == 2:
+                        encargar_parcial(mismo_tamano[0])
+                    if len(mismo_tamano) >= 2:
+                        encargar_parcial(full_path)
+                        
+            reportar_progreso(update_callback, len(orden), flujo, f"Fase 1/3: {os.path.basename(full_path)}")
             
+        candidatos = [g for g in por_tamano.values() if len(g) > 1]
+        if cache:
+            purgadas = cache.purgar(ruta, orden)
+            if purgadas: log_func(f"Caché de hashes: {purgadas} entradas de archivos eliminados.", nivel="debug")
+        log_func(f"Duplicados fase 1: {len(orden)} archivos, {enlaces_omitidos} hardlinks omitidos, {sum(len(g) for g in candidatos)} candidatos por tamaño.", nivel="debug")
+        
+        # --- FASE 2: Hash parcial (recoger los resultados encargados) ---
+        total = sum(len(g) for g in candidatos)
+        procesados = 0
+        siguientes = []
+        for grupo in candidatos:
+            por_clave = {}
+            for full_path in grupo:
+                if cancel_event and cancel_event.is_set():
+                    return None
+                if full_path in futuros:
+                    digest = futuros.pop(full_path).result()
+                    if digest:
+                        parciales[full_path] = digest
+                        if cache: cache.guardar(full_path, stats[full_path], 'parcial', algoritmo, digest)
+                if full_path in parciales:
+                    por_clave.setdefault(parciales[full_path], []).append(full_path)
+                    
+                procesados += 1
+                if update_callback:
+                    update_callback(procesados, total, f"Fase 2/3: {os.path.basename(full_path)}")
+            siguientes.extend(g for g in por_clave.values() if len(g) > 1)
+        candidatos = siguientes
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    
+    # Los archivos pequeños ya se leyeron completos en la fase 2
+    confirmados = [g for g in candidatos if stats[g[0]].st_size <= 2 * TAMANO_BLOQUE_PARCIAL]
+    pendientes = [g for g in candidatos if stats[g[0]].st_size > 2 * TAMANO_BLOQUE_PARCIAL]
+    log_func(f"Duplicados fase 2: {len(confirmados)} grupos confirmados, {sum(len(g) for g in pendientes)} archivos a hash completo.", nivel="debug")
+    
+    # --- FASE 3: Hash completo ---
+    pendientes = _subdividir_grupos(
+        pendientes, 'completo', algoritmo,
+        lambda p: calcular_hash_archivo(p, log_func, st=stats[p], cancel_event=cancel_event, algoritmo=algoritmo),
+        stats, cache, hilos, "Fase 3/3", update_callback, cancel_event
+    )
+    if pendientes is None: return None
+    
+    grupos = [sorted(g, key=orden.get) for g in confirmados + pendientes]
+    grupos.sort(key=lambda g: orden[g[0]])
+    return grupos, orden
+
+def agrupar_duplicados(ruta, log_func, update_callback=None, cancel_event=None, cache=None, hilos=None, algoritmo=ALGORITMO_POR_DEFECTO, enlaces=None, inventario=None):
+    """
+    Detecta grupos de archivos idénticos en tres fases:
+    1. Agrupa por tamaño (un tamaño único no puede tener duplicados).
+       Los hardlinks de un mismo inodo cuentan una sola vez: no ocupan espacio extra.
+    2. Hash parcial (inicio y final) de los candidatos con el mismo tamaño.
+       Empieza durante el recorrido, en cuanto aparece el segundo archivo de un tamaño.
+    3. Hash completo solo de los que siguen coincidiendo.
+    Cada grupo conserva el orden de recorrido: su primer elemento es el original.
+    Con 'cache', los archivos sin cambios no se vuelven a leer; 'hilos' fija el tamaño del pool.
+    Si se pasa el diccionario 'enlaces', se llena con las rutas extra de cada inodo
+    (ruta representante -> otras rutas con el mismo inodo).
+    Con 'inventario' se usan sus stats en caché en lugar de volver a consultar el disco.
+    Retorna None si se cancela.
+    """
+    resultado = _agrupar(ruta, log_func, update_callback, cancel_event, cache, hilos, algoritmo, enlaces, inventario)
+    return resultado[0] if resultado else None
+
+def encontrar_duplicados(ruta, log_func, update_callback=None, cancel_event=None, cache=None, hilos=None, algoritmo=ALGORITMO_POR_DEFECTO, inventario=None):
+    """Genera una lista de rutas de archivos que tienen contenido idéntico (hash duplicado)."""
+    resultado = _agrupar(ruta, log_func, update_callback, cancel_event, cache, hilos, algoritmo, None, inventario)
+    if resultado is None:
+        return []
+    grupos, orden = resultado
+    
+    # Se conserva el orden de recorrido, igual que la comparación secuencial por hash
+    duplicados = [p for g in grupos for p in g[1:]]
+    duplicados.sort(key=orden.get)
     return duplicados
 
-def eliminar_duplicados(ruta, log_func, modo_automatico=False, update_callback=None, cancel_event=None):
+def eliminar_duplicados(ruta, log_func, modo_automatico=False, update_callback=None, cancel_event=None, hilos=None, algoritmo=ALGORITMO_POR_DEFECTO, accion='mover', inventario=None):
     """
-    Identifica archivos duplicados y los mueve a una carpeta 'basura'.
-    Renombra si hay colisiones de nombres en el destino.
+    Identifica archivos duplicados y los resuelve según 'accion':
+    - 'mover': los mueve a una carpeta 'basura', renombrando si hay colisiones.
+    - 'enlazar': los reemplaza en su sitio por un reflink o hardlink al original
+      (mismo sistema de archivos). Recupera espacio sin mover ni copiar datos.
+    Si recibe un 'inventario' compartido lo usa para recorrer y lo mantiene actualizado.
+    Con un inventario en simulación (dry-run) solo se registran las acciones.
     """
-    dups = encontrar_duplicados(ruta, log_func, update_callback, cancel_event)
+    if algoritmo not in ALGORITMOS_HASH:
+        return {'error': f'Algoritmo de hash desconocido: {algoritmo}'}
+    if accion not in ('mover', 'enlazar'):
+        return {'error': f'Acción desconocida para duplicados: {accion}'}
+        
+    enlaces = {}
+    cache = abrir_cache_hashes(log_func)
+    try:
+        resultado = _agrupar(ruta, log_func, update_callback, cancel_event, cache, hilos, algoritmo, enlaces, inventario)
+    finally:
+        if cache: cache.cerrar()
     
-    if cancel_event and cancel_event.is_set():
+    if resultado is None or (cancel_event and cancel_event.is_set()):
         return {}
+    grupos, orden = resultado
         
+    # (duplicado, original) en orden de recorrido
+    dups = sorted(((p, g[0]) for g in grupos for p in g[1:]), key=lambda par: orden[par[0]])
     movidos = 0
+    enlazados = {'reflink': 0, 'hardlink': 0}
+    no_enlazados = 0
+    bytes_recuperados = 0
     
     if dups:
         basura = os.path.join(ruta, "basura")
-        os.makedirs(basura, exist_ok=True)
+        asignador = AsignadorNombres(inventario)
+        if accion == 'mover':
+            crear_directorio(basura, inventario)
+        conservados = set()
+        # original -> hash completo (solo en simulación, para las acciones 'enlazar' del plan)
+        digests = {}
         
         if update_callback:
-            update_callback(0, 1, f"Duplicados encontrados: {len(dups)}. Moviendo a 'basura'...")
+            destino_txt = "Moviendo a 'basura'" if accion == 'mover' else "Enlazando"
+            update_callback(0, 1, f"Duplicados encontrados: {len(dups)}. {destino_txt}...")
             
         total_dups = len(dups)
         dups_movidos = 0
         
-        for d in dups:
+        for d, original in dups:
             if cancel_event and cancel_event.is_set():
                 return {}
                 
+            nombre = os.path.basename(d)
+            if simulando(inventario):
+                if original not in conservados:
+                    conservados.add(original)
+                    inventario.plan.registrar('conservar', origen=original)
+                inventario.plan.registrar('descartar', origen=d, original=original)
             try:
-                nombre = os.path.basename(d)
-                dest = os.path.join(basura, nombre)
-                c = 1
-                while os.path.exists(dest):
-                    n, e = os.path.splitext(nombre)
-                    dest = os.path.join(basura, f"{n}_{c}{e}")
-                    c += 1
-                shutil.move(d, dest)
-                movidos += 1
+                if accion == 'mover':
+                    dest = asignador.reservar(basura, nombre)
+                    mover_archivo(d, dest, inventario)
+                    asignador.liberar(d)
+                    movidos += 1
+                else:
+                    # Se reemplazan todas las rutas del inodo duplicado; si quedara
+                    # alguna, sus datos seguirían ocupando espacio
+                    tamano = inventario.stat(d).st_size if inventario else os.path.getsize(d)
+                    rutas_inodo = [d] + enlaces.get(d, [])
+                    if simulando(inventario):
+                        # Huella de ambos archivos: al ejecutar el plan no se enlaza si alguno cambió
+                        st_original = inventario.stat(original)
+                        if original not in digests:
+                            digests[original] = calcular_hash_archivo(original, log_func, st=st_original, algoritmo=algoritmo)
+                        for p in rutas_inodo:
+                            inventario.plan.registrar('enlazar', origen=p, destino=original, tamano=st_original.st_size,
+                                                      mtime_ns_origen=inventario.stat(p).st_mtime_ns,
+                                                      mtime_ns_destino=st_original.st_mtime_ns, hash=digests[original])
+                        tipos = ['hardlink'] * len(rutas_inodo)
+                    else:
+                        tipos = [reemplazar_por_enlace(p, original) for p in rutas_inodo]
+                    if inventario:
+                        for p, tipo in zip(rutas_inodo, tipos):
+                            if tipo: inventario.agregar(p)
+                    for tipo in filter(None, tipos):
+                        enlazados[tipo] += 1
+                    if all(tipos):
+                        bytes_recuperados += tamano
+                    else:
+                        no_enlazados += tipos.count(None)
+                        log_func(f"No se pudo enlazar {d} (otro sistema de archivos o sin soporte).", nivel="warning")
             except Exception as e:
-                log_func(f"Fallo moviendo duplicado {d}: {e}", nivel="error")
+                log_func(f"Fallo procesando duplicado {d}: {e}", nivel="error")
             
             dups_movidos += 1
             if total_dups > 0 and update_callback:
@@ -98,9 +429,22 @@ def eliminar_duplicados(ruta, log_func, modo_automatico=False, update_callback=N
                 
     if update_callback and not (cancel_event and cancel_event.is_set()):
         update_callback(1, 1, "")
-                
-    return {'duplicados_eliminados': movidos}
+        
+    resultado = {
+        'duplicados_eliminados': movidos,
+        'algoritmo': algoritmo,
+        'cache_aciertos': cache.aciertos if cache else 0,
+        'cache_fallos': cache.fallos if cache else 0
+    }
+    if accion == 'enlazar':
+        resultado.update({
+            'duplicados_reflink': enlazados['reflink'],
+            'duplicados_hardlink': enlazados['hardlink'],
+            'duplicados_no_enlazados': no_enlazados,
+            'bytes_recuperados': bytes_recuperados
+        })
+    return resultado
 
-def verificar_duplicados(ruta, log_func, modo_automatico=False, update_callback=None, cancel_event=None):
+def verificar_duplicados(ruta, log_func, modo_automatico=False, update_callback=None, cancel_event=None, hilos=None, algoritmo=ALGORITMO_POR_DEFECTO, accion='mover', inventario=None):
     """Alias de compatibilidad para eliminar_duplicados."""
-    return eliminar_duplicados(ruta, log_func, modo_automatico, update_callback, cancel_event)
\ No newline at end of file
+    return eliminar_duplicados(ruta, log_func, modo_automatico, update_callback, cancel_event, hilos, algoritmo, accion, inventario)
\ No newline at end of file
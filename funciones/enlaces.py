@@ -0,0 +1,63 @@
+import os
+import shutil
+
+# ioctl FICLONE de Linux (Btrfs, XFS con reflink, bcachefs...)
+FICLONE = 0x40049409
+
+def clonar_reflink(origen, destino):
+    """
+    Crea 'destino' como reflink de 'origen': comparte los bloques de datos sin copiarlos
+    pero es un archivo independiente. Retorna False si el sistema de archivos no lo soporta.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(origen, 'rb') as f_origen, open(destino, 'wb') as f_destino:
+            fcntl.ioctl(f_destino.fileno(), FICLONE, f_origen.fileno())
+        return True
+    except OSError:
+        if os.path.exists(destino):
+            os.remove(destino)
+        return False
+
+def enlazar_sin_copia(origen, destino):
+    """
+    Crea 'destino' apuntando a los datos de 'origen' sin copiar bytes.
+    Intenta primero reflink y luego hardlink. Retorna 'reflink', 'hardlink' o None.
+    """
+    if clonar_reflink(origen, destino):
+        return 'reflink'
+    try:
+        os.link(origen, destino)
+        return 'hardlink'
+    except OSError:
+        return None
+
+def reemplazar_por_enlace(duplicado, original):
+    """
+    Sustituye 'duplicado' por un enlace (reflink o hardlink) a 'original'.
+    El reemplazo es atómico (os.replace), así que la ruta del duplicado nunca deja de existir.
+    Retorna el tipo de enlace usado, o None si no es posible (p. ej. distinto sistema de archivos).
+    """
+    st_original = os.stat(original)
+    st_duplicado = os.stat(duplicado)
+    if st_original.st_dev != st_duplicado.st_dev:
+        return None
+        
+    directorio, nombre = os.path.split(duplicado)
+    temporal = os.path.join(directorio, f".{nombre}.orgest_tmp")
+    tipo = enlazar_sin_copia(original, temporal)
+    if tipo is None:
+        return None
+    try:
+        if tipo == 'reflink':
+            # El reflink es un archivo propio: conserva fechas y permisos del duplicado
+            shutil.copystat(duplicado, temporal)
+        os.replace(temporal, duplicado)
+    except Exception:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return tipo
@@ -0,0 +1,97 @@
+import heapq
+import shutil
+import itertools
+
+# Espacio libre que se deja siempre sin tocar en el disco de trabajo
+RESERVA_MB = 500
+
+# Tamaño previsto de la salida respecto a la entrada
+FACTOR_REMUX = 1.0      # TS/M4S -> MP4 copiando streams
+FACTOR_PNG = 4.0        # WebP -> PNG (sin pérdida, bastante más grande)
+FACTOR_H264 = 1.0       # recodificación CRF 23 (casi siempre menor, nunca se sabe)
+FACTOR_IMAGEN = 1.0     # imagen re-guardada por Pre-procesar
+
+def necesidad_conversion(tamano, ext):
+    """(permanente, temporal) en bytes de convertir un archivo: la salida se queda (el original va a 'basura')."""
+    factor = FACTOR_PNG if ext == '.webp' else FACTOR_REMUX
+    return int(tamano * factor), 0
+
+def necesidad_union(tamano_total, formato):
+    """(permanente, temporal) de unir un flujo; en fMP4 los fragmentos se concatenan antes en un temporal."""
+    return int(tamano_total * FACTOR_REMUX), (tamano_total if formato == 'm4s' else 0)
+
+def necesidad_optimizacion(tamano, es_video, backup_enlazado):
+    """
+    (permanente, temporal) de optimizar un archivo: la versión nueva se suma al original, que sigue
+    ocupando su espacio como backup en 'sin_edit' (y el doble si el backup no puede ser un enlace).
+    """
+    salida = int(tamano * (FACTOR_H264 if es_video else FACTOR_IMAGEN))
+    return salida + (0 if backup_enlazado else tamano), 0
+
+class ControlEspacio:
+    """
+    Control de admisión por espacio en disco. Un trabajo solo se admite si, descontando lo que
+    necesitan los que están en marcha y lo que necesita él, el libre previsto sigue por encima de
+    la reserva. Los que no caben esperan (encolar) y se vuelven a intentar de menor a mayor cada
+    vez que termina otro (admitibles), en vez de abortar la ejecución.
+    En simulación el disco no cambia: se lleva la cuenta de lo que ocuparía cada trabajo hecho.
+    """
+    def __init__(self, ruta, reserva_mb=None, simulado=False):
+        self.ruta = ruta
+        self.reserva = (RESERVA_MB if reserva_mb is None else reserva_mb) * 1024 * 1024
+        self.simulado = simulado
+        try:
+            self.inicial = shutil.disk_usage(ruta).free
+        except OSError:
+            # Sin forma de medir: no se limita nada
+            self.inicial = None
+        self.comprometido = 0
+        self.en_vuelo = 0
+        self._espera = []
+        self._orden = itertools.count()
+
+    def libre(self):
+        """Espacio libre previsto (bytes) descontando lo reservado por los trabajos en marcha."""
+        if self.inicial is None:
+            return float('inf')
+        if self.simulado:
+            return self.inicial - self.comprometido - self.en_vuelo
+        try:
+            return shutil.disk_usage(self.ruta).free - self.en_vuelo
+        except OSError:
+            return float('inf')
+
+    def admitir(self, permanente, temporal=0):
+        """Reserva el espacio de un trabajo si cabe. Retorna False si no cabe ahora."""
+        necesario = permanente + temporal
+        if necesario and self.libre() - necesario < self.reserva:
+            return False
+        self.en_vuelo += necesario
+        return True
+
+    def liberar(self, permanente, temporal=0):
+        """Un trabajo admitido terminó: lo que escribió ya se refleja en el disco (o en la cuenta simulada)."""
+        self.en_vuelo -= permanente + temporal
+        if self.simulado:
+            self.comprometido += permanente
+
+    def encolar(self, trabajo, permanente, temporal=0):
+        heapq.heappush(self._espera, (permanente + temporal, next(self._orden), trabajo, permanente, temporal))
+
+    def admitibles(self):
+        """Saca de la espera, de menor a mayor, los trabajos que ya caben (quedan admitidos)."""
+        while self._espera:
+            _, _, trabajo, permanente, temporal = self._espera[0]
+            if not self.admitir(permanente, temporal):
+                return
+            heapq.heappop(self._espera)
+            yield trabajo
+
+    def en_espera(self):
+        return len(self._espera)
+
+    def descartar_espera(self):
+        """Vacía la espera (nada más va a liberar espacio) y retorna los trabajos que no cupieron."""
+        trabajos = [t[2] for t in sorted(self._espera)]
+        self._espera.clear()
+        return trabajos
@@ -1,59 +1,57 @@
 import os
-import shutil
+from funciones.inventario import recorrer, mover_archivo, eliminar_directorio_vacio
+from funciones.nombres import AsignadorNombres
+from funciones.flujo import iniciar_flujo, reportar_progreso
 
-def encontrar_archivos_a_extraer(ruta):
-    """Obtiene lista de archivos anidados que no están en la raíz ni en carpetas ignoradas."""
-    archivos_a_mover = []
+def iterar_archivos_a_extraer(ruta, inventario=None):
+    """Genera los archivos anidados que no están en la raíz ni en carpetas ignoradas."""
     ignorar = ["funciones", "logs", "basura", "sin_edit", "fallos"]
     
-    for root, _, files in os.walk(ruta, topdown=False):
+    for root, _, files in recorrer(ruta, inventario, topdown=False):
         if root == ruta or os.path.basename(root) in ignorar: continue
         for f in files:
-            archivos_a_mover.append(os.path.join(root, f))
-    return archivos_a_mover
+            yield os.path.join(root, f)
 
-def extraer_archivos_raiz(ruta, log_func, modo_automatico=True, update_callback=None, cancel_event=None):
+def extraer_archivos_raiz(ruta, log_func, modo_automatico=True, update_callback=None, cancel_event=None, inventario=None):
     """
     Mueve todos los archivos de subcarpetas a la raíz principal 
     y elimina las carpetas vacías resultantes.
+    Los archivos se mueven a medida que el recorrido los descubre.
+    Si recibe un 'inventario' compartido lo usa para recorrer y lo mantiene actualizado.
     """
     extraidos = 0
     ignorar = ["funciones", "logs", "basura", "sin_edit", "fallos"]
     
-    archivos_a_mover = encontrar_archivos_a_extraer(ruta)
-    total_archivos = len(archivos_a_mover)
+    flujo = iniciar_flujo(iterar_archivos_a_extraer(ruta, inventario), inventario)
     archivos_procesados = 0
+    asignador = AsignadorNombres(inventario)
     
-    for src in archivos_a_mover:
+    for src in flujo:
         if cancel_event and cancel_event.is_set():
             return {}
             
         root, f = os.path.split(src)
-        dst = os.path.join(ruta, f)
         
         try:
-            c = 1
-            while os.path.exists(dst):
-                n, e = os.path.splitext(f)
-                dst = os.path.join(ruta, f"{n}_{c}{e}")
-                c += 1
-            
-            shutil.move(src, dst)
+            dst = asignador.reservar(ruta, f)
+            mover_archivo(src, dst, inventario)
+            asignador.liberar(src)
             extraidos += 1
         except Exception as e:
             log_func(f"Error extrayendo {f}: {e}", nivel="error")
 
         archivos_procesados += 1
-        if update_callback: update_callback(archivos_procesados, total_archivos, f)
+        reportar_progreso(update_callback, archivos_procesados, flujo, f)
 
     if update_callback and not (cancel_event and cancel_event.is_set()):
-        update_callback(archivos_procesados, total_archivos, "Limpiando carpetas...")
+        update_callback(archivos_procesados, flujo.descubiertos, "Limpiando carpetas...")
 
-    for root, dirs, _ in os.walk(ruta, topdown=False):
+    for root, dirs, _ in recorrer(ruta, inventario, topdown=False):
         if root == ruta or os.path.basename(root) in ignorar: continue
         try:
-            if not os.listdir(root):
-                os.rmdir(root)
+            vacia = inventario.esta_vacio(root) if inventario else not os.listdir(root)
+            if vacia:
+                eliminar_directorio_vacio(root, inventario)
         except Exception: pass
         
     if update_callback and not (cancel_event and cancel_event.is_set()):
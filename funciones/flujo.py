@@ -0,0 +1,79 @@
+import queue
+import threading
+
+# Elementos descubiertos que pueden esperar en la cola antes de frenar al recorrido
+TAMANO_COLA = 1000
+
+_FIN = object()
+
+class FlujoAcotado:
+    """
+    Entrega los elementos de un generador (normalmente un recorrido del disco) a medida
+    que se descubren. Con 'en_hilo' el generador corre en un hilo productor que llena una
+    cola acotada: el procesamiento empieza antes de que termine el recorrido y la memoria
+    no crece con el tamaño del árbol. Sin hilo se itera directamente (recorridos en memoria).
+    """
+    def __init__(self, generador, en_hilo=True, maximo=TAMANO_COLA):
+        self.generador = generador
+        self.en_hilo = en_hilo
+        self.descubiertos = 0
+        self.completo = False
+        self._error = None
+        self._detener = threading.Event()
+        if en_hilo:
+            self.cola = queue.Queue(maxsize=maximo)
+            threading.Thread(target=self._producir, daemon=True).start()
+
+    def _poner(self, elemento):
+        while not self._detener.is_set():
+            try:
+                self.cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _producir(self):
+        try:
+            for elemento in self.generador:
+                self.descubiertos += 1
+                if not self._poner(elemento):
+                    return
+        except Exception as e:
+            self._error = e
+        self.completo = True
+        self._poner(_FIN)
+
+    def __iter__(self):
+        if not self.en_hilo:
+            for elemento in self.generador:
+                self.descubiertos += 1
+                yield elemento
+            self.completo = True
+            return
+            
+        try:
+            while True:
+                elemento = self.cola.get()
+                if elemento is _FIN:
+                    if self._error: raise self._error
+                    return
+                yield elemento
+        finally:
+            # Si el consumidor se detiene (cancelación, error), el productor también
+            self._detener.set()
+
+def iniciar_flujo(generador, inventario=None):
+    """Los recorridos del disco van en un hilo productor; los del inventario ya están en memoria."""
+    return FlujoAcotado(generador, en_hilo=inventario is None)
+
+def reportar_progreso(update_callback, procesados, flujo, file_info="", detalle=None):
+    """
+    Informa procesados/descubiertos; mientras el recorrido sigue, el total es provisional.
+    Dentro de un archivo largo, 'procesados' puede ser fraccionario y 'detalle' lleva el progreso
+    de FFmpeg (velocidad, ETA... ver progreso.py).
+    """
+    if update_callback and detalle is not None:
+        update_callback(procesados, flujo.descubiertos, file_info, explorando=not flujo.completo, detalle=detalle)
+    elif update_callback:
+        update_callback(procesados, flujo.descubiertos, file_info, explorando=not flujo.completo)
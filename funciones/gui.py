@@ -6,13 +6,19 @@ import threading
 import logging
 
 # Importar funciones lógicas
-from funciones.duplicados import eliminar_duplicados, verificar_duplicados
+from funciones.duplicados import eliminar_duplicados, verificar_duplicados, ALGORITMOS_HASH, ALGORITMO_POR_DEFECTO
 from funciones.ordenar import organizar_archivos_carpetas
-from funciones.conversiones import convertir_formatos_archivos
+from funciones.conversiones import convertir_formatos_archivos, unir_segmentos_archivos
+from funciones.progreso import texto_progreso
 from funciones.extraer import extraer_archivos_raiz
 from funciones.preprocesador import preprocesar_contenido
 from funciones.limpieza_final import limpiar_carpetas_temporales
 from funciones.dividir import organizar_archivos_en_subcarpetas 
+from funciones.cache_hashes import invalidar_cache_hashes
+from funciones.similares import eliminar_imagenes_similares
+from funciones.referencia import indexar_referencia, deduplicar_contra_referencia
+from funciones.automatico import ejecutar_modo_automatico
+from funciones.diario import ejecutar_con_diario, reanudar_diario, deshacer_diario, estado_diario
 
 # ==========================================================================
 # SECCIÓN: VENTANAS AUXILIARES / DIÁLOGOS
@@ -101,10 +107,17 @@ class OrgestApp(customtkinter.CTk):
         self.nombre_proceso_actual = ""    
         self.total_pasos_auto = 6 
         self.paso_auto_actual = 0 
+        self.aplicando_cambios = False
         
         self.cancel_event = threading.Event()
         self.proceso_activo = False
         
+        # Algoritmo de hash elegido en la GUI; se copia a 'algoritmo_actual' al iniciar
+        # para que el hilo de trabajo no lea variables de Tk
+        self.algoritmo_hash = customtkinter.StringVar(value=ALGORITMO_POR_DEFECTO)
+        self.algoritmo_actual = ALGORITMO_POR_DEFECTO
+        self.menus_algoritmo = []
+        
         # --- Configuración de Ventana Principal ---
         app_width = 490
         app_height = 760 
@@ -243,7 +256,7 @@ class OrgestApp(customtkinter.CTk):
     
     def confirmar_y_cancelar(self):
         if messagebox.askyesno("Confirmar Cancelación", 
-                               "¿Estás seguro de que quieres CANCELAR el proceso?\n\nLa carpeta podría quedar en un estado inconsistente."):
+                               "¿Estás seguro de que quieres CANCELAR el proceso?\n\nLo hecho hasta ahora queda en el diario: podrás reanudarlo o deshacerlo."):
             self.iniciar_cancelacion()
 
     def iniciar_cancelacion(self):
@@ -262,6 +275,7 @@ class OrgestApp(customtkinter.CTk):
         self.proceso_pendiente = funcion
         self.args_pendientes = args
         self.paso_auto_actual = 0 
+        self.aplicando_cambios = False
         self.cancel_event.clear()
         
         self.lbl_process_name.configure(text=f"Configuración: {self.nombre_proceso_actual}", 
@@ -281,6 +295,7 @@ class OrgestApp(customtkinter.CTk):
         st = "normal" if state else "disabled"
         self.btn_auto.configure(state=st)
         for b in self.manual_btns: b.configure(state=st)
+        for m in self.menus_algoritmo: m.configure(state=st)
         self.btn_select_path.configure(state=st)
         
         if state: 
@@ -330,28 +345,37 @@ class OrgestApp(customtkinter.CTk):
     # SECCIÓN: FEEDBACK Y PROGRESO
     # ==========================================================================
 
-    def update_progress(self, current, total, file_info=""): 
-        """Callback thread-safe para actualizar la barra de progreso desde los hilos de trabajo."""
+    def update_progress(self, current, total, file_info="", explorando=False, detalle=None): 
+        """
+        Callback thread-safe para actualizar la barra de progreso desde los hilos de trabajo.
+        Con 'explorando' el total es provisional: el recorrido de la carpeta aún no terminó.
+        Con 'detalle' (progreso de FFmpeg) 'current' es fraccionario y se muestran velocidad y ETA.
+        """
         if self.cancel_event.is_set():
             return
         if total == 0:
             value = 0
         else:
             value = current / total
-        self.after(0, lambda: self._set_progress(value, current, total, file_info))
+        self.after(0, lambda: self._set_progress(value, current, total, file_info, explorando, detalle))
 
-    def _set_progress(self, value, current, total, file_info=""): 
+    def _set_progress(self, value, current, total, file_info="", explorando=False, detalle=None): 
         """
         Actualiza visualmente la barra y la etiqueta de estado.
         Maneja la visualización de nombres de archivo truncados.
         """
+        current = int(current)
         progreso_actual = f"Archivos: {current}/{total}" if total > 0 else "Calculando..."
+        if explorando and total > 0:
+            progreso_actual = f"Archivos: {current}/{total}+ (explorando)"
+        if detalle:
+            progreso_actual = f"{progreso_actual} | {texto_progreso(detalle)}"
         
         file_display = ""
         if file_info:
             MAX_LEN = 30 
             
-            if file_info.startswith("Duplicados encontrados:") or file_info.startswith("Limpiando carpetas..."):
+            if file_info.startswith(("Duplicados encontrados:", "Similares encontrados:", "Limpiando carpetas...")):
                 file_display = file_info
             elif file_info:
                 if len(file_info) > MAX_LEN:
@@ -368,7 +392,7 @@ class OrgestApp(customtkinter.CTk):
             progreso_paso = value / self.total_pasos_auto
             progreso_global = base_paso + progreso_paso
             
-            self.lbl_process_name.configure(text=f"Configuración: Auto - Paso {self.paso_auto_actual}/6 ({paso_nombre})")
+            self.lbl_process_name.configure(text=f"Configuración: Auto - Paso {self.paso_auto_actual}/{self.total_pasos_auto} ({paso_nombre})")
             self.lbl_status.configure(text=f"Progreso global: {int(progreso_global*100)}% | {progreso_actual}") 
             self.progress_bar.set(progreso_global)
         else:
@@ -377,6 +401,8 @@ class OrgestApp(customtkinter.CTk):
             
     def get_paso_nombre(self, num_paso):
         """Retorna el nombre descriptivo del paso actual en el modo automático."""
+        if self.aplicando_cambios:
+            return "Aplicar Cambios"
         pasos_nombres = [
             "Eliminar Duplicados",
             "Organizar Archivos",
@@ -406,6 +432,11 @@ class OrgestApp(customtkinter.CTk):
             messagebox.showerror("Error", "La ruta seleccionada no es válida.")
             return
 
+        if self.proceso_pendiente not in (reanudar_diario, deshacer_diario) and estado_diario(self.ruta_actual) == 'pendiente':
+            if messagebox.askyesno("Ejecución Interrumpida",
+                                   "Una ejecución anterior en esta carpeta quedó a medias.\n\n¿Quieres reanudarla desde donde se detuvo?\n(Si eliges 'No', se empezará de cero.)"):
+                self.preparar_ejecucion("Reanudar Ejecución", reanudar_diario)
+
         if self.proceso_pendiente == organizar_archivos_en_subcarpetas:
             dialog = InputCentrado(
                 text="Cantidad de archivos por subcarpeta?", 
@@ -428,8 +459,17 @@ class OrgestApp(customtkinter.CTk):
                 messagebox.showerror("Error", "Por favor ingresa un número entero válido.")
                 return
 
+        if self.proceso_pendiente == deduplicar_contra_referencia:
+            ruta_referencia = filedialog.askdirectory(title="Selecciona la biblioteca de referencia (ya indexada)")
+            if not ruta_referencia:
+                return
+            self.args_pendientes = [ruta_referencia]
+
         mensaje = f"Vas a ejecutar: {self.nombre_proceso_actual}\n\nEn la carpeta:\n{self.ruta_actual}\n\n¿Estás seguro de continuar?"
         
+        if self.proceso_pendiente == deduplicar_contra_referencia:
+            mensaje = f"Vas a mover a 'basura' los archivos de:\n{self.ruta_actual}\n\nque ya existen en la referencia:\n{self.args_pendientes[0]}\n\n¿Estás seguro?"
+
         if self.proceso_pendiente == organizar_archivos_en_subcarpetas:
              mensaje = f"Vas a dividir los archivos en carpetas de {self.args_pendientes[0]} elementos.\n\nEn la ruta:\n{self.ruta_actual}\n\n¿Estás seguro?"
 
@@ -451,6 +491,7 @@ class OrgestApp(customtkinter.CTk):
     def iniciar_hilo_proceso(self):
         """Bloquea la UI e inicia el proceso en un hilo separado para no congelar la ventana."""
         self.toggle_inputs(False)
+        self.algoritmo_actual = self.algoritmo_hash.get()
         self.lbl_status.configure(text="Iniciando proceso...")
         threading.Thread(target=self.task_wrapper).start()
 
@@ -466,7 +507,12 @@ class OrgestApp(customtkinter.CTk):
             if self.nombre_proceso_actual == "Modo Automático":
                 self.after(0, lambda: self._set_progress(0, 0, 1, ""))
             
-            res = func(self.ruta_actual, *args)
+            if func in self.herramientas_con_diario():
+                # Se simula, se guarda el plan en el diario y luego se aplica (reanudable y reversible)
+                res = ejecutar_con_diario(func, self.ruta_actual, self.log_func, *self.args_pendientes,
+                                          update_callback=self.update_progress, cancel_event=self.cancel_event)
+            else:
+                res = func(self.ruta_actual, *args)
             
             if self.cancel_event.is_set():
                 self.after(0, lambda: messagebox.showwarning("Cancelado", "Proceso cancelado por el usuario."))
@@ -490,41 +536,53 @@ class OrgestApp(customtkinter.CTk):
     # SECCIÓN: MODO AUTOMÁTICO
     # ==========================================================================
 
+    def eliminar_duplicados_configurado(self, ruta, log_func, modo_automatico, update_callback, cancel_event, inventario=None):
+        """Ejecuta eliminar_duplicados con el algoritmo de hash elegido en la interfaz."""
+        return eliminar_duplicados(ruta, log_func, modo_automatico, update_callback, cancel_event,
+                                   algoritmo=self.algoritmo_actual, inventario=inventario)
+
+    def enlazar_duplicados_configurado(self, ruta, log_func, modo_automatico, update_callback, cancel_event, inventario=None):
+        """Reemplaza los duplicados por reflinks/hardlinks usando el algoritmo elegido."""
+        return eliminar_duplicados(ruta, log_func, modo_automatico, update_callback, cancel_event,
+                                   algoritmo=self.algoritmo_actual, accion='enlazar', inventario=inventario)
+
+    def indexar_referencia_configurado(self, ruta, log_func, update_callback, cancel_event):
+        """Indexa la biblioteca de referencia con el algoritmo de hash elegido en la interfaz."""
+        return indexar_referencia(ruta, log_func, update_callback, cancel_event, algoritmo=self.algoritmo_actual)
+
+    def crear_selector_algoritmo(self, parent):
+        """Crea un selector de algoritmo de hash enlazado a la variable compartida."""
+        frame = customtkinter.CTkFrame(parent, fg_color="transparent")
+        customtkinter.CTkLabel(frame, text="Algoritmo de hash:", font=("Arial", 12)).pack(side="left")
+        menu = customtkinter.CTkOptionMenu(frame, values=list(ALGORITMOS_HASH), variable=self.algoritmo_hash, width=110)
+        menu.pack(side="left", padx=10)
+        self.menus_algoritmo.append(menu)
+        return frame
+
     def run_auto_process(self, ruta, log_func, ejecutar_preprocess, update_callback, cancel_event):
         """
         Orquesta la ejecución secuencial de todas las herramientas de limpieza.
         Maneja el checkbox de preprocesamiento y el flujo de pasos.
+        La secuencia en sí vive en funciones/automatico.py (compartida con la consola).
         """
-        pasos = [
-            (eliminar_duplicados, [True]),
-            (organizar_archivos_carpetas, []),
-            (convertir_formatos_archivos, []),
-            (extraer_archivos_raiz, [True]),
-            (preprocesar_contenido, [True]), 
-            (limpiar_carpetas_temporales, [])
-        ]
-        
-        if not ejecutar_preprocess:
-            pasos.pop(4) 
+        def al_cambiar_paso(paso, total):
+            self.paso_auto_actual = paso
+            # Un paso más al final: aplicar en disco el plan guardado en el diario
+            self.total_pasos_auto = total + 1
             
-        self.total_pasos_auto = len(pasos)
-        
-        for i, (func, args) in enumerate(pasos, 1):
-            if cancel_event.is_set():
-                return {} 
-
-            self.paso_auto_actual = i
-            args_con_callback = [log_func] + args + [update_callback, cancel_event]
-            res = func(ruta, *args_con_callback)
+        def al_ejecutar():
+            self.aplicando_cambios = True
+            self.paso_auto_actual = self.total_pasos_auto
             
-            if isinstance(res, dict) and res.get('error'):
-                paso_nombre = self.get_paso_nombre(i) 
-                res['error'] = f"Error en el paso {i}: {res['error']}" 
-                return res
-                
-        self.paso_auto_actual = self.total_pasos_auto
-        update_callback(1, 1, "")
-        return {}
+        return ejecutar_con_diario(ejecutar_modo_automatico, ruta, log_func, ejecutar_preprocess,
+                                   update_callback=update_callback, cancel_event=cancel_event, al_ejecutar=al_ejecutar,
+                                   algoritmo=self.algoritmo_actual, al_cambiar_paso=al_cambiar_paso)
+
+    def herramientas_con_diario(self):
+        """Herramientas que admiten simulación y, por tanto, se ejecutan con diario."""
+        return [self.eliminar_duplicados_configurado, self.enlazar_duplicados_configurado, organizar_archivos_carpetas, convertir_formatos_archivos,
+                unir_segmentos_archivos, extraer_archivos_raiz, preprocesar_contenido, limpiar_carpetas_temporales, organizar_archivos_en_subcarpetas,
+                deduplicar_contra_referencia, eliminar_imagenes_similares]
 
     def setup_auto_tab(self):
         """Configura la pestaña de 'Modo Automático'."""
@@ -533,6 +591,7 @@ class OrgestApp(customtkinter.CTk):
         t.grid_rowconfigure(1, weight=1)
         t.grid_rowconfigure(2, weight=0) 
         t.grid_rowconfigure(3, weight=0)
+        t.grid_rowconfigure(4, weight=0)
         
         customtkinter.CTkLabel(t, text="Secuencia de Limpieza Completa", font=("Arial", 16, "bold")).grid(row=0, pady=(10, 5))
         
@@ -541,7 +600,7 @@ class OrgestApp(customtkinter.CTk):
         scroll_frame.grid_columnconfigure(0, weight=1)
         
         pasos_data = [
-            ("1. Eliminar Duplicados", "Mueve copias idénticas (MD5) a 'basura'."),
+            ("1. Eliminar Duplicados", "Mueve copias idénticas (por hash) a 'basura'."),
             ("2. Organizar Archivos", "Clasifica en carpetas 'Imagenes', 'Videos', 'Documentos', 'Rars', 'Audio', 'Sin reconocer' y 'Sin procesar'."), 
             ("3. Convertir Formatos", "WebP → PNG, TS/M4S → MP4."),
             ("4. Extraer a Raíz", "Saca archivos de subcarpetas y elimina vacías."),
@@ -559,10 +618,12 @@ class OrgestApp(customtkinter.CTk):
         self.chk_preprocess = customtkinter.CTkCheckBox(t, text="Incluir Pre-procesamiento de Imágenes (Paso 5)")
         self.chk_preprocess.select() 
         self.chk_preprocess.grid(row=2, column=0, pady=(10, 5), padx=20, sticky="w")
+        
+        self.crear_selector_algoritmo(t).grid(row=3, column=0, pady=(5, 0), padx=20, sticky="w")
 
         self.btn_auto = customtkinter.CTkButton(t, text="Continuar", height=45, font=("Arial", 14, "bold"), 
                                               command=lambda: self.preparar_ejecucion("Modo Automático", self.run_auto_process, self.chk_preprocess.get()))
-        self.btn_auto.grid(row=3, column=0, pady=20, padx=20, sticky="ew")
+        self.btn_auto.grid(row=4, column=0, pady=20, padx=20, sticky="ew")
 
     # ==========================================================================
     # SECCIÓN: MODO MANUAL / PERSONALIZADO
@@ -580,14 +641,24 @@ class OrgestApp(customtkinter.CTk):
         sf.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
         sf.grid_columnconfigure(0, weight=1)
         
+        self.crear_selector_algoritmo(t).grid(row=2, column=0, pady=(5, 5), padx=20, sticky="w")
+        
         tools = [
-            ("Eliminar Duplicados", "Busca y borra archivos idénticos.", eliminar_duplicados, True),
+            ("Eliminar Duplicados", "Busca y borra archivos idénticos.", self.eliminar_duplicados_configurado, True),
+            ("Enlazar Duplicados", "Reemplaza copias idénticas por enlaces (libera espacio sin mover nada).", self.enlazar_duplicados_configurado, True),
+            ("Indexar Referencia", "Guarda los hashes de una biblioteca para comparar ingresos nuevos.", self.indexar_referencia_configurado, False),
+            ("Comparar con Referencia", "Mueve a 'basura' lo que ya existe en una biblioteca indexada.", deduplicar_contra_referencia, False),
+            ("Imágenes Similares", "Mueve fotos casi idénticas (redimensionadas o recomprimidas) a 'basura'.", eliminar_imagenes_similares, True),
             ("Organizar Carpetas", "Separa Imagenes y Videos.", organizar_archivos_carpetas, False),
             ("Convertir Formatos", "WebP/TS/M4S a PNG/MP4.", convertir_formatos_archivos, False),
+            ("Unir Segmentos HLS/DASH", "Une los .ts/.m4s de cada flujo en un solo MP4.", unir_segmentos_archivos, False),
             ("Extraer Archivos", "Saca todo a la raíz.", extraer_archivos_raiz, True),
             ("Pre-procesar Multimedia", "Optimiza Img y Videos (H.264).", preprocesar_contenido, True),
             ("Limpieza Final", "Borra carpetas temporales.", limpiar_carpetas_temporales, False),
-            ("Dividir por Carpetas", "Divide archivos en subcarpetas de N elementos.", organizar_archivos_en_subcarpetas, False) 
+            ("Reiniciar Caché de Hashes", "Olvida los hashes guardados de la carpeta.", invalidar_cache_hashes, False),
+            ("Dividir por Carpetas", "Divide archivos en subcarpetas de N elementos.", organizar_archivos_en_subcarpetas, False),
+            ("Reanudar Ejecución", "Continúa una ejecución interrumpida desde su diario.", reanudar_diario, False),
+            ("Deshacer Última Ejecución", "Revierte la última ejecución registrada en el diario.", deshacer_diario, False)
         ]
         
         self.manual_btns = []
@@ -0,0 +1,202 @@
+import os
+from funciones.copiado import mover_rapido
+
+def _clave(ruta):
+    """Clave interna de una ruta (normalizada; sin distinguir mayúsculas en Windows)."""
+    return os.path.normcase(os.path.normpath(ruta))
+
+class Inventario:
+    """
+    Instantánea del árbol de archivos construida una sola vez con os.scandir.
+    Guarda las entradas de cada carpeta (con su stat en caché) y se actualiza a medida
+    que los pasos mueven, crean o borran archivos, así el Modo Automático recorre el
+    disco una única vez en lugar de una por herramienta.
+    """
+    def __init__(self, ruta):
+        self.ruta = ruta
+        # clave de carpeta -> {'dirs': [nombres], 'archivos': {nombre: DirEntry o stat_result}}
+        self.nodos = {}
+        # Plan opcional: con PlanMovimientos los movimientos se difieren (ver planificador.py);
+        # con PlanSimulado no se toca el disco y solo se registran las acciones (ver simulacion.py)
+        self.plan = None
+        self._escanear(ruta)
+
+    def _escanear(self, carpeta):
+        pendientes = [carpeta]
+        while pendientes:
+            actual = pendientes.pop()
+            nodo = {'dirs': [], 'archivos': {}}
+            try:
+                with os.scandir(actual) as it:
+                    for entrada in it:
+                        try:
+                            es_dir = entrada.is_dir()
+                        except OSError:
+                            es_dir = False
+                        if es_dir:
+                            nodo['dirs'].append(entrada.name)
+                            # Igual que os.walk: los enlaces a carpetas se listan pero no se recorren
+                            if not entrada.is_symlink():
+                                pendientes.append(os.path.join(actual, entrada.name))
+                        else:
+                            nodo['archivos'][entrada.name] = entrada
+            except OSError:
+                continue
+            self.nodos[_clave(actual)] = nodo
+
+    # --------------------------------------------------------------------------
+    # Consultas
+    # --------------------------------------------------------------------------
+
+    def walk(self, top=None, topdown=True):
+        """Equivalente a os.walk sobre los datos en memoria (sin tocar el disco)."""
+        top = self.ruta if top is None else top
+        nodo = self.nodos.get(_clave(top))
+        if nodo is None:
+            return
+        dirs = list(nodo['dirs'])
+        if topdown:
+            yield top, dirs, list(nodo['archivos'])
+        for d in dirs:
+            yield from self.walk(os.path.join(top, d), topdown)
+        if not topdown:
+            yield top, dirs, list(nodo['archivos'])
+
+    def stat(self, ruta):
+        """Stat en caché del archivo (DirEntry.stat se resuelve una vez y queda guardado)."""
+        directorio, nombre = os.path.split(ruta)
+        nodo = self.nodos.get(_clave(directorio))
+        if nodo is None or nombre not in nodo['archivos']:
+            return os.stat(ruta)
+        entrada = nodo['archivos'][nombre]
+        if not isinstance(entrada, os.DirEntry):
+            return entrada
+        st = entrada.stat()
+        if not st.st_ino:
+            # En Windows DirEntry.stat() deja st_ino y st_dev a 0: sin ellos no se reconocen
+            # los hardlinks ni la unidad del archivo, así que se completa con os.stat
+            st = os.stat(entrada.path)
+        nodo['archivos'][nombre] = st
+        return st
+
+    def existe(self, ruta):
+        directorio, nombre = os.path.split(ruta)
+        nodo = self.nodos.get(_clave(directorio))
+        return nodo is not None and (nombre in nodo['archivos'] or nombre in nodo['dirs'])
+
+    def esta_vacio(self, carpeta):
+        nodo = self.nodos.get(_clave(carpeta))
+        return nodo is not None and not nodo['dirs'] and not nodo['archivos']
+
+    def es_directorio(self, ruta):
+        return _clave(ruta) in self.nodos
+
+    def nombres(self, carpeta):
+        """Nombres (archivos y carpetas) de 'carpeta', o None si no está en el inventario."""
+        nodo = self.nodos.get(_clave(carpeta))
+        return None if nodo is None else list(nodo['dirs']) + list(nodo['archivos'])
+
+    def contar_archivos(self, top=None, ignorar=()):
+        """Cuenta los archivos saltando las carpetas cuyo nombre está en 'ignorar'."""
+        return sum(len(files) for root, _, files in self.walk(top) if os.path.basename(root) not in ignorar)
+
+    # --------------------------------------------------------------------------
+    # Actualizaciones (los pasos avisan de lo que cambian en disco)
+    # --------------------------------------------------------------------------
+
+    def _contiene(self, clave):
+        raiz = _clave(self.ruta)
+        return clave == raiz or clave.startswith(os.path.join(raiz, ''))
+
+    def agregar_directorio(self, carpeta):
+        """Registra una carpeta creada (y sus padres que cuelguen de la raíz)."""
+        clave = _clave(carpeta)
+        if clave in self.nodos:
+            return self.nodos[clave]
+        self.nodos[clave] = {'dirs': [], 'archivos': {}}
+        padre, nombre = os.path.split(os.path.normpath(carpeta))
+        clave_padre = _clave(padre)
+        if clave_padre != clave and self._contiene(clave_padre):
+            nodo_padre = self.agregar_directorio(padre)
+            if nombre not in nodo_padre['dirs']:
+                nodo_padre['dirs'].append(nombre)
+        return self.nodos[clave]
+
+    def agregar(self, ruta, st=None):
+        """Registra (o refresca) un archivo creado o modificado."""
+        directorio, nombre = os.path.split(ruta)
+        nodo = self.agregar_directorio(directorio)
+        nodo['archivos'][nombre] = st or os.stat(ruta)
+
+    def eliminar(self, ruta):
+        directorio, nombre = os.path.split(ruta)
+        nodo = self.nodos.get(_clave(directorio))
+        if nodo is not None:
+            nodo['archivos'].pop(nombre, None)
+
+    def mover(self, origen, destino):
+        """Refleja un movimiento/renombrado: el stat se conserva (mismo contenido)."""
+        try:
+            st = self.stat(origen)
+        except OSError:
+            st = None
+        self.eliminar(origen)
+        self.agregar(destino, st)
+
+    def eliminar_directorio(self, carpeta):
+        """Olvida una carpeta y todo su contenido (tras os.rmdir o shutil.rmtree)."""
+        clave = _clave(carpeta)
+        prefijo = os.path.join(clave, '')
+        for k in [k for k in self.nodos if k == clave or k.startswith(prefijo)]:
+            del self.nodos[k]
+        padre, nombre = os.path.split(os.path.normpath(carpeta))
+        nodo_padre = self.nodos.get(_clave(padre))
+        if nodo_padre is not None and nombre in nodo_padre['dirs']:
+            nodo_padre['dirs'].remove(nombre)
+
+def recorrer(ruta, inventario=None, topdown=True):
+    """os.walk, o el recorrido en memoria si se dispone de un inventario."""
+    if inventario is not None:
+        return inventario.walk(ruta, topdown)
+    return os.walk(ruta, topdown=topdown)
+
+def mover_archivo(origen, destino, inventario=None):
+    """
+    Mueve con mover_rapido (os.rename o copia rápida entre volúmenes) y mantiene el inventario al día.
+    Si el inventario tiene un plan de movimientos activo, el movimiento solo se registra.
+    """
+    if inventario is not None and inventario.plan is not None:
+        inventario.plan.mover(origen, destino)
+    else:
+        mover_rapido(origen, destino)
+    if inventario is not None:
+        inventario.mover(origen, destino)
+
+def simulando(inventario):
+    """True si el inventario lleva un plan simulado: los pasos solo registran acciones."""
+    return inventario is not None and inventario.plan is not None and inventario.plan.simulado
+
+def crear_directorio(carpeta, inventario=None):
+    """os.makedirs(exist_ok=True) que mantiene el inventario; en simulación solo se registra."""
+    if simulando(inventario):
+        if not inventario.es_directorio(carpeta):
+            inventario.plan.registrar('crear_directorio', destino=carpeta)
+    else:
+        os.makedirs(carpeta, exist_ok=True)
+    if inventario is not None:
+        inventario.agregar_directorio(carpeta)
+
+def eliminar_directorio_vacio(carpeta, inventario=None):
+    """os.rmdir que mantiene el inventario; con un plan activo, el borrado se hace al aplicarlo."""
+    if inventario is not None and inventario.plan is not None:
+        inventario.plan.eliminar_directorio(carpeta)
+    else:
+        os.rmdir(carpeta)
+    if inventario is not None:
+        inventario.eliminar_directorio(carpeta)
+
+def preparar_en_disco(ruta, inventario=None):
+    """Antes de leer o escribir 'ruta', hace que el disco coincida con el inventario (si hay plan)."""
+    if inventario is not None and inventario.plan is not None:
+        inventario.plan.materializar(ruta)
+    return ruta
@@ -1,8 +1,13 @@
 import os
 import shutil
+from funciones.inventario import simulando
 
-def limpiar_carpetas_temporales(ruta, log_func, update_callback=None, cancel_event=None):
-    """Elimina las carpetas temporales generadas ('basura', 'sin_edit', 'fallos')."""
+def limpiar_carpetas_temporales(ruta, log_func, update_callback=None, cancel_event=None, inventario=None):
+    """
+    Elimina las carpetas temporales generadas ('basura', 'sin_edit', 'fallos').
+    Si recibe un 'inventario' compartido, también las olvida en él.
+    En simulación (dry-run) solo se registra el borrado.
+    """
     targets = ['basura', 'sin_edit', 'fallos']
     eliminadas = 0
     
@@ -14,9 +19,11 @@ def limpiar_carpetas_temporales(ruta, log_func, update_callback=None, cancel_eve
             return {}
             
         p = os.path.join(ruta, t)
-        if os.path.exists(p):
+        if inventario.es_directorio(p) if simulando(inventario) else os.path.exists(p):
             try:
-                shutil.rmtree(p)
+                if simulando(inventario): inventario.plan.registrar('borrar_arbol', origen=p)
+                else: shutil.rmtree(p)
+                if inventario: inventario.eliminar_directorio(p)
                 eliminadas += 1
             except Exception as e:
                 log_func(f"No se pudo borrar {t}: {e}", nivel="error")
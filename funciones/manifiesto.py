@@ -0,0 +1,115 @@
+import os
+import sqlite3
+from funciones.dependencias import obtener_ruta_base_real
+from funciones.duplicados import calcular_hash_parcial
+
+def obtener_ruta_manifiesto():
+    """Ruta de la base SQLite con los archivos ya optimizados (carpeta 'cache' del programa)."""
+    return os.path.join(obtener_ruta_base_real(), 'cache', 'optimizados.db')
+
+# Se incrementa cuando cambia el esquema; una versión distinta descarta el manifiesto
+VERSION_ESQUEMA = 1
+
+def _sin_log(mensaje, nivel="info", exc_info=False):
+    pass
+
+def huella_contenido(ruta, st):
+    """Huella de un archivo por su contenido: tamaño + hash de su bloque inicial y final. None si no se puede leer."""
+    parcial = calcular_hash_parcial(ruta, st, _sin_log)
+    return f"{st.st_size}:{parcial}" if parcial else None
+
+class ManifiestoOptimizados:
+    """
+    Archivos que produjo Pre-procesar, para no volver a optimizarlos (cada re-guardado JPEG pierde
+    calidad), y qué salida produjo cada conversión de formato. Se identifican por la huella de su
+    contenido, así siguen reconociéndose aunque Organizar o Extraer los muevan. El inodo (con tamaño y mtime_ns) se guarda como atajo: si
+    coincide, ni siquiera hace falta leer el archivo.
+    """
+    def __init__(self, ruta_db=None):
+        self.ruta_db = ruta_db or obtener_ruta_manifiesto()
+        os.makedirs(os.path.dirname(self.ruta_db), exist_ok=True)
+        self.conexion = sqlite3.connect(self.ruta_db)
+        if self.conexion.execute("PRAGMA user_version").fetchone()[0] != VERSION_ESQUEMA:
+            self.conexion.execute("DROP TABLE IF EXISTS optimizados")
+            self.conexion.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS optimizados ("
+            "huella TEXT PRIMARY KEY, dispositivo INTEGER, inodo INTEGER, tamano INTEGER, mtime_ns INTEGER, tipo TEXT)"
+        )
+        self.conexion.execute("CREATE INDEX IF NOT EXISTS por_inodo ON optimizados (dispositivo, inodo)")
+        # Conversiones (WebP -> PNG, TS -> MP4): huella del original -> huella de la salida que produjo
+        self.conexion.execute("CREATE TABLE IF NOT EXISTS conversiones (origen TEXT PRIMARY KEY, salida TEXT)")
+        self.aciertos = 0
+        self.pendientes = 0
+
+    def contiene(self, ruta, st):
+        """True si el archivo es una salida de Pre-procesar (aunque se haya movido o copiado)."""
+        fila = self.conexion.execute(
+            "SELECT 1 FROM optimizados WHERE dispositivo = ? AND inodo = ? AND tamano = ? AND mtime_ns = ?",
+            (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        ).fetchone()
+        if fila is None:
+            # Otro inodo (copiado a otro disco, restaurado...): se compara el contenido.
+            # En simulación la ruta puede no existir aún en disco; entonces no se reconoce
+            if not os.path.isfile(ruta):
+                return False
+            huella = huella_contenido(ruta, st)
+            if huella is None or self.conexion.execute(
+                    "SELECT 1 FROM optimizados WHERE huella = ?", (huella,)).fetchone() is None:
+                return False
+            self.conexion.execute(
+                "UPDATE optimizados SET dispositivo = ?, inodo = ?, mtime_ns = ? WHERE huella = ?",
+                (st.st_dev, st.st_ino, st.st_mtime_ns, huella)
+            )
+            self._contar_cambio()
+        self.aciertos += 1
+        return True
+
+    def registrar(self, ruta, tipo):
+        """Anota un archivo recién optimizado."""
+        st = os.stat(ruta)
+        huella = huella_contenido(ruta, st)
+        if huella is None:
+            return
+        self.conexion.execute(
+            "INSERT OR REPLACE INTO optimizados (huella, dispositivo, inodo, tamano, mtime_ns, tipo) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (huella, st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, tipo)
+        )
+        self._contar_cambio()
+
+    def registrar_conversion(self, origen, salida):
+        """Anota que 'salida' es la conversión de 'origen' (ambos aún en disco)."""
+        huella_origen = huella_contenido(origen, os.stat(origen))
+        huella_salida = huella_contenido(salida, os.stat(salida))
+        if huella_origen is None or huella_salida is None:
+            return
+        self.conexion.execute("INSERT OR REPLACE INTO conversiones (origen, salida) VALUES (?, ?)",
+                              (huella_origen, huella_salida))
+        self._contar_cambio()
+
+    def es_conversion(self, origen, st_origen, salida, st_salida):
+        """True si 'salida' es justo la conversión que se anotó de 'origen' (y no otro archivo con su nombre)."""
+        huella_origen = huella_contenido(origen, st_origen)
+        if huella_origen is None:
+            return False
+        fila = self.conexion.execute("SELECT salida FROM conversiones WHERE origen = ?", (huella_origen,)).fetchone()
+        return fila is not None and fila[0] == huella_contenido(salida, st_salida)
+
+    def _contar_cambio(self):
+        self.pendientes += 1
+        if self.pendientes >= 100:
+            self.conexion.commit()
+            self.pendientes = 0
+
+    def cerrar(self):
+        self.conexion.commit()
+        self.conexion.close()
+
+def abrir_manifiesto(log_func):
+    """Abre el manifiesto de optimizados. Si no es posible, retorna None y se optimiza todo."""
+    try:
+        return ManifiestoOptimizados()
+    except Exception as e:
+        log_func(f"No se pudo abrir el manifiesto de optimizados: {e}", nivel="warning")
+        return None
@@ -0,0 +1,90 @@
+import os
+import sys
+import threading
+import unicodedata
+
+def _insensible_por_defecto():
+    """Windows y macOS usan por defecto sistemas de archivos que no distinguen mayúsculas."""
+    return os.name == 'nt' or sys.platform == 'darwin'
+
+def _detectar_insensible(directorio, nombres):
+    """
+    Averigua si la carpeta ignora mayúsculas: busca un nombre existente con la capitalización
+    invertida y comprueba si apunta al mismo archivo. Sin nombres útiles, se usa el valor del sistema.
+    """
+    for nombre in nombres:
+        invertido = nombre.swapcase()
+        if invertido == nombre: continue
+        try:
+            original = os.lstat(os.path.join(directorio, nombre))
+        except OSError:
+            continue
+        try:
+            otro = os.lstat(os.path.join(directorio, invertido))
+        except OSError:
+            return False
+        return os.path.samestat(original, otro)
+    return _insensible_por_defecto()
+
+class AsignadorNombres:
+    """
+    Reparte nombres de destino únicos ("foto.jpg", "foto_1.jpg", "foto_2.jpg"...) sin sondear el disco.
+    Cada carpeta de destino se lista una sola vez y sus nombres quedan en un conjunto en memoria,
+    así que cada consulta es O(1) aunque miles de archivos compartan nombre.
+    Es seguro entre hilos y, en carpetas que no distinguen mayúsculas, "Foto.JPG" choca con "foto.jpg".
+    """
+    def __init__(self, inventario=None):
+        self.inventario = inventario
+        self._lock = threading.Lock()
+        # carpeta -> (ignora mayúsculas, conjunto de nombres normalizados)
+        self._carpetas = {}
+        # (carpeta, base, extensión) -> siguiente sufijo a probar
+        self._siguiente = {}
+
+    def _cargar(self, directorio):
+        clave = os.path.normcase(os.path.normpath(directorio))
+        if clave in self._carpetas:
+            return clave, self._carpetas[clave]
+        nombres = self.inventario.nombres(directorio) if self.inventario else None
+        if nombres is None:
+            try:
+                nombres = os.listdir(directorio)
+            except OSError:
+                nombres = []
+        insensible = _detectar_insensible(directorio, nombres)
+        carpeta = (insensible, {self._normalizar(n, insensible) for n in nombres})
+        self._carpetas[clave] = carpeta
+        return clave, carpeta
+
+    @staticmethod
+    def _normalizar(nombre, insensible):
+        nombre = unicodedata.normalize('NFC', nombre)
+        return nombre.casefold() if insensible else nombre
+
+    def reservar(self, directorio, nombre):
+        """Devuelve una ruta libre dentro de 'directorio' para 'nombre' y la marca como ocupada."""
+        with self._lock:
+            clave, (insensible, ocupados) = self._cargar(directorio)
+            candidato = nombre
+            normalizado = self._normalizar(candidato, insensible)
+            if normalizado in ocupados:
+                n, e = os.path.splitext(nombre)
+                contador = (clave, self._normalizar(n, insensible), self._normalizar(e, insensible))
+                c = self._siguiente.get(contador, 1)
+                while True:
+                    candidato = f"{n}_{c}{e}"
+                    normalizado = self._normalizar(candidato, insensible)
+                    c += 1
+                    if normalizado not in ocupados: break
+                self._siguiente[contador] = c
+            ocupados.add(normalizado)
+            return os.path.join(directorio, candidato)
+
+    def liberar(self, ruta):
+        """Marca como libre el nombre de un archivo que salió de su carpeta (si la carpeta está cargada)."""
+        directorio, nombre = os.path.split(ruta)
+        with self._lock:
+            carpeta = self._carpetas.get(os.path.normcase(os.path.normpath(directorio)))
+            if carpeta:
+                insensible, ocupados = carpeta
+                ocupados.discard(self._normalizar(nombre, insensible))
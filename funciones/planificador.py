@@ -0,0 +1,203 @@
+import os
+import errno
+from funciones.inventario import _clave
+from funciones.copiado import mover_entre_dispositivos
+
+class ErrorMovimiento(OSError):
+    """Fallo al llevar un pendiente a su destino; 'clave' es el archivo que no se pudo mover."""
+    def __init__(self, clave, error):
+        if error.errno is not None:
+            super().__init__(error.errno, error.strerror, error.filename)
+        else:
+            super().__init__(*error.args)
+        self.clave = clave
+
+class PlanMovimientos:
+    """
+    Difiere los movimientos de archivos del Modo Automático.
+    Los pasos mueven los archivos solo en el inventario (ruta lógica) y el plan recuerda dónde
+    sigue cada uno en disco (ruta física). Al aplicarlo, cada archivo hace un único renombrado
+    a su destino final, aunque los pasos lo hayan movido varias veces (p. ej. a 'Imagenes'
+    y de vuelta a la raíz, o primero a 'basura').
+    """
+    simulado = False
+
+    def __init__(self, comprobar_destino=False, reanudando=False):
+        # 'comprobar_destino': nunca sobrescribir (planes que se ejecutan tiempo después de simularse)
+        # 'reanudando': un origen ausente con el destino ya presente es un movimiento hecho antes del corte
+        self.comprobar_destino = comprobar_destino
+        self.reanudando = reanudando
+        # clave lógica -> [ruta lógica, ruta física]
+        self._pendientes = {}
+        # clave física -> clave lógica (qué archivo pendiente ocupa cada ruta del disco)
+        self._por_origen = {}
+        self._directorios = []
+        # clave lógica -> ruta física original de los archivos apartados a un '.orgest_mov' por un ciclo
+        self._aparcados = {}
+        # Rutas físicas de archivos que no se pudieron mover (siguen ocupando su sitio)
+        self._bloqueadas = set()
+        # Movimientos hechos en la llamada actual a _ejecutar (clave, destino, física)
+        self._hechos = []
+        self.movimientos = 0
+        self.renombrados = 0
+
+    def mover(self, origen, destino):
+        """Registra un movimiento lógico sin tocar el disco."""
+        entrada = self._pendientes.pop(_clave(origen), None)
+        fisica = entrada[1] if entrada else origen
+        if entrada:
+            del self._por_origen[_clave(fisica)]
+        if _clave(fisica) != _clave(destino):
+            self._pendientes[_clave(destino)] = [destino, fisica]
+            self._por_origen[_clave(fisica)] = _clave(destino)
+        self.movimientos += 1
+
+    def eliminar_directorio(self, carpeta):
+        """Registra una carpeta vacía (lógicamente) para borrarla cuando sus archivos ya no estén."""
+        self._directorios.append(carpeta)
+
+    def resolver(self, ruta):
+        """Ruta en disco del archivo que lógicamente está en 'ruta'."""
+        entrada = self._pendientes.get(_clave(ruta))
+        return entrada[1] if entrada else ruta
+
+    def _hecho_antes(self, origen, destino):
+        return self.reanudando and not os.path.lexists(origen) and os.path.lexists(destino)
+
+    def _renombrar(self, origen, destino):
+        if self.comprobar_destino and os.path.lexists(destino):
+            if self._hecho_antes(origen, destino): return
+            raise FileExistsError(f"El destino ya existe: {destino}")
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        try:
+            os.rename(origen, destino)
+        except OSError as e:
+            if self._hecho_antes(origen, destino): return
+            if e.errno != errno.EXDEV: raise
+            mover_entre_dispositivos(origen, destino)
+        self.renombrados += 1
+
+    def _deshacer_ciclo(self):
+        """
+        Un ciclo se cortó a medias: se deshacen sus movimientos ya hechos y los archivos apartados
+        ('.orgest_mov') vuelven a su sitio, así ninguno queda con un nombre temporal oculto.
+        """
+        for clave, destino, fisica in reversed(self._hechos):
+            if os.path.lexists(fisica):
+                continue
+            try:
+                os.rename(destino, fisica)
+            except OSError:
+                continue
+            self._pendientes[clave] = [destino, fisica]
+            self._por_origen[_clave(fisica)] = clave
+            self.renombrados -= 1
+        for clave, original in self._aparcados.items():
+            entrada = self._pendientes.get(clave)
+            if entrada is None or os.path.lexists(original):
+                continue
+            try:
+                os.rename(entrada[1], original)
+            except OSError:
+                continue
+            del self._por_origen[_clave(entrada[1])]
+            entrada[1] = original
+            self._por_origen[_clave(original)] = clave
+        self._aparcados.clear()
+
+    def _ejecutar(self, clave):
+        """
+        Lleva un archivo pendiente a su destino, despejando antes la ruta si otro pendiente la ocupa.
+        Si un movimiento falla a mitad de un ciclo, el ciclo se deshace. En todo caso se lanza
+        ErrorMovimiento con la clave del archivo que falló (puede ser otro pendiente, no 'clave').
+        """
+        self._hechos = []
+        try:
+            self._ejecutar_pila(clave)
+        except OSError as e:
+            if self._aparcados: self._deshacer_ciclo()
+            if isinstance(e, ErrorMovimiento): raise
+            raise ErrorMovimiento(clave, e) from e
+
+    def _ejecutar_pila(self, clave):
+        pila = [clave]
+        en_pila = {clave}
+        while pila:
+            actual = pila[-1]
+            destino, fisica = self._pendientes[actual]
+            bloqueo = self._por_origen.get(_clave(destino))
+            if _clave(destino) in self._bloqueadas:
+                raise ErrorMovimiento(actual, FileExistsError(f"El destino lo ocupa un archivo que no se pudo mover: {destino}"))
+            if bloqueo is not None:
+                if bloqueo in en_pila:
+                    # Ciclo (a -> b, b -> a): se aparta el archivo que ocupa el destino
+                    entrada = self._pendientes[bloqueo]
+                    directorio, nombre = os.path.split(entrada[1])
+                    temporal = os.path.join(directorio, f".{nombre}.orgest_mov")
+                    try:
+                        self._renombrar(entrada[1], temporal)
+                    except OSError as e:
+                        raise ErrorMovimiento(bloqueo, e) from e
+                    self._aparcados[bloqueo] = entrada[1]
+                    del self._por_origen[_clave(entrada[1])]
+                    entrada[1] = temporal
+                    self._por_origen[_clave(temporal)] = bloqueo
+                else:
+                    pila.append(bloqueo)
+                    en_pila.add(bloqueo)
+                continue
+            try:
+                self._renombrar(fisica, destino)
+            except OSError as e:
+                raise ErrorMovimiento(actual, e) from e
+            del self._pendientes[actual]
+            del self._por_origen[_clave(fisica)]
+            self._aparcados.pop(actual, None)
+            self._hechos.append((actual, destino, fisica))
+            pila.pop()
+            en_pila.discard(actual)
+
+    def materializar(self, ruta):
+        """
+        Hace que el disco coincida con el inventario en 'ruta' antes de leer o escribir ahí:
+        mueve fuera al pendiente que aún ocupe esa ruta y trae el archivo que lógicamente le corresponde.
+        """
+        ocupante = self._por_origen.get(_clave(ruta))
+        if ocupante is not None:
+            self._ejecutar(ocupante)
+        if _clave(ruta) in self._pendientes:
+            self._ejecutar(_clave(ruta))
+        return ruta
+
+    def pendiente_en(self, ruta):
+        """True si materializar(ruta) tendría que mover algo en disco."""
+        clave = _clave(ruta)
+        return clave in self._pendientes or clave in self._por_origen
+
+    def pendientes(self):
+        return len(self._pendientes)
+
+    def aplicar(self, log_func=None):
+        """Ejecuta todos los movimientos pendientes (uno por archivo) y borra las carpetas vaciadas."""
+        errores = 0
+        for clave in list(self._pendientes):
+            while clave in self._pendientes:
+                try:
+                    self._ejecutar(clave)
+                except ErrorMovimiento as e:
+                    # Se descarta el archivo que falló (no necesariamente 'clave', puede ser el que la
+                    # bloqueaba: entonces 'clave' se reintenta y, si aún lo necesitaba, falla a su vez)
+                    errores += 1
+                    destino, fisica = self._pendientes.pop(e.clave)
+                    self._por_origen.pop(_clave(fisica), None)
+                    self._bloqueadas.add(_clave(fisica))
+                    if log_func: log_func(f"Error moviendo {fisica} a {destino}: {e}", nivel="error")
+
+        for carpeta in self._directorios:
+            try: os.rmdir(carpeta)
+            except OSError: pass
+        self._directorios = []
+
+        if log_func:
+            log_func(f"Plan de movimientos: {self.movimientos} movimientos lógicos, {self.renombrados} renombrados en disco.", nivel="debug")
+        return errores
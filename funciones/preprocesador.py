@@ -1,82 +1,177 @@
 import os
+import math
 import shutil
-import subprocess
 from pathlib import Path
-from funciones.dependencias import verificar_ffmpeg 
+from funciones.dependencias import verificar_ffmpeg, ffmpeg_soporta
+from funciones.inventario import recorrer, mover_archivo, crear_directorio, simulando
+from funciones.nombres import AsignadorNombres
+from funciones.flujo import iniciar_flujo, reportar_progreso
+from funciones.copiado import crear_backup, EstadisticasCopia
+from funciones.sondeo import abrir_cache_sondeos, sondear, decidir_video
+from funciones.progreso import ejecutar_ffmpeg_con_progreso
+from funciones.espacio import ControlEspacio, necesidad_optimizacion
+from funciones.trabajos import PoolFunciones, trabajo_cancelado
+from funciones.manifiesto import abrir_manifiesto
 
 # Extensiones soportadas
 EXT_IMAGENES = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff'}
 EXT_VIDEOS = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v'}
+# Lado máximo (px) de las imágenes optimizadas
+LADO_MAXIMO = 5000
+# Tope de memoria para decodificar una imagen en cada proceso (con la decodificación reducida de
+# JPEG, un 12000 px solo necesita ~1/4 de lo que ocuparía a resolución completa)
+MEMORIA_MAXIMA_IMAGEN_MB = 1024
+# Imágenes que se mandan juntas a cada proceso del pool (menos idas y vueltas con las pequeñas)
+LOTE_IMAGENES = 4
 
-def encontrar_archivos_media(ruta):
-    """Encuentra recursivamente archivos de imagen y video válidos."""
-    archivos_procesar = []
-    
-    for root, _, files in os.walk(ruta):
+def iterar_archivos_media(ruta, inventario=None):
+    """Genera recursivamente los archivos de imagen y video válidos a medida que se descubren."""
+    for root, _, files in recorrer(ruta, inventario):
         # Ignoramos carpetas propias del programa para evitar bucles o errores
         if any(x in root for x in ["sin_edit", "fallos", "basura", "funciones", "logs"]): continue
             
         for f in files:
             ext = Path(f).suffix.lower()
             if ext in EXT_IMAGENES or ext in EXT_VIDEOS:
-                archivos_procesar.append(os.path.join(root, f))
-                
-    return archivos_procesar
+                yield os.path.join(root, f)
 
-def procesar_video_ffmpeg(ruta_origen, log_func):
+def procesar_video_ffmpeg(ruta_origen, log_func, inventario=None, modo='recodificar', al_progresar=None, duracion=None,
+                          cancel_event=None):
     """
     Re-codifica video a MP4 H.264.
     Usa parámetros específicos para balancear calidad y peso.
+    Con modo='remuxear' (los streams ya son H.264/AAC) solo se cambia el contenedor, sin recodificar.
+    'al_progresar(detalle)' recibe el progreso de FFmpeg mientras trabaja (ver progreso.py); para
+    la fracción y la ETA hace falta la 'duracion' del video (si no se indica, se obtiene con FFprobe).
     """
     directorio, nombre_archivo = os.path.split(ruta_origen)
     nombre_base = os.path.splitext(nombre_archivo)[0]
     # Creamos un archivo temporal para no sobrescribir el original mientras se procesa
     ruta_temp = os.path.join(directorio, f"temp_{nombre_base}.mp4")
     
-    cmd = [
-        'ffmpeg', '-i', ruta_origen,
-        '-c:v', 'libx264', '-crf', '23', '-preset', 'fast',
-        '-c:a', 'aac', '-b:a', '128k',
-        '-movflags', '+faststart',
-        ruta_temp, '-y', '-loglevel', 'error'
-    ]
-    
-    # --- CONFIGURACIÓN PARA OCULTAR CONSOLA EN WINDOWS ---
-    startup_args = {}
-    if os.name == 'nt':
-        startup_args['creationflags'] = subprocess.CREATE_NO_WINDOW
-    # -----------------------------------------------------
-
-    # Pasamos startup_args a subprocess.run
-    res = subprocess.run(cmd, capture_output=True, text=True, **startup_args)
+    if modo == 'remuxear':
+        # Solo el video principal y el audio: lo demás no se puede copiar a MP4 tal cual
+        cmd = ['ffmpeg', '-i', ruta_origen, '-map', '0:v:0', '-map', '0:a?', '-c', 'copy', '-sn', '-dn',
+               '-movflags', '+faststart', ruta_temp, '-y', '-loglevel', 'error']
+    else:
+        cmd = [
+            'ffmpeg', '-i', ruta_origen,
+            '-c:v', 'libx264', '-crf', '23', '-preset', 'fast',
+            '-c:a', 'aac', '-b:a', '128k',
+            '-movflags', '+faststart',
+            ruta_temp, '-y', '-loglevel', 'error'
+        ]
+
+    if al_progresar and duracion is None:
+        duracion = (sondear(ruta_origen) or {}).get('duracion')
+    codigo, errores = ejecutar_ffmpeg_con_progreso(cmd, duracion, al_progresar, cancel_event)
     
-    if res.returncode == 0:
+    if codigo == 0:
         # Si la conversión fue exitosa:
         ruta_final = os.path.join(directorio, f"{nombre_base}.mp4")
         
         # Si el archivo original no era .mp4, lo borramos (ya tenemos la versión nueva)
         if ruta_origen != ruta_final:
             os.remove(ruta_origen)
+            if inventario: inventario.eliminar(ruta_origen)
             
-        # Renombramos el temporal al nombre final
-        shutil.move(ruta_temp, ruta_final)
+        # Sustituimos (os.replace) en lugar de reescribir: el backup puede ser un hardlink al original
+        os.replace(ruta_temp, ruta_final)
+        if inventario: inventario.agregar(ruta_final)
         return True
     else:
-        # Si falló, registramos el error y borramos el archivo temporal corrupto
-        log_func(f"Error FFmpeg en {nombre_archivo}: {res.stderr}", nivel="error")
+        # Si falló (o se canceló), registramos el error y borramos el archivo temporal corrupto
+        if not (cancel_event and cancel_event.is_set()):
+            log_func(f"Error FFmpeg en {nombre_archivo}: {errores}", nivel="error")
         if os.path.exists(ruta_temp):
             os.remove(ruta_temp)
         return False
 
-def preprocesar_contenido(ruta, log_func, modo_automatico=True, update_callback=None, cancel_event=None):
+def memoria_decodificacion(img, convertir):
+    """Memoria aproximada (bytes) que ocupa decodificar 'img' a su tamaño actual (y pasarla a RGB)."""
+    ancho, alto = img.size
+    return ancho * alto * (len(img.getbands()) + (3 if convertir else 0))
+
+def optimizar_imagen(ruta, reducir_al_decodificar=True):
+    """
+    Convierte a RGB, limita el tamaño a LADO_MAXIMO px y re-guarda la imagen con optimización.
+    Los JPEG más grandes se decodifican ya reducidos (1/2, 1/4 o 1/8, lo justo para no bajar del
+    tamaño final) en vez de a resolución completa. Si aun así decodificarla pasaría de
+    MEMORIA_MAXIMA_IMAGEN_MB, se deja como está sin decodificarla y retorna False: así el pico de
+    memoria de cada proceso está acotado. Retorna True si la optimizó.
+    Se guarda en un temporal que luego sustituye al original (os.replace): el archivo
+    original nunca se reescribe en su sitio, así su backup puede ser un hardlink.
+    """
+    from PIL import Image
+    directorio, nombre = os.path.split(ruta)
+    temporal = os.path.join(directorio, f".{nombre}.orgest_tmp")
+    try:
+        with Image.open(ruta) as img:
+            formato = img.format
+            convertir = img.mode in ('RGBA', 'P', 'LA', 'CMYK')
+            if reducir_al_decodificar and max(img.size) > LADO_MAXIMO:
+                # Solo actúa en JPEG (escala de la DCT); en otros formatos no hace nada
+                escala = LADO_MAXIMO / max(img.size)
+                img.draft(None, (math.ceil(img.width * escala), math.ceil(img.height * escala)))
+            if memoria_decodificacion(img, convertir) > MEMORIA_MAXIMA_IMAGEN_MB * 1024 * 1024:
+                return False
+
+            # Convertir a RGB:
+            if convertir:
+                img = img.convert('RGB')
+            
+            # Redimensionar solo si es excesivamente grande
+            if max(img.size) > LADO_MAXIMO:
+                img.thumbnail((LADO_MAXIMO, LADO_MAXIMO), Image.LANCZOS)
+                
+            # Guardar con optimización activada (elimina metadatos innecesarios)
+            img.save(temporal, format=formato, quality=85, optimize=True)
+        shutil.copymode(ruta, temporal)
+        os.replace(temporal, ruta)
+        return True
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+def optimizar_imagenes(rutas):
+    """
+    optimizar_imagen() sobre un lote, en un proceso del pool. No recibe log_func: retorna, por
+    cada ruta, None, False si se dejó sin tocar (no cabe en memoria) o el error, y el proceso
+    principal registra los fallos.
+    """
+    errores = []
+    for ruta in rutas:
+        if trabajo_cancelado():
+            errores.append("Cancelado")
+            continue
+        try:
+            errores.append(None if optimizar_imagen(ruta) else False)
+        except Exception as e:
+            errores.append(str(e) or type(e).__name__)
+    return errores
+
+def preprocesar_contenido(ruta, log_func, modo_automatico=True, update_callback=None, cancel_event=None, inventario=None,
+                          reserva_mb=None, procesos=None, lote=LOTE_IMAGENES):
     """
     Optimiza imágenes (usando Pillow) y videos (usando FFmpeg).
-    Crea backups en 'sin_edit' antes de modificar cualquier archivo para seguridad.
+    Las imágenes se optimizan en un pool de procesos ('procesos', uno por núcleo por defecto) en
+    lotes de 'lote' imágenes, mientras los videos siguen uno a uno en este hilo.
+    Crea backups en 'sin_edit' antes de modificar cualquier archivo para seguridad; en el mismo
+    sistema de archivos son reflinks o hardlinks (sin copiar datos) y si no, copias.
+    Si recibe un 'inventario' compartido lo usa para recorrer y lo mantiene actualizado.
+    Con un inventario en simulación (dry-run) solo se registran las acciones.
+    Cada video se sondea con FFprobe (con caché, ver sondeo.py): los que ya son MP4 H.264/AAC
+    con un bitrate razonable se saltan, y si solo falla el contenedor se remuxean sin recodificar.
+    Lo que produce se anota en un manifiesto por huella de contenido (ver manifiesto.py): en
+    ejecuciones posteriores se salta aunque se haya movido, sin re-comprimirlo otra vez.
+    Un archivo solo se optimiza si su espacio estimado (ver espacio.py) deja el disco por encima de
+    'reserva_mb'; los que no caben se reintentan al final, de menor a mayor, y si no, se dejan como están.
     """
     # 1. Verificación de herramientas disponibles
     pillow_ok = True
     try:
-        from PIL import Image, ImageOps
+        import PIL
     except ImportError:
         pillow_ok = False
         log_func("Pillow no instalado. Se saltará el procesamiento de imágenes.", nivel="warning")
@@ -91,79 +186,250 @@ def preprocesar_contenido(ruta, log_func, modo_automatico=True, update_callback=
     # 2. Preparar carpetas de seguridad
     sin_edit = os.path.join(ruta, "sin_edit")
     fallos = os.path.join(ruta, "fallos")
-    os.makedirs(sin_edit, exist_ok=True)
+    crear_directorio(sin_edit, inventario)
+    asignador = AsignadorNombres(inventario)
+    estadisticas = EstadisticasCopia()
+    # El backup es un enlace (no ocupa) si el archivo está en el mismo volumen que 'sin_edit'
+    dispositivo = os.stat(ruta).st_dev
     
-    archivos = encontrar_archivos_media(ruta)
-    total_archivos = len(archivos)
+    def en_la_unidad(full_path, st):
+        """True si el archivo está en el volumen de 'ruta' (su backup puede ser un enlace)."""
+        # Un stat de DirEntry en Windows trae st_dev a 0: se compara con el de os.stat
+        if not st.st_dev:
+            try:
+                st = os.stat(full_path)
+            except OSError:
+                return False
+        return st.st_dev == dispositivo
+    control = ControlEspacio(ruta, reserva_mb, simulado=simulando(inventario))
+    omitidos_sin_espacio = 0
+    pool = PoolFunciones(procesos, cancel_event) if pillow_ok and not simulando(inventario) else None
+    # Imágenes con su backup hecho que esperan a completar un lote
+    lote_actual = []
+    bytes_ahorrados = 0
+    cache = abrir_cache_sondeos(log_func) if ffmpeg_ok else None
+    manifiesto = abrir_manifiesto(log_func)
+    en_manifiesto = 0
+    # motivo -> videos que no hizo falta tocar
+    omitidos = {}
+    remuxeados = 0
+    demasiado_grandes = 0
+    
+    flujo = iniciar_flujo(iterar_archivos_media(ruta, inventario), inventario)
     procesados = 0
     archivos_procesados_count = 0
     
-    for full_path in archivos:
-        # Cancelación desde la GUI
-        if cancel_event and cancel_event.is_set():
-            return {}
-            
-        root, f = os.path.split(full_path)
-        ext = Path(f).suffix.lower()
-        es_video = ext in EXT_VIDEOS
-        es_imagen = ext in EXT_IMAGENES
-        
-        # Saltamos si falta la herramienta específica para ese archivo
-        if es_video and not ffmpeg_ok:
-            archivos_procesados_count += 1
-            continue
-        if es_imagen and not pillow_ok:
-            archivos_procesados_count += 1
-            continue
-            
+    def procesar(trabajo):
+        """Backup y optimización de un archivo que ya tiene su espacio reservado."""
+        nonlocal bytes_ahorrados, procesados, remuxeados, archivos_procesados_count
+        full_path, f, es_imagen, es_video, modo, info, necesidad = trabajo
         try:
             # 3. BACKUP DE SEGURIDAD (Crítico)
             # Antes de modificar, guardamos una copia idéntica en 'sin_edit'
-            backup = os.path.join(sin_edit, f)
-            c = 1
             # Evitamos sobrescribir backups existentes
-            while os.path.exists(backup):
-                n, e = os.path.splitext(f)
-                backup = os.path.join(sin_edit, f"{n}_{c}{e}")
-                c += 1
-            shutil.copy2(full_path, backup)
-            
+            backup = asignador.reservar(sin_edit, f)
             exito = False
             
-            # 4. Procesamiento según tipo
-            if es_imagen:
-                with Image.open(full_path) as img:
-                    # Convertir a RGB:
-                    if img.mode in ('RGBA', 'P', 'LA', 'CMYK'):
-                        img = img.convert('RGB')
-                    
-                    # Redimensionar solo si es excesivamente grande (>5000px)
-                    if max(img.size) > 5000:
-                        img.thumbnail((5000, 5000), Image.LANCZOS)
+            if simulando(inventario):
+                # Dry-run: se registra el backup y la optimización sin tocar el disco
+                inventario.plan.registrar('backup', origen=full_path, destino=backup)
+                st = inventario.stat(full_path)
+                inventario.agregar(backup, st)
+                if en_la_unidad(full_path, st): bytes_ahorrados += st.st_size
+                if es_imagen:
+                    inventario.plan.registrar('optimizar', origen=full_path, tipo='imagen', espacio=sum(necesidad))
+                else:
+                    ruta_final = os.path.splitext(full_path)[0] + '.mp4'
+                    inventario.plan.registrar('optimizar', origen=full_path, destino=ruta_final, tipo='video', modo=modo,
+                                              duracion=(info or {}).get('duracion'), espacio=sum(necesidad))
+                    if ruta_final != full_path: inventario.mover(full_path, ruta_final)
+                exito = True
+                
+            else:
+                crear_backup(full_path, backup, estadisticas)
+                if inventario: inventario.agregar(backup)
+                
+                # 4. Procesamiento según tipo
+                if es_imagen:
+                    # Se optimiza en el pool; el resultado se recoge en terminar_imagen()
+                    lote_actual.append(trabajo)
+                    if len(lote_actual) >= lote: enviar_lote()
+                    return
                         
-                    # Guardar con optimización activada (elimina metadatos innecesarios)
-                    img.save(full_path, quality=85, optimize=True)
-                    exito = True
-                    
-            elif es_video:
-                # Delegamos la tarea compleja a la función de FFmpeg
-                exito = procesar_video_ffmpeg(full_path, log_func)
+                elif es_video:
+                    # Delegamos la tarea compleja a la función de FFmpeg
+                    # El progreso de FFmpeg avanza la barra dentro del archivo (40 minutos de video no son un salto)
+                    def al_progresar(detalle, hechos=archivos_procesados_count, nombre=f):
+                        reportar_progreso(update_callback, hechos + (detalle['fraccion'] or 0), flujo, nombre, detalle)
+                    exito = procesar_video_ffmpeg(full_path, log_func, inventario, modo,
+                                                  al_progresar if update_callback else None,
+                                                  (info or {}).get('duracion'), cancel_event)
 
             if exito:
                 procesados += 1
+                if modo == 'remuxear': remuxeados += 1
+                if es_video and not simulando(inventario):
+                    anotar_optimizado(os.path.splitext(full_path)[0] + '.mp4', 'video')
                 
         except Exception as e:
-            # Si algo falla, registramos el error y movemos el archivo problemático a 'fallos'
-            log_func(f"Error procesando {f}: {e}", nivel="error")
-            os.makedirs(fallos, exist_ok=True)
-            try: shutil.move(full_path, os.path.join(fallos, f))
-            except: pass
+            mandar_a_fallos(full_path, f, e)
 
+        control.liberar(*necesidad)
         # 5. Actualizar GUI
         archivos_procesados_count += 1
-        if update_callback: update_callback(archivos_procesados_count, total_archivos, f)
+        reportar_progreso(update_callback, archivos_procesados_count, flujo, f)
+
+    def anotar_optimizado(ruta_salida, tipo):
+        if manifiesto is None:
+            return
+        try:
+            manifiesto.registrar(ruta_salida, tipo)
+        except Exception as e:
+            log_func(f"No se pudo anotar {os.path.basename(ruta_salida)} en el manifiesto: {e}", nivel="warning")
+
+    def mandar_a_fallos(full_path, f, error):
+        # Si algo falla, registramos el error y movemos el archivo problemático a 'fallos'
+        log_func(f"Error procesando {f}: {error}", nivel="error")
+        crear_directorio(fallos, inventario)
+        try: mover_archivo(full_path, asignador.reservar(fallos, f), inventario)
+        except: pass
+
+    def enviar_lote():
+        trabajos = lote_actual[:]
+        lote_actual.clear()
+        rutas = [t[0] for t in trabajos]
+        pool.enviar(optimizar_imagenes, rutas, dato=trabajos, rutas=rutas)
+
+    def terminar_imagen(trabajo, error):
+        nonlocal procesados, archivos_procesados_count, demasiado_grandes
+        full_path, f, *_, necesidad = trabajo
+        if error is False:
+            # Decodificarla pasaría de MEMORIA_MAXIMA_IMAGEN_MB: se deja como está, no es un fallo
+            demasiado_grandes += 1
+            log_func(f"{f} es demasiado grande para optimizarla en memoria; se deja como está.", nivel="info")
+        elif error is None:
+            if inventario: inventario.agregar(full_path)
+            procesados += 1
+            anotar_optimizado(full_path, 'imagen')
+        elif not (cancel_event and cancel_event.is_set()):
+            mandar_a_fallos(full_path, f, error)
+        control.liberar(*necesidad)
+        archivos_procesados_count += 1
+        reportar_progreso(update_callback, archivos_procesados_count, flujo, f)
+
+    def recoger(esperar=False):
+        """Cierra los lotes de imágenes acabados, a medida que terminan."""
+        for trabajos, errores, error in pool.resultados(esperar):
+            # Si falló el lote entero (p. ej. un proceso murió), falla cada imagen
+            for trabajo, error_imagen in zip(trabajos, errores or [error] * len(trabajos)):
+                terminar_imagen(trabajo, error_imagen)
+
+    def admitir_en_espera():
+        for trabajo in control.admitibles():
+            procesar(trabajo)
+
+    try:
+        for full_path in flujo:
+            # Cancelación desde la GUI
+            if cancel_event and cancel_event.is_set():
+                return {}
+            
+            root, f = os.path.split(full_path)
+            ext = Path(f).suffix.lower()
+            es_video = ext in EXT_VIDEOS
+            es_imagen = ext in EXT_IMAGENES
+        
+            # Saltamos si falta la herramienta específica para ese archivo
+            if es_video and not ffmpeg_ok:
+                archivos_procesados_count += 1
+                continue
+            if es_imagen and not pillow_ok:
+                archivos_procesados_count += 1
+                continue
+
+            # Salidas de una ejecución anterior (aunque se hayan movido): no se vuelven a optimizar
+            try:
+                st = inventario.stat(full_path) if inventario else os.stat(full_path)
+            except OSError:
+                st = None
+            if manifiesto and st and manifiesto.contiene(full_path, st):
+                en_manifiesto += 1
+                archivos_procesados_count += 1
+                reportar_progreso(update_callback, archivos_procesados_count, flujo, f)
+                continue
+
+            # Videos que ya cumplen el perfil: no se tocan (ni backup); si solo falla el contenedor, se remuxean
+            modo = 'recodificar'
+            info = None
+            if es_video:
+                try:
+                    info = sondear(full_path, st, cache)
+                    modo, motivo = decidir_video(full_path, info)
+                except OSError:
+                    pass
+                if modo == 'recodificar' and not ffmpeg_soporta(encoder='libx264'):
+                    # Este FFmpeg no puede producir H.264: el video se deja como está
+                    modo, motivo = 'saltar', 'sin_libx264'
+                if modo == 'saltar':
+                    omitidos[motivo] = omitidos.get(motivo, 0) + 1
+                    archivos_procesados_count += 1
+                    reportar_progreso(update_callback, archivos_procesados_count, flujo, f)
+                    continue
+            
+            # El espacio que necesita (versión nueva + backup si no se puede enlazar) debe caber
+            # por encima de la reserva; si no, espera a que otros liberen y se intenta al final
+            try:
+                st = inventario.stat(full_path) if inventario else os.stat(full_path)
+                necesidad = necesidad_optimizacion(st.st_size, es_video, en_la_unidad(full_path, st))
+            except OSError:
+                necesidad = (0, 0)
+            trabajo = (full_path, f, es_imagen, es_video, modo, info, necesidad)
+            if control.admitir(*necesidad):
+                procesar(trabajo)
+            else:
+                control.encolar(trabajo, *necesidad)
+            if pool: recoger()
+            admitir_en_espera()
+
+        # Terminar las imágenes en marcha; lo que esperaba espacio entra a medida que se libera
+        while True:
+            if lote_actual: enviar_lote()
+            if pool: recoger(esperar=True)
+            if cancel_event and cancel_event.is_set():
+                return {}
+            admitir_en_espera()
+            if not lote_actual:
+                break
+        # Lo que no cupo ni después de optimizar el resto se deja como está
+        for full_path, f, _, _, _, _, necesidad in control.descartar_espera():
+            omitidos_sin_espacio += 1
+            log_func(f"Sin espacio en disco para optimizar {f} ({sum(necesidad) / 1048576:.1f} MB); "
+                     f"se deja como está.", nivel="warning")
+            archivos_procesados_count += 1
+            reportar_progreso(update_callback, archivos_procesados_count, flujo, f)
+    finally:
+        if pool:
+            if cancel_event and cancel_event.is_set():
+                pool.cancelar()
+            pool.cerrar()
+        if cache: cache.cerrar()
+        if manifiesto: manifiesto.cerrar()
+
+    if estadisticas.archivos_enlazados:
+        log_func(f"Backups en 'sin_edit' enlazados sin copiar: {estadisticas.archivos_enlazados} "
+                 f"({estadisticas.bytes_ahorrados / 1048576:.1f} MB ahorrados)", nivel="info")
+    if estadisticas.archivos_copiados:
+        log_func(f"Backups en 'sin_edit' copiados: {estadisticas.archivos_copiados} archivos, "
+                 f"{estadisticas.bytes_copiados / 1048576:.1f} MB a {estadisticas.mb_por_segundo:.1f} MB/s", nivel="info")
 
     if update_callback and not (cancel_event and cancel_event.is_set()):
         update_callback(1, 1, "")
         
-    return {'archivos_optimizados': procesados}
\ No newline at end of file
+    res = {'archivos_optimizados': procesados, 'bytes_ahorrados': bytes_ahorrados + estadisticas.bytes_ahorrados}
+    if remuxeados: res['videos_remuxeados'] = remuxeados
+    if omitidos_sin_espacio: res['omitidos_sin_espacio'] = omitidos_sin_espacio
+    if en_manifiesto: res['omitidos_ya_optimizados'] = en_manifiesto
+    if demasiado_grandes: res['imagenes_omitidas_por_memoria'] = demasiado_grandes
+    for motivo, cantidad in omitidos.items():
+        res[f'videos_omitidos_{motivo}'] = cantidad
+    return res
\ No newline at end of file
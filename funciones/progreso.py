@@ -0,0 +1,105 @@
+import os
+import time
+import threading
+import subprocess
+from collections import deque
+from funciones.dependencias import resolver_comando
+
+# Últimas líneas de stderr que se conservan de cada FFmpeg (para el mensaje de error)
+LINEAS_STDERR = 200
+# Como mucho un aviso de progreso cada tanto (FFmpeg escribe varios bloques por segundo)
+INTERVALO_PROGRESO = 0.25
+
+def _segundos(bloque):
+    """Tiempo ya codificado de un bloque de '-progress' (en segundos) o None."""
+    # 'out_time_ms' también viene en microsegundos (error histórico de FFmpeg)
+    for clave in ('out_time_us', 'out_time_ms'):
+        try:
+            return int(bloque[clave]) / 1_000_000
+        except (KeyError, ValueError):
+            pass
+    try:
+        h, m, s = bloque['out_time'].split(':')
+        return int(h) * 3600 + int(m) * 60 + float(s)
+    except (KeyError, ValueError):
+        return None
+
+def _numero(texto):
+    try:
+        return float(texto.rstrip('x'))
+    except (AttributeError, ValueError):
+        return None
+
+def ejecutar_ffmpeg_con_progreso(cmd, duracion=None, al_progresar=None, cancel_event=None):
+    """
+    Ejecuta un comando FFmpeg con '-progress pipe:1' y va leyendo su progreso.
+    'al_progresar(detalle)' recibe un dict con 'fraccion' (0-1, si se conoce 'duracion'), 'segundos',
+    'fps', 'velocidad' (x tiempo real), 'tamano' (bytes escritos) y 'eta' (segundos restantes o None).
+    stderr se drena en un hilo a un búfer circular: solo se guardan las últimas LINEAS_STDERR líneas.
+    Si se activa 'cancel_event', el proceso se mata. Retorna (código de salida, últimas líneas de stderr).
+    """
+    cmd = resolver_comando(cmd)
+    cmd = cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + cmd[1:]
+    startup_args = {}
+    if os.name == 'nt':
+        startup_args['creationflags'] = subprocess.CREATE_NO_WINDOW
+
+    proceso = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, errors='replace', bufsize=1, **startup_args)
+    errores = deque(maxlen=LINEAS_STDERR)
+    lector = threading.Thread(target=lambda: errores.extend(l.rstrip() for l in proceso.stderr), daemon=True)
+    lector.start()
+
+    vigia = None
+    if cancel_event is not None:
+        def vigilar():
+            while proceso.poll() is None:
+                if cancel_event.wait(0.2):
+                    proceso.kill()
+                    return
+        vigia = threading.Thread(target=vigilar, daemon=True)
+        vigia.start()
+
+    inicio = time.monotonic()
+    ultimo_aviso = 0.0
+    bloque = {}
+    for linea in proceso.stdout:
+        clave, _, valor = linea.strip().partition('=')
+        if clave != 'progress':
+            bloque[clave] = valor
+            continue
+        # Fin de un bloque ('progress=continue' o 'progress=end')
+        ahora = time.monotonic()
+        if al_progresar and (valor == 'end' or ahora - ultimo_aviso >= INTERVALO_PROGRESO):
+            ultimo_aviso = ahora
+            segundos = _segundos(bloque)
+            velocidad = _numero(bloque.get('speed'))
+            if not velocidad and segundos:
+                velocidad = segundos / max(ahora - inicio, 1e-9)
+            fraccion = eta = None
+            if duracion and segundos is not None:
+                fraccion = min(max(segundos / duracion, 0.0), 1.0)
+                if velocidad:
+                    eta = max(duracion - segundos, 0.0) / velocidad
+            al_progresar({'fraccion': fraccion, 'segundos': segundos, 'fps': _numero(bloque.get('fps')),
+                          'velocidad': velocidad, 'tamano': _numero(bloque.get('total_size')), 'eta': eta})
+        bloque = {}
+
+    proceso.wait()
+    lector.join()
+    return proceso.returncode, "\n".join(errores)
+
+def texto_progreso(detalle):
+    """Resumen corto de un 'detalle' de progreso para mostrarlo: '42% | 2.1x | 58 fps | ETA 12:30'."""
+    partes = []
+    if detalle.get('fraccion') is not None:
+        partes.append(f"{detalle['fraccion'] * 100:.0f}%")
+    if detalle.get('velocidad'):
+        partes.append(f"{detalle['velocidad']:.1f}x")
+    if detalle.get('fps'):
+        partes.append(f"{detalle['fps']:.0f} fps")
+    if detalle.get('eta') is not None:
+        minutos, segundos = divmod(int(detalle['eta']), 60)
+        horas, minutos = divmod(minutos, 60)
+        partes.append(f"ETA {horas}:{minutos:02d}:{segundos:02d}" if horas else f"ETA {minutos}:{segundos:02d}")
+    return " | ".join(partes)
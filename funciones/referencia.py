@@ -0,0 +1,228 @@
+import os
+import sqlite3
+import hashlib
+from funciones.dependencias import obtener_ruta_base_real
+from funciones.inventario import recorrer, mover_archivo, crear_directorio, simulando
+from funciones.nombres import AsignadorNombres
+from funciones.duplicados import (
+    calcular_hash_archivo, calcular_hash_parcial, calcular_en_paralelo,
+    ALGORITMOS_HASH, ALGORITMO_POR_DEFECTO, TAMANO_BLOQUE_PARCIAL
+)
+
+IGNORAR = ["funciones", "logs", "basura", "sin_edit", "fallos"]
+
+def obtener_ruta_indice(ruta_referencia):
+    """Ruta del índice de una biblioteca de referencia (carpeta 'cache/referencias' del programa)."""
+    clave = hashlib.blake2b(os.path.abspath(ruta_referencia).encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(obtener_ruta_base_real(), 'cache', 'referencias', f"{clave}.db")
+
+def _abrir_indice(ruta_indice):
+    os.makedirs(os.path.dirname(os.path.abspath(ruta_indice)), exist_ok=True)
+    conexion = sqlite3.connect(ruta_indice)
+    conexion.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT)")
+    # Los hashes se guardan en binario (sin el prefijo del algoritmo, que va en 'meta')
+    conexion.execute(
+        "CREATE TABLE IF NOT EXISTS archivos ("
+        "ruta TEXT PRIMARY KEY, tamano INTEGER, mtime_ns INTEGER, parcial BLOB, completo BLOB)"
+    )
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_tamano_parcial ON archivos (tamano, parcial)")
+    return conexion
+
+def _leer_meta(conexion, clave):
+    fila = conexion.execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+    return fila[0] if fila else None
+
+def _a_binario(digest):
+    """Convierte "algoritmo:hex" al formato compacto del índice."""
+    return bytes.fromhex(digest.split(':', 1)[1])
+
+def _solapan(ruta_a, ruta_b):
+    """True si una carpeta es la otra o está dentro de ella."""
+    a, b = (os.path.normcase(os.path.abspath(r)) for r in (ruta_a, ruta_b))
+    try:
+        return os.path.commonpath([a, b]) in (a, b)
+    except ValueError:
+        # Unidades distintas (Windows)
+        return False
+
+def _recorrer(ruta, inventario=None):
+    for root, _, files in recorrer(ruta, inventario):
+        if os.path.basename(root) in IGNORAR: continue
+        for f in files:
+            yield os.path.join(root, f)
+
+def indexar_referencia(ruta, log_func, update_callback=None, cancel_event=None, ruta_indice=None, algoritmo=ALGORITMO_POR_DEFECTO, hilos=None):
+    """
+    Crea o actualiza el índice de hashes de una biblioteca de referencia.
+    Es incremental: solo se leen los archivos nuevos o modificados y se olvidan los borrados.
+    """
+    if algoritmo not in ALGORITMOS_HASH:
+        return {'error': f'Algoritmo de hash desconocido: {algoritmo}'}
+    ruta_indice = ruta_indice or obtener_ruta_indice(ruta)
+    conexion = _abrir_indice(ruta_indice)
+    try:
+        # Un índice de otro algoritmo no sirve: se rehace completo
+        if _leer_meta(conexion, 'algoritmo') not in (None, algoritmo):
+            conexion.execute("DELETE FROM archivos")
+        conexion.execute("INSERT OR REPLACE INTO meta VALUES ('algoritmo', ?)", (algoritmo,))
+        conexion.execute("INSERT OR REPLACE INTO meta VALUES ('raiz', ?)", (os.path.abspath(ruta),))
+        
+        guardados = {r: (t, m) for r, t, m in conexion.execute("SELECT ruta, tamano, mtime_ns FROM archivos")}
+        vistos = set()
+        pendientes = []
+        for full_path in _recorrer(ruta):
+            if cancel_event and cancel_event.is_set():
+                return {}
+            try:
+                st = os.stat(full_path)
+            except OSError:
+                continue
+            relativa = os.path.relpath(full_path, ruta)
+            vistos.add(relativa)
+            if st.st_size > 0 and guardados.get(relativa) != (st.st_size, st.st_mtime_ns):
+                pendientes.append((full_path, relativa, st))
+                
+        borrados = [(r,) for r in guardados if r not in vistos]
+        conexion.executemany("DELETE FROM archivos WHERE ruta = ?", borrados)
+        
+        def hashear(item):
+            full_path, _, st = item
+            parcial = calcular_hash_parcial(full_path, st, log_func, algoritmo=algoritmo)
+            if parcial is None: return None
+            if st.st_size <= 2 * TAMANO_BLOQUE_PARCIAL:
+                return parcial, parcial
+            completo = calcular_hash_archivo(full_path, log_func, st=st, cancel_event=cancel_event, algoritmo=algoritmo)
+            return (parcial, completo) if completo else None
+            
+        total = len(pendientes)
+        for i, ((full_path, relativa, st), hashes) in enumerate(calcular_en_paralelo(pendientes, hashear, hilos, cancel_event), 1):
+            if cancel_event and cancel_event.is_set():
+                return {}
+            if hashes:
+                conexion.execute(
+                    "INSERT OR REPLACE INTO archivos VALUES (?, ?, ?, ?, ?)",
+                    (relativa, st.st_size, st.st_mtime_ns, _a_binario(hashes[0]), _a_binario(hashes[1]))
+                )
+            if i % 500 == 0: conexion.commit()
+            if update_callback: update_callback(i, total, os.path.basename(full_path))
+            
+        conexion.commit()
+        total_indice = conexion.execute("SELECT COUNT(*) FROM archivos").fetchone()[0]
+    finally:
+        conexion.close()
+        
+    if update_callback and not (cancel_event and cancel_event.is_set()):
+        update_callback(1, 1, "")
+    return {'archivos_indexados': total, 'archivos_olvidados': len(borrados), 'total_en_indice': total_indice}
+
+def deduplicar_contra_referencia(ruta, log_func, ruta_referencia=None, update_callback=None, cancel_event=None, ruta_indice=None, hilos=None,
+                                 inventario=None):
+    """
+    Mueve a 'basura' los archivos de 'ruta' que ya existen en la biblioteca de referencia.
+    Solo se leen los archivos entrantes y solo hasta donde haga falta:
+    tamaño -> hash parcial -> hash completo, consultando el índice en cada paso.
+    Un archivo solo se descarta si su copia en la referencia sigue ahí sin cambios (mismo
+    tamaño y mtime que al indexar). 'ruta' no puede solaparse con la biblioteca.
+    Si recibe un 'inventario' compartido lo usa para recorrer y lo mantiene actualizado.
+    Con un inventario en simulación (dry-run) solo se registran las acciones.
+    """
+    ruta_indice = ruta_indice or (ruta_referencia and obtener_ruta_indice(ruta_referencia))
+    if not ruta_indice or not os.path.exists(ruta_indice):
+        return {'error': 'No existe índice de la biblioteca de referencia. Indéxala primero.'}
+        
+    conexion = _abrir_indice(ruta_indice)
+    try:
+        algoritmo = _leer_meta(conexion, 'algoritmo') or ALGORITMO_POR_DEFECTO
+        raiz = _leer_meta(conexion, 'raiz') or ruta_referencia
+        if not raiz:
+            return {'error': 'El índice no indica su biblioteca de referencia. Vuelve a indexarla.'}
+        # Dentro de la propia biblioteca cada archivo coincidiría consigo mismo en el índice
+        if _solapan(ruta, raiz):
+            return {'error': f'La carpeta y la biblioteca de referencia ({raiz}) no pueden contenerse una a otra.'}
+        tamanos_referencia = {t for (t,) in conexion.execute("SELECT DISTINCT tamano FROM archivos")}
+        
+        # 1. Tamaño: solo los que coinciden con algún archivo de la referencia
+        entrantes = []
+        for full_path in _recorrer(ruta, inventario):
+            if cancel_event and cancel_event.is_set():
+                return {}
+            try:
+                st = inventario.stat(full_path) if inventario else os.stat(full_path)
+            except OSError:
+                continue
+            if st.st_size > 0 and st.st_size in tamanos_referencia:
+                entrantes.append((full_path, st))
+        
+        # 2. Hash parcial
+        candidatos = []
+        total = len(entrantes)
+        hasheados = 0
+        for i, ((full_path, st), parcial) in enumerate(calcular_en_paralelo(
+                entrantes, lambda e: calcular_hash_parcial(e[0], e[1], log_func, algoritmo=algoritmo), hilos, cancel_event), 1):
+            if cancel_event and cancel_event.is_set():
+                return {}
+            hasheados += 1
+            if parcial and conexion.execute(
+                    "SELECT 1 FROM archivos WHERE tamano = ? AND parcial = ? LIMIT 1",
+                    (st.st_size, _a_binario(parcial))).fetchone():
+                candidatos.append((full_path, st, parcial))
+            if update_callback: update_callback(i, total, f"Fase 2/3: {os.path.basename(full_path)}")
+            
+        # 3. Hash completo (los archivos pequeños ya se leyeron enteros en la fase 2)
+        def hash_completo(c):
+            full_path, st, parcial = c
+            if st.st_size <= 2 * TAMANO_BLOQUE_PARCIAL:
+                return parcial
+            return calcular_hash_archivo(full_path, log_func, st=st, cancel_event=cancel_event, algoritmo=algoritmo)
+            
+        def sigue_en_referencia(full_path, relativa, tamano, mtime_ns):
+            """La copia indexada existe sin cambios y no es el propio archivo entrante."""
+            ruta_ref = os.path.join(raiz, relativa)
+            try:
+                st_ref = os.stat(ruta_ref)
+                if os.path.samefile(ruta_ref, full_path): return False
+            except OSError:
+                return False
+            return (st_ref.st_size, st_ref.st_mtime_ns) == (tamano, mtime_ns)
+            
+        repetidos = []
+        total = len(candidatos)
+        for i, ((full_path, st, parcial), completo) in enumerate(calcular_en_paralelo(candidatos, hash_completo, hilos, cancel_event), 1):
+            if cancel_event and cancel_event.is_set():
+                return {}
+            if completo:
+                filas = conexion.execute("SELECT ruta, tamano, mtime_ns FROM archivos WHERE tamano = ? AND completo = ?",
+                                         (st.st_size, _a_binario(completo))).fetchall()
+                copia = next((fila[0] for fila in filas if sigue_en_referencia(full_path, *fila)), None)
+                if copia is not None:
+                    repetidos.append((full_path, os.path.join(raiz, copia)))
+            if update_callback: update_callback(i, total, f"Fase 3/3: {os.path.basename(full_path)}")
+    finally:
+        conexion.close()
+        
+    movidos = 0
+    if repetidos:
+        basura = os.path.join(ruta, "basura")
+        crear_directorio(basura, inventario)
+        asignador = AsignadorNombres(inventario)
+        if update_callback:
+            update_callback(0, 1, f"Duplicados encontrados: {len(repetidos)}. Moviendo a 'basura'...")
+            
+        for i, (d, copia) in enumerate(repetidos, 1):
+            if cancel_event and cancel_event.is_set():
+                return {}
+            nombre = os.path.basename(d)
+            if simulando(inventario):
+                inventario.plan.registrar('descartar', origen=d, original=copia)
+            try:
+                dest = asignador.reservar(basura, nombre)
+                mover_archivo(d, dest, inventario)
+                asignador.liberar(d)
+                movidos += 1
+            except Exception as e:
+                log_func(f"Fallo moviendo duplicado {d}: {e}", nivel="error")
+            if update_callback: update_callback(i, len(repetidos), nombre)
+            
+    if update_callback and not (cancel_event and cancel_event.is_set()):
+        update_callback(1, 1, "")
+    return {'duplicados_en_referencia': movidos, 'archivos_hasheados': hasheados, 'algoritmo': algoritmo}
@@ -0,0 +1,182 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from funciones.duplicados import (
+    encontrar_archivos, calcular_hash_archivo, calcular_en_paralelo, crear_hasher,
+    HILOS_HASH, ALGORITMOS_HASH, ALGORITMO_POR_DEFECTO, TAMANO_BUFFER_HASH
+)
+from funciones.conversiones import iterar_archivos_a_convertir, convertir_imagen_pillow, EXT_IMAGEN_A_PNG
+from funciones.dependencias import verificar_ffmpeg
+from funciones.trabajos import PoolComandos, PoolFunciones
+from funciones.preprocesador import optimizar_imagen, LADO_MAXIMO
+
+def _log_consola(mensaje, nivel="error", exc_info=False):
+    if nivel in ("error", "critical"):
+        print(f"[{nivel}] {mensaje}")
+
+def _hash_secuencial_original(ruta_archivo):
+    """Réplica del cálculo anterior: MD5 en un solo hilo con lecturas de 4 KB."""
+    hasher = hashlib.md5()
+    with open(ruta_archivo, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(4096), b""):
+            hasher.update(bloque)
+    return hasher.hexdigest()
+
+def _medir(nombre, archivos, total_bytes, calcular):
+    inicio = time.perf_counter()
+    calcular(archivos)
+    segundos = max(time.perf_counter() - inicio, 1e-9)
+    mb_s = total_bytes / (1024**2) / segundos
+    print(f"{nombre:<40} {segundos:8.2f} s {mb_s:10.1f} MB/s")
+    return mb_s
+
+def medir_hash(ruta, hilos=None, algoritmo=ALGORITMO_POR_DEFECTO):
+    """
+    Compara el MB/s del hash secuencial original contra el pool de hilos con buffers grandes.
+    Nota: la primera pasada calienta la caché del sistema operativo; para medir el disco
+    real conviene vaciarla entre ejecuciones o usar una carpeta más grande que la RAM.
+    """
+    archivos, _ = encontrar_archivos(ruta)
+    archivos = [p for p in archivos if os.path.isfile(p)]
+    total_bytes = sum(os.path.getsize(p) for p in archivos)
+    hilos = hilos or HILOS_HASH
+    print(f"{len(archivos)} archivos, {total_bytes / (1024**2):.1f} MB")
+    
+    resultados = {}
+    resultados['secuencial'] = _medir(
+        "Secuencial md5 (4 KB, 1 hilo)", archivos, total_bytes,
+        lambda lista: [_hash_secuencial_original(p) for p in lista]
+    )
+    resultados['paralelo'] = _medir(
+        f"Pool {algoritmo} ({hilos} hilos, 1 MB/mmap)", archivos, total_bytes,
+        lambda lista: list(calcular_en_paralelo(lista, lambda p: calcular_hash_archivo(p, _log_consola, algoritmo=algoritmo), hilos))
+    )
+    return resultados
+
+def medir_algoritmos_hash(megabytes=256):
+    """Micro-benchmark en memoria: MB/s de cada algoritmo del registro en esta máquina."""
+    bloque = os.urandom(TAMANO_BUFFER_HASH)
+    repeticiones = max(1, megabytes * 1024**2 // len(bloque))
+    resultados = {}
+    
+    for algoritmo in ALGORITMOS_HASH:
+        hasher = crear_hasher(algoritmo)
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            hasher.update(bloque)
+        hasher.digest()
+        segundos = max(time.perf_counter() - inicio, 1e-9)
+        resultados[algoritmo] = repeticiones * len(bloque) / (1024**2) / segundos
+        print(f"{algoritmo:<10} {resultados[algoritmo]:10.1f} MB/s")
+    return resultados
+
+def _medir_imagenes(nombre, imagenes, convertir):
+    inicio = time.perf_counter()
+    errores = convertir()
+    segundos = max(time.perf_counter() - inicio, 1e-9)
+    print(f"{nombre:<40} {segundos:8.2f} s {len(imagenes) / segundos:10.1f} img/s  ({errores} errores)")
+    return len(imagenes) / segundos
+
+def medir_conversion_imagenes(ruta, procesos=None, limite=None):
+    """
+    Compara imágenes/s al pasar WebP a PNG con un FFmpeg por imagen (como antes) frente al
+    pool de procesos con Pillow. Las salidas van a una carpeta temporal que se borra al final.
+    """
+    imagenes = [p for p in iterar_archivos_a_convertir(ruta, _log_consola)
+                if os.path.splitext(p)[1].lower() in EXT_IMAGEN_A_PNG][:limite]
+    if not imagenes:
+        print("No hay imágenes WebP en la ruta.")
+        return {}
+    print(f"{len(imagenes)} imágenes")
+
+    def convertir_con(pool, lanzar, carpeta):
+        errores = 0
+        for i, origen in enumerate(imagenes):
+            lanzar(origen, os.path.join(carpeta, f"{i}.png"))
+            errores += sum(1 for _, error in pool.terminados() if error)
+        errores += sum(1 for _, error in pool.terminados(esperar=True) if error)
+        pool.cerrar()
+        return errores
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as carpeta:
+        if verificar_ffmpeg(_log_consola):
+            pool = PoolComandos()
+            resultados['ffmpeg'] = _medir_imagenes(
+                f"FFmpeg, un proceso por imagen ({pool.procesos} a la vez)", imagenes,
+                lambda: convertir_con(pool, lambda o, d: pool.enviar(['ffmpeg', '-i', o, d, '-y', '-loglevel', 'error']), carpeta)
+            )
+        else:
+            print("FFmpeg no encontrado: se mide solo Pillow.")
+        pool_imagenes = PoolFunciones(procesos)
+        resultados['pillow'] = _medir_imagenes(
+            f"Pillow en pool ({pool_imagenes.procesos} procesos)", imagenes,
+            lambda: convertir_con(pool_imagenes, lambda o, d: pool_imagenes.enviar(convertir_imagen_pillow, o, d), carpeta)
+        )
+    return resultados
+
+def _pico_memoria_mb():
+    """Pico de memoria residente (MB) de este proceso, o None si el sistema no lo informa."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return pico / (1024**2 if os.uname().sysname == 'Darwin' else 1024)
+
+def _optimizar_copias(imagenes, carpeta, reducir_al_decodificar):
+    """Se ejecuta en un proceso nuevo: optimiza una copia de cada imagen y mide tiempo y pico de memoria."""
+    segundos = 0.0
+    errores = 0
+    for i, origen in enumerate(imagenes):
+        copia = os.path.join(carpeta, f"{i}{os.path.splitext(origen)[1]}")
+        shutil.copyfile(origen, copia)
+        inicio = time.perf_counter()
+        try:
+            # Sin optimizar (no cabía en memoria) cuenta igual que un fallo
+            if not optimizar_imagen(copia, reducir_al_decodificar): errores += 1
+        except Exception:
+            errores += 1
+        segundos += time.perf_counter() - inicio
+        os.remove(copia)
+    return segundos, _pico_memoria_mb(), errores
+
+def medir_optimizacion_imagenes(ruta, limite=None):
+    """
+    Compara la optimización de Pre-procesar en los JPEG de más de LADO_MAXIMO px decodificando a
+    resolución completa (como antes) frente a la decodificación reducida. Cada variante corre en un
+    proceso nuevo para que el pico de memoria sea solo suyo; se trabaja sobre copias temporales.
+    """
+    from PIL import Image
+    imagenes = []
+    for root, _, files in os.walk(ruta):
+        for f in files:
+            if os.path.splitext(f)[1].lower() not in ('.jpg', '.jpeg'):
+                continue
+            try:
+                with Image.open(os.path.join(root, f)) as img:
+                    if max(img.size) > LADO_MAXIMO: imagenes.append(os.path.join(root, f))
+            except Exception:
+                pass
+    imagenes = imagenes[:limite]
+    if not imagenes:
+        print(f"No hay JPEG de más de {LADO_MAXIMO} px en la ruta.")
+        return {}
+    print(f"{len(imagenes)} imágenes")
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as carpeta:
+        for clave, nombre, reducir in (('completa', "Decodificación completa", False),
+                                       ('reducida', "Decodificación reducida (draft)", True)):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                segundos, pico, errores = pool.submit(_optimizar_copias, imagenes, carpeta, reducir).result()
+            segundos = max(segundos, 1e-9)
+            memoria = f"{pico:8.0f} MB pico" if pico is not None else "     pico n/d"
+            print(f"{nombre:<40} {segundos / len(imagenes) * 1000:8.0f} ms/img {memoria}  ({errores} errores)")
+            resultados[clave] = {'ms_por_imagen': segundos / len(imagenes) * 1000, 'pico_mb': pico}
+    return resultados
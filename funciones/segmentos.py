@@ -0,0 +1,144 @@
+import os
+import re
+from urllib.parse import urlsplit, unquote
+
+EXT_SEGMENTOS = {'.ts', '.m4s'}
+# Segmentos de inicialización (fMP4/DASH): cabecera 'moov' que va delante de los fragmentos
+EXT_INIT = {'.m4s', '.mp4'}
+_NUMERO_FINAL = re.compile(r'^(.*?)(\d+)$')
+_PALABRAS_SEGMENTO = re.compile(r'init|chunk|segment|seg|fragment|frag|media|part')
+
+def leer_playlist_m3u8(ruta):
+    """
+    Lee una playlist HLS y retorna (nombres de los segmentos en orden, nombre del init o None).
+    Solo se usa el último componente de cada URI: los segmentos ya están descargados junto a ella.
+    """
+    segmentos = []
+    init = None
+    try:
+        with open(ruta, 'r', encoding='utf-8', errors='replace') as f:
+            for linea in f:
+                linea = linea.strip()
+                if linea.startswith('#EXT-X-MAP:'):
+                    uri = re.search(r'URI="([^"]+)"', linea)
+                    if uri: init = _nombre_de_uri(uri.group(1))
+                elif linea and not linea.startswith('#'):
+                    segmentos.append(_nombre_de_uri(linea))
+    except OSError:
+        return [], None
+    return segmentos, init
+
+def _nombre_de_uri(uri):
+    return os.path.basename(unquote(urlsplit(uri).path))
+
+def _id_flujo(texto):
+    """Identificador de flujo sin las palabras típicas de los segmentos ('init-stream0' -> 'stream0')."""
+    return re.sub(r'[^0-9a-z]', '', _PALABRAS_SEGMENTO.sub('', texto.lower()))
+
+def agrupar_segmentos(carpeta, segmentos, nombres):
+    """
+    Agrupa por flujo los segmentos .ts/.m4s de una carpeta ('segmentos': rutas; 'nombres': todo
+    lo que hay en la carpeta). Primero por playlists .m3u8 y, si no las hay, por el patrón del
+    nombre (prefijo + número). Retorna (flujos, sueltos): cada flujo es un dict con 'nombre',
+    'segmentos' (en orden), 'init', 'extras' (playlist) y 'formato'; 'sueltos' no forman flujo.
+    """
+    por_nombre = {os.path.basename(s): s for s in segmentos}
+    usados = set()
+    flujos = []
+
+    # 1. Playlists HLS
+    for nombre in sorted(nombres):
+        if os.path.splitext(nombre)[1].lower() != '.m3u8': continue
+        lista, init = leer_playlist_m3u8(os.path.join(carpeta, nombre))
+        orden = [por_nombre[n] for n in lista if n in por_nombre and n not in usados]
+        if len(orden) < 2: continue
+        usados.update(os.path.basename(s) for s in orden)
+        ruta_init = os.path.join(carpeta, init) if init and init in nombres else None
+        if ruta_init: usados.add(init)
+        flujos.append({'nombre': os.path.splitext(nombre)[0], 'segmentos': orden, 'init': ruta_init,
+                       'extras': [os.path.join(carpeta, nombre)]})
+
+    # 2. Patrón de nombre: mismo prefijo y extensión, número al final
+    inits = {}
+    grupos = {}
+    for nombre, ruta in por_nombre.items():
+        if nombre in usados: continue
+        base, ext = os.path.splitext(nombre)
+        if 'init' in base.lower() and ext.lower() in EXT_INIT:
+            inits[nombre] = ruta
+            continue
+        coincide = _NUMERO_FINAL.match(base)
+        if coincide:
+            grupos.setdefault((coincide.group(1), ext.lower()), []).append((int(coincide.group(2)), ruta))
+    # Los init con extensión .mp4 no son candidatos a convertir, pero también cuentan
+    for nombre in nombres:
+        base, ext = os.path.splitext(nombre)
+        if ext.lower() == '.mp4' and 'init' in base.lower() and nombre not in usados:
+            inits.setdefault(nombre, os.path.join(carpeta, nombre))
+
+    nuevos = []
+    for (prefijo, ext), miembros in sorted(grupos.items()):
+        if len(miembros) < 2: continue
+        miembros.sort()
+        nombre = prefijo.rstrip(' -_.') or os.path.basename(carpeta) or 'video'
+        nuevos.append({'nombre': nombre, 'segmentos': [r for _, r in miembros], 'init': None, 'extras': [],
+                       '_id': _id_flujo(prefijo), '_ext': ext})
+        usados.update(os.path.basename(r) for _, r in miembros)
+
+    # Cada init va con el flujo fMP4 del mismo identificador (o con el único que haya)
+    fmp4 = [f for f in nuevos if f['_ext'] == '.m4s']
+    for nombre, ruta in sorted(inits.items()):
+        base = os.path.splitext(nombre)[0]
+        candidatos = [f for f in fmp4 if f['init'] is None and f['_id'] == _id_flujo(base)]
+        if not candidatos and len(fmp4) == 1 and fmp4[0]['init'] is None:
+            candidatos = fmp4
+        if candidatos:
+            candidatos[0]['init'] = ruta
+            usados.add(nombre)
+    for f in nuevos:
+        del f['_id'], f['_ext']
+    flujos.extend(nuevos)
+
+    for f in flujos:
+        fmp4 = f['init'] is not None or any(s.lower().endswith('.m4s') for s in f['segmentos'])
+        f['formato'] = 'm4s' if fmp4 else 'ts'
+    sueltos = [s for s in segmentos if os.path.basename(s) not in usados]
+    return flujos, sueltos
+
+def temporal_union(destino, formato):
+    """Archivo auxiliar de la unión: lista para el concat demuxer (TS) o fragmentos ya unidos (fMP4)."""
+    directorio, nombre = os.path.split(destino)
+    return os.path.join(directorio, f".{nombre}.orgest_union" + ('.txt' if formato == 'ts' else '.m4s'))
+
+def preparar_union(origenes, destino, formato):
+    """
+    Retorna (comando FFmpeg, función que prepara el auxiliar) para unir los segmentos en 'destino'.
+    TS: concat demuxer con una lista de archivos y '-c copy'.
+    fMP4 (.m4s): los fragmentos no se pueden abrir sueltos, así que se concatenan en binario
+    (init + fragmentos, que es un MP4 fragmentado válido) y ese archivo se remuxea una vez.
+    """
+    temporal = temporal_union(destino, formato)
+    if formato == 'ts':
+        cmd = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', temporal, '-c', 'copy', destino, '-y', '-loglevel', 'error']
+        def preparar():
+            with open(temporal, 'w', encoding='utf-8') as f:
+                for ruta in origenes:
+                    ruta = os.path.abspath(ruta).replace("'", "'\\''")
+                    f.write(f"file '{ruta}'\n")
+    else:
+        cmd = ['ffmpeg', '-i', temporal, '-c', 'copy', destino, '-y', '-loglevel', 'error']
+        def preparar():
+            with open(temporal, 'wb') as salida:
+                for ruta in origenes:
+                    with open(ruta, 'rb') as entrada:
+                        while True:
+                            bloque = entrada.read(8 * 1024 * 1024)
+                            if not bloque: break
+                            salida.write(bloque)
+    return cmd, preparar
+
+def limpiar_union(destino, formato):
+    temporal = temporal_union(destino, formato)
+    if os.path.exists(temporal):
+        try: os.remove(temporal)
+        except OSError: pass
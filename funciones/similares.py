@@ -0,0 +1,191 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from funciones.preprocesador import EXT_IMAGENES
+from funciones.inventario import recorrer, mover_archivo, crear_directorio, simulando
+from funciones.nombres import AsignadorNombres
+
+# Lado del hash perceptual (dHash de 8x8 = 64 bits)
+TAMANO_DHASH = 8
+# Distancia de Hamming máxima para considerar dos imágenes "la misma foto"
+UMBRAL_SIMILITUD = 6
+PROCESOS_IMAGEN = os.cpu_count() or 1
+
+def calcular_dhash(ruta_archivo):
+    """
+    Calcula el dHash de una imagen. Se ejecuta en procesos aparte, por eso no recibe log_func:
+    retorna (hash, ancho, alto, error) y el proceso principal registra los fallos.
+    """
+    try:
+        from PIL import Image
+        with Image.open(ruta_archivo) as img:
+            ancho, alto = img.size
+            # Decodificación reducida (JPEG a 1/2, 1/4 o 1/8): no hace falta la resolución completa
+            img.draft('L', (TAMANO_DHASH * 8, TAMANO_DHASH * 8))
+            pequena = img.convert('L').resize((TAMANO_DHASH + 1, TAMANO_DHASH), Image.BILINEAR)
+            pixeles = list(pequena.getdata())
+            
+        valor = 0
+        for fila in range(TAMANO_DHASH):
+            inicio = fila * (TAMANO_DHASH + 1)
+            for col in range(TAMANO_DHASH):
+                valor = (valor << 1) | (pixeles[inicio + col] > pixeles[inicio + col + 1])
+        return valor, ancho, alto, None
+    except Exception as e:
+        return None, 0, 0, str(e)
+
+class ArbolBK:
+    """
+    Árbol BK sobre la distancia de Hamming. Permite buscar todos los hashes a distancia
+    <= umbral sin comparar contra cada elemento (poda por desigualdad triangular).
+    """
+    def __init__(self):
+        self.raiz = None
+
+    def insertar(self, valor, elemento):
+        nodo_nuevo = (valor, elemento, {})
+        if self.raiz is None:
+            self.raiz = nodo_nuevo
+            return
+        nodo = self.raiz
+        while True:
+            distancia = (valor ^ nodo[0]).bit_count()
+            hijo = nodo[2].get(distancia)
+            if hijo is None:
+                nodo[2][distancia] = nodo_nuevo
+                return
+            nodo = hijo
+
+    def buscar(self, valor, umbral):
+        """Retorna los elementos cuyo hash está a distancia <= umbral."""
+        encontrados = []
+        pendientes = [self.raiz] if self.raiz else []
+        while pendientes:
+            nodo = pendientes.pop()
+            distancia = (valor ^ nodo[0]).bit_count()
+            if distancia <= umbral:
+                encontrados.append(nodo[1])
+            for d, hijo in nodo[2].items():
+                if distancia - umbral <= d <= distancia + umbral:
+                    pendientes.append(hijo)
+        return encontrados
+
+def encontrar_imagenes(ruta, inventario=None):
+    """Encuentra recursivamente las imágenes a comparar, ignorando carpetas del programa."""
+    imagenes = []
+    ignorar = ["funciones", "logs", "basura", "sin_edit", "fallos"]
+    for root, _, files in recorrer(ruta, inventario):
+        if os.path.basename(root) in ignorar: continue
+        for f in files:
+            if os.path.splitext(f)[1].lower() in EXT_IMAGENES:
+                imagenes.append(os.path.join(root, f))
+    return imagenes
+
+def agrupar_imagenes_similares(ruta, log_func, umbral=UMBRAL_SIMILITUD, update_callback=None, cancel_event=None, procesos=None,
+                               inventario=None):
+    """
+    Agrupa imágenes casi idénticas (redimensionadas, recomprimidas...) por dHash.
+    Decodifica en paralelo con un pool de procesos y busca vecinos en un árbol BK.
+    Cada grupo empieza por la mejor copia (más píxeles, luego más bytes) y todos sus
+    miembros están a distancia <= umbral de ella.
+    Con 'inventario' se recorre y se consultan los tamaños en memoria.
+    Retorna None si se cancela.
+    """
+    imagenes = encontrar_imagenes(ruta, inventario)
+    total = len(imagenes)
+    info = {}
+    
+    pool = ProcessPoolExecutor(max_workers=procesos or PROCESOS_IMAGEN)
+    try:
+        resultados = pool.map(calcular_dhash, imagenes, chunksize=16)
+        for i, (full_path, (valor, ancho, alto, error)) in enumerate(zip(imagenes, resultados), 1):
+            if cancel_event and cancel_event.is_set():
+                return None
+            if error:
+                log_func(f"No se pudo leer la imagen {full_path}: {error}", nivel="warning")
+            else:
+                info[full_path] = (valor, ancho * alto)
+            if update_callback:
+                update_callback(i, total, os.path.basename(full_path))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        
+    def calidad(p):
+        try: tamano = (inventario.stat(p) if inventario else os.stat(p)).st_size
+        except OSError: tamano = 0
+        return (info[p][1], tamano)
+        
+    arbol = ArbolBK()
+    for full_path, (valor, _) in info.items():
+        arbol.insertar(valor, full_path)
+        
+    # De la mejor copia a la peor: cada imagen aún libre encabeza un grupo con las libres a
+    # distancia <= umbral de ella. Sin encadenar (A~B, B~C no junta A con C si están lejos):
+    # todo lo que se descarta se parece a la copia que se conserva.
+    calidades = {p: calidad(p) for p in info}
+    asignadas = set()
+    grupos = []
+    for full_path in sorted(info, key=calidades.get, reverse=True):
+        if full_path in asignadas: continue
+        asignadas.add(full_path)
+        miembros = [v for v in arbol.buscar(info[full_path][0], umbral) if v not in asignadas]
+        if miembros:
+            asignadas.update(miembros)
+            grupos.append([full_path] + sorted(miembros, key=calidades.get, reverse=True))
+    return grupos
+
+def eliminar_imagenes_similares(ruta, log_func, modo_automatico=False, update_callback=None, cancel_event=None, umbral=UMBRAL_SIMILITUD, procesos=None,
+                                inventario=None):
+    """
+    Conserva la mejor copia de cada grupo de imágenes casi idénticas
+    y mueve las demás a 'basura', renombrando si hay colisiones.
+    Si recibe un 'inventario' compartido lo usa para recorrer y lo mantiene actualizado.
+    Con un inventario en simulación (dry-run) solo se registran las acciones.
+    """
+    try:
+        import PIL
+    except ImportError:
+        return {'error': 'Pillow no instalado. No se pueden comparar imágenes.'}
+        
+    grupos = agrupar_imagenes_similares(ruta, log_func, umbral, update_callback, cancel_event, procesos, inventario)
+    if grupos is None or (cancel_event and cancel_event.is_set()):
+        return {}
+        
+    similares = [p for g in grupos for p in g[1:]]
+    movidos = 0
+    
+    if similares:
+        for g in grupos:
+            log_func(f"Imágenes similares: se conserva {g[0]}, se descartan {len(g) - 1}.", nivel="debug")
+            if simulando(inventario):
+                inventario.plan.registrar('conservar', origen=g[0])
+                for p in g[1:]:
+                    inventario.plan.registrar('descartar', origen=p, original=g[0])
+            
+        basura = os.path.join(ruta, "basura")
+        crear_directorio(basura, inventario)
+        asignador = AsignadorNombres(inventario)
+        
+        if update_callback:
+            update_callback(0, 1, f"Similares encontrados: {len(grupos)} grupos. Moviendo a 'basura'...")
+            
+        total = len(similares)
+        for i, s in enumerate(similares, 1):
+            if cancel_event and cancel_event.is_set():
+                return {}
+                
+            nombre = os.path.basename(s)
+            try:
+                dest = asignador.reservar(basura, nombre)
+                mover_archivo(s, dest, inventario)
+                asignador.liberar(s)
+                movidos += 1
+            except Exception as e:
+                log_func(f"Fallo moviendo imagen similar {s}: {e}", nivel="error")
+                
+            if update_callback:
+                update_callback(i, total, nombre)
+                
+    if update_callback and not (cancel_event and cancel_event.is_set()):
+        update_callback(1, 1, "")
+        
+    return {'grupos_similares': len(grupos), 'imagenes_similares_movidas': movidos}
@@ -0,0 +1,441 @@
+import os
+import json
+import errno
+import queue
+import shutil
+import threading
+from funciones.flujo import TAMANO_COLA
+from funciones.inventario import Inventario, _clave
+from funciones.planificador import PlanMovimientos
+from funciones.enlaces import reemplazar_por_enlace
+from funciones.duplicados import calcular_hash_archivo, ALGORITMO_POR_DEFECTO
+from funciones.copiado import CopiadorArchivos, enlazar_backup
+from funciones.trabajos import PoolComandos, PoolFunciones
+from funciones.conversiones import convertir_imagen_pillow
+from funciones.segmentos import preparar_union, limpiar_union
+from funciones.preprocesador import optimizar_imagen, procesar_video_ffmpeg
+from funciones.espacio import ControlEspacio
+from funciones.manifiesto import abrir_manifiesto
+
+# Acciones que puede contener un plan:
+#   crear_directorio {destino}          mover {origen, destino}
+#   backup {origen, destino}            convertir {origen, destino, comando[, motor='pillow']}
+#   optimizar {origen, tipo[, destino, modo]} enlazar {origen, destino, tamano, mtime_ns_origen, mtime_ns_destino, hash}
+#   conservar {origen}                  descartar {origen, original}
+#   borrar_directorio {origen}          borrar_arbol {origen}
+#   unir {origenes, destino, formato, comando}  (segmentos de un flujo -> un MP4)
+#   resultado {resultado}  (última línea: lo que habría devuelto la herramienta)
+# convertir, unir y optimizar llevan además 'espacio': bytes que se estimó que necesitan (ver espacio.py)
+ACCIONES_INFORMATIVAS = {'conservar', 'descartar', 'resultado'}
+
+_FIN = object()
+
+class PlanSimulado:
+    """
+    Plan de un dry-run: se asigna a 'inventario.plan' y los pasos, en lugar de tocar el disco,
+    registran cada acción y actualizan solo el inventario. Las colisiones de nombres se
+    resuelven con el inventario en memoria, sin sondear el sistema de archivos.
+    """
+    simulado = True
+
+    def __init__(self, destino):
+        # 'destino' recibe cada acción (dict) en el orden en que se ejecutaría
+        self.destino = destino
+        self.acciones = 0
+
+    def registrar(self, accion, **datos):
+        self.acciones += 1
+        self.destino({'accion': accion, **datos})
+
+    def mover(self, origen, destino):
+        self.registrar('mover', origen=origen, destino=destino)
+
+    def eliminar_directorio(self, carpeta):
+        self.registrar('borrar_directorio', origen=carpeta)
+
+    def materializar(self, ruta):
+        return ruta
+
+    def aplicar(self, log_func=None):
+        return 0
+
+def simular(func, ruta, *args, **kwargs):
+    """
+    Ejecuta una herramienta en modo dry-run y genera sus acciones a medida que se deciden.
+    La herramienta corre en un hilo sobre un inventario en memoria; la cola acotada hace que
+    la memoria no crezca con el número de archivos. La última acción es 'resultado'.
+    Si el consumidor deja de iterar, la herramienta se cancela.
+    """
+    cola = queue.Queue(maxsize=TAMANO_COLA)
+    detener = threading.Event()
+    cancel_event = kwargs.get('cancel_event') or threading.Event()
+    kwargs['cancel_event'] = cancel_event
+    error = []
+
+    def poner(elemento):
+        while not detener.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def producir():
+        try:
+            inventario = Inventario(ruta)
+            inventario.plan = PlanSimulado(poner)
+            res = func(ruta, *args, inventario=inventario, **kwargs)
+            poner({'accion': 'resultado', 'resultado': res})
+        except Exception as e:
+            error.append(e)
+        poner(_FIN)
+
+    threading.Thread(target=producir, daemon=True).start()
+    completo = False
+    try:
+        while True:
+            accion = cola.get()
+            if accion is _FIN:
+                completo = True
+                if error: raise error[0]
+                return
+            yield accion
+    finally:
+        detener.set()
+        if not completo: cancel_event.set()
+
+def guardar_plan(acciones, ruta_plan):
+    """Escribe las acciones en JSONL (una por línea) a medida que llegan. Retorna cuántas se escribieron."""
+    total = 0
+    with open(ruta_plan, 'w', encoding='utf-8') as f:
+        for accion in acciones:
+            f.write(json.dumps(accion, ensure_ascii=False) + "\n")
+            total += 1
+    return total
+
+def leer_plan(ruta_plan):
+    """Genera las acciones de un plan JSONL sin cargarlo entero en memoria."""
+    with open(ruta_plan, 'r', encoding='utf-8') as f:
+        for linea in f:
+            if linea.strip():
+                yield json.loads(linea)
+
+def _backup_necesario(origen, destino, reanudando=False):
+    """Comprueba el destino de un backup. Retorna False si ya estaba hecho (al reanudar)."""
+    if os.path.lexists(destino):
+        # Al reanudar, una copia completa ya hecha no se repite
+        if reanudando and os.path.getsize(destino) == os.path.getsize(origen): return False
+        if not reanudando: raise FileExistsError(f"El destino ya existe: {destino}")
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    return True
+
+def _rutas(accion):
+    """Rutas que lee o escribe una acción."""
+    return [r for r in accion.get('origenes', []) + [accion.get('origen'), accion.get('destino')] if r]
+
+def _mismo_contenido(ruta, tamano, mtime_ns, digest, log_func):
+    """True si el archivo sigue teniendo el contenido que se vio al planificar (re-hash si cambió su mtime)."""
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return False
+    if st.st_size != tamano:
+        return False
+    if st.st_mtime_ns == mtime_ns:
+        return True
+    algoritmo = digest.split(':', 1)[0] if digest else ALGORITMO_POR_DEFECTO
+    return calcular_hash_archivo(ruta, log_func, st=st, algoritmo=algoritmo) == digest
+
+def _enlace_vigente(accion, log_func):
+    """
+    Comprueba antes de enlazar que duplicado y original no cambiaron desde que se planificó:
+    si no, enlazar borraría los datos nuevos. Los planes sin huella se comparan por hash completo.
+    """
+    origen, destino = accion['origen'], accion['destino']
+    if 'hash' not in accion:
+        digest = calcular_hash_archivo(destino, log_func)
+        return digest is not None and calcular_hash_archivo(origen, log_func, algoritmo=digest.split(':', 1)[0]) == digest
+    return (_mismo_contenido(destino, accion['tamano'], accion['mtime_ns_destino'], accion['hash'], log_func)
+            and _mismo_contenido(origen, accion['tamano'], accion['mtime_ns_origen'], accion['hash'], log_func))
+
+def _ejecutar_accion(accion, log_func, reanudando=False, al_progresar=None, cancel_event=None):
+    tipo = accion['accion']
+    origen = accion.get('origen')
+    destino = accion.get('destino')
+
+    if tipo == 'crear_directorio':
+        os.makedirs(destino, exist_ok=True)
+    elif tipo == 'optimizar':
+        if accion.get('tipo') == 'video':
+            if not procesar_video_ffmpeg(origen, log_func, modo=accion.get('modo', 'recodificar'), al_progresar=al_progresar,
+                                         duracion=accion.get('duracion'), cancel_event=cancel_event):
+                raise RuntimeError("FFmpeg falló")
+        elif not optimizar_imagen(origen):
+            log_func(f"{os.path.basename(origen)} es demasiado grande para optimizarla en memoria; se deja como está.",
+                     nivel="info")
+    elif tipo == 'enlazar':
+        if reanudando and os.path.exists(origen) and os.path.samefile(origen, destino): return
+        if not _enlace_vigente(accion, log_func):
+            log_func(f"No se enlaza {origen}: él o {os.path.basename(destino)} cambió desde la simulación.", nivel="warning")
+            return
+        if not reemplazar_por_enlace(origen, destino):
+            raise OSError("No se pudo enlazar (otro sistema de archivos o sin soporte)")
+    elif tipo == 'borrar_arbol':
+        if reanudando and not os.path.lexists(origen): return
+        shutil.rmtree(origen)
+    elif tipo not in ACCIONES_INFORMATIVAS:
+        raise ValueError(f"Acción desconocida: {tipo}")
+
+def ejecutar_plan(acciones, log_func, update_callback=None, cancel_event=None, total=None, diario=None, reanudando=False,
+                  procesos=None):
+    """
+    Ejecuta tal cual un plan (iterable de acciones o ruta a un JSONL).
+    Los movimientos se agrupan con un PlanMovimientos: cada archivo se renombra una sola vez
+    aunque el plan lo mueva varias veces, y nunca se sobrescribe un destino que ya exista.
+    Los backups de archivos pequeños se copian en segundo plano (CopiadorArchivos) y las
+    conversiones corren en paralelo (PoolComandos, hasta 'procesos' FFmpeg, o PoolFunciones para
+    las imágenes que se convierten con Pillow, con FFmpeg de reserva; las uniones de segmentos
+    también van a PoolComandos y las imágenes a optimizar, a PoolFunciones); antes de tocar
+    una ruta que todavía se está copiando o convirtiendo se espera a que termine.
+    Con 'diario', cada acción terminada se confirma en él (ver diario.py).
+    Una acción que falla se registra y no detiene el resto.
+    Antes de lanzar una acción con 'espacio' se comprueba que quepa en el disco real (el plan se
+    hizo con otro libre): si no cabe, se espera a las que están en marcha y, si aun así no cabe,
+    la acción falla con ENOSPC en vez de llenar el disco a medias.
+    """
+    if isinstance(acciones, str):
+        acciones = leer_plan(acciones)
+    movimientos = PlanMovimientos(comprobar_destino=True, reanudando=reanudando)
+    # Números de las acciones diferidas en el plan de movimientos (se confirman al aplicarlo)
+    diferidas = []
+    copiador = CopiadorArchivos()
+    pool = PoolComandos(procesos, cancel_event)
+    pool_imagenes = PoolFunciones(cancel_event=cancel_event)
+    # Rutas ligadas a una conversión en curso (el original, su salida y a dónde se moverán) -> conversión.
+    # Sus movimientos quedan retenidos y solo se registran si la conversión acaba bien.
+    ligadas = {}
+    retenidos = {}
+    # Rutas que ya no se deben mover porque su conversión falló
+    conversion_fallida = set()
+    # Espacio reservado por las acciones en marcha (se crea con la primera que lo necesita)
+    control = None
+    # Manifiesto de archivos optimizados (se abre con la primera optimización que termina)
+    manifiesto = None
+    ejecutadas = 0
+    fallidas = 0
+    procesadas = 0
+
+    def aplicar_movimientos():
+        nonlocal ejecutadas, fallidas
+        errores = movimientos.aplicar(log_func)
+        ejecutadas += len(diferidas) - errores
+        fallidas += errores
+        if diario:
+            for n in diferidas: diario.confirmar(n)
+        diferidas.clear()
+
+    def liberar_retenidos(accion, error):
+        nonlocal fallidas
+        conversion = _clave(accion['destino'])
+        claves = [clave for clave, c in ligadas.items() if c == conversion]
+        for clave in claves: del ligadas[clave]
+        if error and not (cancel_event and cancel_event.is_set()):
+            conversion_fallida.update(claves)
+        for mov in retenidos.pop(conversion, []):
+            if not error:
+                movimientos.mover(mov['origen'], mov['destino'])
+                diferidas.append(mov.get('n'))
+            elif not (cancel_event and cancel_event.is_set()):
+                # Como en la herramienta: si la conversión falla, el original se queda donde estaba
+                fallidas += 1
+                if diario: diario.confirmar(mov.get('n'), error="La conversión del archivo falló")
+
+    def reservar_espacio(accion):
+        """Reserva el espacio estimado de una acción; si no cabe, espera a las que están en marcha."""
+        nonlocal control
+        necesario = accion.get('espacio') or 0
+        if not necesario:
+            return 0
+        if control is None:
+            # El plan ya dejó su reserva: aquí solo se evita quedarse sin disco
+            control = ControlEspacio(os.path.dirname(accion.get('destino') or accion['origen']), reserva_mb=0)
+        if not control.admitir(necesario):
+            recoger(esperar=True)
+            if not control.admitir(necesario):
+                raise OSError(errno.ENOSPC, f"Espacio en disco insuficiente ({necesario / 1048576:.1f} MB)")
+        return necesario
+
+    def anotar_en_manifiesto(accion):
+        """Anota en el manifiesto la salida de una optimización o conversión que terminó bien."""
+        nonlocal manifiesto
+        if manifiesto is None:
+            manifiesto = abrir_manifiesto(log_func) or False
+        if not manifiesto:
+            return
+        ruta = accion.get('destino') or accion['origen']
+        try:
+            if accion['accion'] == 'convertir':
+                manifiesto.registrar_conversion(accion['origen'], ruta)
+            else:
+                manifiesto.registrar(ruta, accion.get('tipo', 'imagen'))
+        except Exception as e:
+            log_func(f"No se pudo anotar {os.path.basename(ruta)} en el manifiesto: {e}", nivel="warning")
+
+    def recoger(esperar=False):
+        """Confirma las copias y conversiones en segundo plano que ya terminaron."""
+        nonlocal ejecutadas, fallidas
+        for fuente in (copiador, pool_imagenes, pool):
+            for accion, error in fuente.terminados(esperar):
+                if (fuente is pool_imagenes and accion['accion'] == 'convertir' and error
+                        and not (cancel_event and cancel_event.is_set())):
+                    # Pillow no pudo con el archivo: se reintenta con el comando FFmpeg del plan
+                    pool.enviar(accion['comando'], accion, rutas=(accion['origen'], accion['destino']))
+                    continue
+                if control and accion.get('espacio'):
+                    control.liberar(accion['espacio'])
+                if accion['accion'] == 'unir':
+                    limpiar_union(accion['destino'], accion['formato'])
+                if accion['accion'] == 'convertir' and not error:
+                    # Antes de liberar el traslado del original a 'basura'
+                    anotar_en_manifiesto(accion)
+                if accion['accion'] in ('convertir', 'unir'):
+                    if error and os.path.exists(accion['destino']):
+                        # Salida a medias de FFmpeg
+                        try: os.remove(accion['destino'])
+                        except OSError: pass
+                    liberar_retenidos(accion, error)
+                if error and cancel_event and cancel_event.is_set():
+                    # Interrumpida por la cancelación: sin confirmar, así se repite al reanudar
+                    continue
+                if error:
+                    fallidas += 1
+                    log_func(f"Error en la acción {accion['accion']} ({accion.get('origen') or accion['destino']}): {error}", nivel="error")
+                else:
+                    ejecutadas += 1
+                    if accion['accion'] == 'optimizar': anotar_en_manifiesto(accion)
+                if diario: diario.confirmar(accion.get('n'), error=str(error) if error else None)
+
+    def materializar(ruta):
+        # Si hay que mover algo en disco, antes deben terminar las copias y conversiones en curso
+        if movimientos.pendiente_en(ruta) or _clave(ruta) in ligadas: recoger(esperar=True)
+        movimientos.materializar(ruta)
+
+    try:
+        for accion in acciones:
+            if cancel_event and cancel_event.is_set():
+                return {}
+            tipo = accion['accion']
+            en_segundo_plano = False
+            reservado = 0
+            try:
+                if tipo not in ('mover', 'borrar_directorio'):
+                    for ruta in _rutas(accion):
+                        copiador.esperar(ruta)
+                        pool_imagenes.esperar(ruta)
+                        pool.esperar(ruta)
+                if tipo in ('backup', 'convertir', 'unir'):
+                    for ruta in _rutas(accion):
+                        materializar(ruta)
+                if tipo == 'backup':
+                    # Sin copiar datos si se puede (reflink/hardlink); si no, copia en el pool
+                    if (_backup_necesario(accion['origen'], accion['destino'], reanudando)
+                            and not enlazar_backup(accion['origen'], accion['destino'], copiador.estadisticas)):
+                        copiador.copiar(accion['origen'], accion['destino'], accion)
+                        en_segundo_plano = True
+                elif tipo == 'convertir':
+                    reservado = reservar_espacio(accion)
+                    rutas = (accion['origen'], accion['destino'])
+                    if accion.get('motor') == 'pillow':
+                        pool_imagenes.enviar(convertir_imagen_pillow, *rutas, dato=accion, rutas=rutas)
+                    else:
+                        pool.enviar(accion['comando'], accion, rutas=rutas)
+                    conversion = _clave(accion['destino'])
+                    ligadas[_clave(accion['origen'])] = ligadas[conversion] = conversion
+                    en_segundo_plano = True
+                elif tipo == 'unir':
+                    reservado = reservar_espacio(accion)
+                    cmd, preparar = preparar_union(accion['origenes'], accion['destino'], accion['formato'])
+                    pool.enviar(cmd, accion, rutas=_rutas(accion), antes=preparar)
+                    conversion = _clave(accion['destino'])
+                    for ruta in _rutas(accion): ligadas[_clave(ruta)] = conversion
+                    en_segundo_plano = True
+                elif tipo == 'mover' and _clave(accion['origen']) in conversion_fallida:
+                    raise RuntimeError("La conversión del archivo falló")
+                elif tipo == 'mover' and _clave(accion['origen']) in ligadas:
+                    # El original (o la salida) se mueve solo cuando su conversión haya terminado bien
+                    conversion = ligadas[_clave(accion['origen'])]
+                    retenidos.setdefault(conversion, []).append(accion)
+                    ligadas[_clave(accion['destino'])] = conversion
+                    en_segundo_plano = True
+                elif tipo == 'mover':
+                    movimientos.mover(accion['origen'], accion['destino'])
+                elif tipo == 'borrar_directorio':
+                    movimientos.eliminar_directorio(accion['origen'])
+                elif tipo == 'borrar_arbol':
+                    # Lo que deba salir o entrar en la carpeta se mueve antes de borrarla
+                    recoger(esperar=True)
+                    aplicar_movimientos()
+                    _ejecutar_accion(accion, log_func, reanudando)
+                elif tipo == 'optimizar' and accion.get('tipo') != 'video':
+                    # Las imágenes se optimizan en el pool de procesos, a la vez que lo demás
+                    materializar(accion['origen'])
+                    reservado = reservar_espacio(accion)
+                    pool_imagenes.enviar(optimizar_imagen, accion['origen'], dato=accion, rutas=(accion['origen'],))
+                    en_segundo_plano = True
+                elif tipo not in ACCIONES_INFORMATIVAS:
+                    for ruta in (accion.get('origen'), accion.get('destino')):
+                        if ruta: materializar(ruta)
+                    al_progresar = None
+                    if update_callback and tipo == 'optimizar':
+                        # Avance dentro de una recodificación larga
+                        def al_progresar(detalle, hechas=procesadas, nombre=os.path.basename(accion['origen'])):
+                            update_callback(hechas + (detalle['fraccion'] or 0), total or 0, nombre, detalle=detalle)
+                    if tipo == 'optimizar': reservado = reservar_espacio(accion)
+                    _ejecutar_accion(accion, log_func, reanudando, al_progresar, cancel_event)
+                    if tipo == 'optimizar': anotar_en_manifiesto(accion)
+                    if reservado:
+                        control.liberar(reservado)
+                        reservado = 0
+                    
+                # Lo que corre en segundo plano se confirma en recoger()
+                if en_segundo_plano:
+                    pass
+                elif tipo in ('mover', 'borrar_directorio'):
+                    diferidas.append(accion.get('n'))
+                else:
+                    if tipo not in ACCIONES_INFORMATIVAS: ejecutadas += 1
+                    if diario: diario.confirmar(accion.get('n'))
+            except Exception as e:
+                if reservado and not en_segundo_plano:
+                    control.liberar(reservado)
+                if cancel_event and cancel_event.is_set():
+                    # Interrumpida por la cancelación: sin confirmar, así se repite al reanudar
+                    continue
+                if tipo in ('convertir', 'unir'):
+                    # No llegó a lanzarse: sus originales se quedan donde estaban
+                    conversion_fallida.update(_clave(ruta) for ruta in _rutas(accion))
+                fallidas += 1
+                log_func(f"Error en la acción {tipo} ({accion.get('origen') or accion.get('destino')}): {e}", nivel="error")
+                if diario: diario.confirmar(accion.get('n'), error=str(e))
+            recoger()
+            procesadas += 1
+            if update_callback: update_callback(procesadas, total or 0, tipo)
+    finally:
+        # Lo decidido hasta el final o la cancelación se lleva al disco
+        recoger(esperar=True)
+        copiador.cerrar()
+        pool_imagenes.cerrar()
+        pool.cerrar()
+        aplicar_movimientos()
+        if manifiesto: manifiesto.cerrar()
+        if copiador.estadisticas.archivos_enlazados:
+            log_func(f"Backups enlazados sin copiar: {copiador.estadisticas.archivos_enlazados} "
+                     f"({copiador.estadisticas.bytes_ahorrados / 1048576:.1f} MB ahorrados)", nivel="info")
+        if copiador.estadisticas.archivos_copiados:
+            copias = copiador.estadisticas
+            log_func(f"Copias: {copias.archivos_copiados} archivos, {copias.bytes_copiados / 1048576:.1f} MB "
+                     f"a {copias.mb_por_segundo:.1f} MB/s", nivel="info")
+
+    if update_callback and not (cancel_event and cancel_event.is_set()):
+        update_callback(1, 1, "")
+    return {'acciones_ejecutadas': ejecutadas, 'acciones_fallidas': fallidas}
@@ -0,0 +1,171 @@
+import os
+import json
+import sqlite3
+import subprocess
+from funciones.dependencias import obtener_ruta_base_real, resolver_comando
+
+# Perfil de salida de Pre-procesar: MP4 con H.264 y AAC (o sin audio)
+CODEC_VIDEO_OBJETIVO = 'h264'
+CODECS_AUDIO_OBJETIVO = {'aac', None}
+CONTENEDORES_MP4 = {'.mp4', '.m4v'}
+# Bits por píxel y fotograma a partir de los que un H.264 se considera "pesado" y compensa
+# recodificarlo (CRF 23 suele quedar muy por debajo)
+BPP_MAXIMO = 0.2
+
+def obtener_ruta_cache_sondeos():
+    """Ruta de la base SQLite con los metadatos de FFprobe (carpeta 'cache' del programa)."""
+    return os.path.join(obtener_ruta_base_real(), 'cache', 'sondeos.db')
+
+# Se incrementa cuando cambia el esquema o lo que se guarda; una versión distinta descarta el caché
+VERSION_ESQUEMA = 2
+
+class CacheSondeos:
+    """
+    Metadatos de FFprobe por archivo (códecs, bitrate, resolución, duración).
+    Una entrada solo es válida si coinciden ruta, tamaño y mtime_ns.
+    """
+    def __init__(self, ruta_db=None):
+        self.ruta_db = ruta_db or obtener_ruta_cache_sondeos()
+        os.makedirs(os.path.dirname(self.ruta_db), exist_ok=True)
+        self.conexion = sqlite3.connect(self.ruta_db)
+        if self.conexion.execute("PRAGMA user_version").fetchone()[0] != VERSION_ESQUEMA:
+            self.conexion.execute("DROP TABLE IF EXISTS sondeos")
+            self.conexion.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS sondeos (ruta TEXT PRIMARY KEY, tamano INTEGER, mtime_ns INTEGER, datos TEXT)"
+        )
+        self.aciertos = 0
+        self.fallos = 0
+        self.pendientes = 0
+
+    def consultar(self, ruta, st):
+        fila = self.conexion.execute(
+            "SELECT datos FROM sondeos WHERE ruta = ? AND tamano = ? AND mtime_ns = ?",
+            (os.path.abspath(ruta), st.st_size, st.st_mtime_ns)
+        ).fetchone()
+        if fila:
+            self.aciertos += 1
+            return json.loads(fila[0])
+        self.fallos += 1
+        return None
+
+    def guardar(self, ruta, st, datos):
+        self.conexion.execute(
+            "INSERT OR REPLACE INTO sondeos (ruta, tamano, mtime_ns, datos) VALUES (?, ?, ?, ?)",
+            (os.path.abspath(ruta), st.st_size, st.st_mtime_ns, json.dumps(datos))
+        )
+        self.pendientes += 1
+        if self.pendientes >= 100:
+            self.conexion.commit()
+            self.pendientes = 0
+
+    def cerrar(self):
+        self.conexion.commit()
+        self.conexion.close()
+
+def abrir_cache_sondeos(log_func):
+    """Abre el caché de sondeos. Si no es posible, retorna None y se sondea siempre."""
+    try:
+        return CacheSondeos()
+    except Exception as e:
+        log_func(f"No se pudo abrir el caché de FFprobe: {e}", nivel="warning")
+        return None
+
+def _numero(valor, tipo=float):
+    try:
+        return tipo(valor)
+    except (TypeError, ValueError):
+        return None
+
+def _fps(texto):
+    """'30000/1001' -> 29.97"""
+    try:
+        num, den = (texto or '').split('/')
+        return float(num) / float(den) if float(den) else None
+    except ValueError:
+        return None
+
+def _ejecutar_ffprobe(ruta):
+    """Lanza FFprobe y resume su salida. Retorna None si el archivo no es un medio válido."""
+    startup_args = {}
+    if os.name == 'nt':
+        startup_args['creationflags'] = subprocess.CREATE_NO_WINDOW
+    cmd = ['ffprobe', '-v', 'error', '-print_format', 'json',
+           '-show_entries', 'format=format_name,duration,bit_rate'
+                            ':stream=codec_type,codec_name,width,height,bit_rate,avg_frame_rate',
+           ruta]
+    try:
+        res = subprocess.run(resolver_comando(cmd), capture_output=True, text=True, **startup_args)
+    except OSError:
+        return None
+    if res.returncode != 0:
+        return None
+    try:
+        salida = json.loads(res.stdout or '{}')
+    except ValueError:
+        return None
+
+    formato = salida.get('format', {})
+    video = next((s for s in salida.get('streams', []) if s.get('codec_type') == 'video'), {})
+    audio = next((s for s in salida.get('streams', []) if s.get('codec_type') == 'audio'), {})
+    return {
+        'contenedor': formato.get('format_name'),
+        'duracion': _numero(formato.get('duration')),
+        'bitrate': _numero(formato.get('bit_rate'), int),
+        'video': video.get('codec_name'),
+        'bitrate_video': _numero(video.get('bit_rate'), int),
+        'ancho': video.get('width'),
+        'alto': video.get('height'),
+        'fps': _fps(video.get('avg_frame_rate')),
+        'audio': audio.get('codec_name'),
+        # Streams que no son ni video ni audio (subtítulos, datos, adjuntos)
+        'otros': sorted({s.get('codec_type') for s in salida.get('streams', [])} - {'video', 'audio', None}),
+    }
+
+def sondear(ruta, st=None, cache=None):
+    """
+    Metadatos de un video con FFprobe, desde el caché si el archivo no cambió.
+    Retorna None si FFprobe no está o no puede leer el archivo (tampoco se repite mientras no cambie).
+    """
+    if cache is not None:
+        st = st or os.stat(ruta)
+        guardado = cache.consultar(ruta, st)
+        if guardado is not None:
+            return guardado.get('info')
+    info = _ejecutar_ffprobe(ruta)
+    if cache is not None:
+        cache.guardar(ruta, st, {'info': info})
+    return info
+
+def decidir_video(ruta, info):
+    """
+    Qué hace falta para dejar un video en el perfil de Pre-procesar.
+    Retorna (modo, motivo): 'saltar' si ya cumple, 'remuxear' si basta con cambiar el contenedor
+    (copiando los streams), o 'recodificar'.
+    Con subtítulos u otros streams no se remuxea: copiados tal cual (SRT, ASS, PGS...) MP4 no los
+    admite, y al recodificar FFmpeg convierte los de texto.
+    """
+    if not info or not info.get('video'):
+        return 'recodificar', 'sin_datos'
+    if info['video'] != CODEC_VIDEO_OBJETIVO or info.get('audio') not in CODECS_AUDIO_OBJETIVO:
+        return 'recodificar', 'codec'
+    bitrate = info.get('bitrate_video') or info.get('bitrate')
+    if bitrate and info.get('ancho') and info.get('alto'):
+        bpp = bitrate / (info['ancho'] * info['alto'] * (info.get('fps') or 30))
+        if bpp > BPP_MAXIMO:
+            return 'recodificar', 'bitrate'
+    if os.path.splitext(ruta)[1].lower() not in CONTENEDORES_MP4:
+        # Sin el dato (sondeo antiguo) se asume que puede haberlos
+        if info.get('otros', ['desconocidos']):
+            return 'recodificar', 'otros_streams'
+        return 'remuxear', 'contenedor'
+    return 'saltar', 'ya_optimizado'
+
+def salida_actualizada(origen, destino, st_origen=None, st_destino=None):
+    """True si 'destino' ya existe, no está vacío y es posterior a 'origen' (conversión ya hecha)."""
+    try:
+        st_origen = st_origen or os.stat(origen)
+        st_destino = st_destino or os.stat(destino)
+    except OSError:
+        return False
+    return st_destino.st_size > 0 and st_destino.st_mtime_ns >= st_origen.st_mtime_ns
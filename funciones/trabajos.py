@@ -0,0 +1,203 @@
+import os
+import threading
+import multiprocessing
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, ALL_COMPLETED, FIRST_COMPLETED
+from funciones.dependencias import resolver_comando
+
+# Conversiones simultáneas por defecto: remuxear es sobre todo E/S y arranque de procesos,
+# así que compensa tener varios FFmpeg vivos sin llegar a saturar todos los núcleos
+PROCESOS_FFMPEG = max(2, min(8, (os.cpu_count() or 2) // 2))
+# Los trabajos de Python (decodificar/codificar imágenes) son CPU puro: un proceso por núcleo
+PROCESOS_PYTHON = os.cpu_count() or 1
+# Arrancar un programa (PoolComandos, en sus hilos) y crear un proceso del pool de Python
+# (fork en Linux) no pueden solaparse: el proceso hijo heredaría la tubería de error del
+# Popen a medio crear y el Popen esperaría a que ese proceso terminara
+_LANZAMIENTO = threading.Lock()
+
+class PoolTrabajos:
+    """
+    Base de los pools de trabajos en segundo plano, con como mucho 'maximo' en marcha a la vez.
+    'enviar()' bloquea mientras no haya un hueco libre, y 'terminados()' entrega (dato, error)
+    de cada trabajo acabado en el hilo que llama (ahí se actualizan inventario, log y progreso).
+    Si se activa 'cancel_event' mientras se espera, se cancela lo que esté en marcha.
+    """
+    def __init__(self, maximo, cancel_event=None):
+        self.maximo = max(1, maximo)
+        self.cancel_event = cancel_event
+        self._cancelado = False
+        # futuro -> (dato, claves de las rutas que usa)
+        self._futuros = {}
+        # clave de ruta -> futuro del trabajo que la lee o escribe
+        self._en_curso = {}
+
+    @staticmethod
+    def _clave(ruta):
+        return os.path.normcase(os.path.normpath(ruta))
+
+    def _lanzar(self, *args):
+        raise NotImplementedError
+
+    def _esperar(self, futuros, todos=True):
+        """wait() que atiende la cancelación mientras espera."""
+        pendientes = set(futuros)
+        while pendientes:
+            hechos, pendientes = wait(pendientes, timeout=0.2,
+                                      return_when=ALL_COMPLETED if todos else FIRST_COMPLETED)
+            if hechos and not todos:
+                return
+            if self.cancel_event and self.cancel_event.is_set():
+                self.cancelar()
+                wait(pendientes)
+                return
+
+    def en_vuelo(self):
+        return sum(1 for f in self._futuros if not f.done())
+
+    def _enviar(self, args, dato, rutas):
+        while self.en_vuelo() >= self.maximo and not self._cancelado:
+            self._esperar([f for f in self._futuros if not f.done()], todos=False)
+        if self._cancelado:
+            futuro = Future()
+            futuro.set_exception(RuntimeError("Cancelado"))
+        else:
+            futuro = self._lanzar(*args)
+        claves = tuple(self._clave(r) for r in rutas)
+        for clave in claves: self._en_curso[clave] = futuro
+        self._futuros[futuro] = (dato, claves)
+        return futuro
+
+    def esperar(self, ruta=None):
+        """Espera al trabajo que usa 'ruta' (o a todos si no se indica)."""
+        if ruta is None:
+            self._esperar(list(self._futuros))
+            return
+        futuro = self._en_curso.get(self._clave(ruta))
+        if futuro is not None:
+            self._esperar([futuro])
+
+    def terminados(self, esperar=False):
+        """Genera (dato, error o None) de los trabajos acabados, en el orden en que se lanzaron."""
+        for dato, _, error in self.resultados(esperar):
+            yield dato, error
+
+    def resultados(self, esperar=False):
+        """Como terminados(), pero genera (dato, lo que retornó el trabajo, error o None)."""
+        if esperar:
+            self.esperar()
+        for futuro in [f for f in self._futuros if f.done()]:
+            dato, claves = self._futuros.pop(futuro)
+            for clave in claves:
+                if self._en_curso.get(clave) is futuro: del self._en_curso[clave]
+            error = RuntimeError("Cancelado") if futuro.cancelled() else futuro.exception()
+            yield dato, (None if error else futuro.result()), error
+
+    def cancelar(self):
+        self._cancelado = True
+
+    def cerrar(self):
+        pass
+
+class PoolComandos(PoolTrabajos):
+    """
+    Ejecuta comandos externos (FFmpeg) en paralelo con, como mucho, 'procesos' vivos a la vez.
+    Al cancelar, los procesos en curso se matan.
+    """
+    def __init__(self, procesos=None, cancel_event=None):
+        super().__init__(procesos or PROCESOS_FFMPEG, cancel_event)
+        self.procesos = self.maximo
+        self._pool = ThreadPoolExecutor(max_workers=self.maximo)
+        self._lock = threading.Lock()
+        self._vivos = set()
+
+        # --- CONFIGURACIÓN PARA OCULTAR CONSOLA EN WINDOWS ---
+        self._startup_args = {}
+        if os.name == 'nt':
+            self._startup_args['creationflags'] = subprocess.CREATE_NO_WINDOW
+
+    def _ejecutar(self, cmd, antes=None):
+        if antes is not None:
+            antes()
+        with self._lock, _LANZAMIENTO:
+            if self._cancelado:
+                raise RuntimeError("Cancelado")
+            proceso = subprocess.Popen(resolver_comando(cmd), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE, **self._startup_args)
+            self._vivos.add(proceso)
+        try:
+            _, stderr = proceso.communicate()
+        finally:
+            with self._lock:
+                self._vivos.discard(proceso)
+        if proceso.returncode != 0:
+            raise RuntimeError(stderr.decode(errors='replace').strip() or f"código de salida {proceso.returncode}")
+
+    def _lanzar(self, cmd, antes):
+        return self._pool.submit(self._ejecutar, cmd, antes)
+
+    def enviar(self, cmd, dato=None, rutas=(), antes=None):
+        """
+        Lanza 'cmd' en cuanto haya un hueco. 'rutas' son las que lee o escribe (para esperar(ruta)).
+        'antes()' se ejecuta en el mismo hilo justo antes del comando (p. ej. para preparar su entrada).
+        """
+        return self._enviar((cmd, antes), dato, rutas)
+
+    def cancelar(self):
+        """Mata los procesos en curso; los que aún no arrancaron ya no se lanzan."""
+        with self._lock:
+            self._cancelado = True
+            for proceso in self._vivos:
+                try: proceso.kill()
+                except OSError: pass
+
+    def cerrar(self):
+        self._pool.shutdown(wait=True)
+
+# Evento de cancelación compartido con los procesos de PoolFunciones (None fuera de ellos)
+_cancelacion = None
+
+def _iniciar_proceso(evento):
+    global _cancelacion
+    _cancelacion = evento
+
+def trabajo_cancelado():
+    """True si el pool que ejecuta este proceso se canceló (para cortar trabajos largos o por lotes)."""
+    return _cancelacion is not None and _cancelacion.is_set()
+
+class PoolFunciones(PoolTrabajos):
+    """
+    Ejecuta funciones de Python en un pool de procesos, sin el coste de lanzar un programa
+    por archivo. Las funciones deben estar a nivel de módulo y lanzar una excepción si fallan.
+    El pool se crea con el primer trabajo. Al cancelar, lo pendiente ya no se ejecuta y las
+    funciones en marcha lo ven con trabajo_cancelado().
+    """
+    def __init__(self, procesos=None, cancel_event=None):
+        self.procesos = max(1, procesos or PROCESOS_PYTHON)
+        # Unos pocos trabajos de más en cola para que ningún proceso quede esperando
+        super().__init__(self.procesos * 2, cancel_event)
+        self._pool = None
+        self._evento = None
+
+    def _lanzar(self, funcion, args):
+        if self._pool is None:
+            self._evento = multiprocessing.Event()
+            self._pool = ProcessPoolExecutor(max_workers=self.procesos, initializer=_iniciar_proceso,
+                                             initargs=(self._evento,))
+        # submit() puede crear los procesos del pool
+        with _LANZAMIENTO:
+            return self._pool.submit(funcion, *args)
+
+    def enviar(self, funcion, *args, dato=None, rutas=()):
+        """Lanza funcion(*args) en cuanto haya un hueco. 'rutas' como en PoolComandos.enviar."""
+        return self._enviar((funcion, args), dato, rutas)
+
+    def cancelar(self):
+        self._cancelado = True
+        if self._pool is not None:
+            self._evento.set()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=self._cancelado)
+            self._pool = None
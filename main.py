@@ -1,5 +1,6 @@
 import os
 import sys
+import multiprocessing
 import logging
 import time
 from datetime import datetime, timedelta
@@ -10,6 +11,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'funciones'))
 from funciones.dependencias import chequear_e_instalar_todo 
 from funciones.dependencias import verificar_ffmpeg 
 from funciones.gui import OrgestApp 
+from funciones.inventario import Inventario
 
 DEPS_OK = False
 FFMPEG_ENCONTRADO = False
@@ -82,15 +84,11 @@ def manejar_log(mensaje, nivel="error", exc_info=False):
         elif nivel == "debug":
             logger_instance.debug(mensaje, exc_info=exc_info)
 
-def contar_archivos_totales(ruta):
+def contar_archivos_totales(ruta, inventario=None):
     """Cuenta recursivamente los archivos en una ruta, ignorando carpetas de sistema."""
-    total = 0
     ignoradas = ["basura", "fallos", "sin_edit", "funciones", "logs"]
     try:
-        for root, _, files in os.walk(ruta):
-            if os.path.basename(root) not in ignoradas:
-                total += len(files)
-        return total
+        return (inventario or Inventario(ruta)).contar_archivos(ruta, ignoradas)
     except Exception:
         return 0
 
@@ -192,13 +190,22 @@ def mostrar_bienvenida_y_esperar(log_func):
     root_splash.mainloop()
 
 def main():
-    """Punto de entrada: configura log, chequea dependencias y lanza la interfaz."""
+    """
+    Punto de entrada: configura log, chequea dependencias y lanza la interfaz.
+    Con argumentos (ej: 'main.py duplicados RUTA') se ejecuta en modo consola, sin GUI.
+    """
     global DEPS_OK, FFMPEG_ENCONTRADO
     
     log_func = manejar_log 
+    if len(sys.argv) > 1:
+        from funciones.consola import ejecutar_consola
+        sys.exit(ejecutar_consola(sys.argv[1:], log_func))
+        
     DEPS_OK = chequear_e_instalar_todo(log_func) 
     FFMPEG_ENCONTRADO = verificar_ffmpeg(log_func) 
     mostrar_bienvenida_y_esperar(log_func)
 
 if __name__ == "__main__":
+    # Necesario para los pools de procesos en el ejecutable congelado (PyInstaller)
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
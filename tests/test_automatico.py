@@ -0,0 +1,99 @@
+import os
+import pytest
+from funciones import cache_hashes, conversiones, manifiesto, sondeo
+from funciones.automatico import ejecutar_modo_automatico
+from funciones.conversiones import convertir_formatos_archivos
+from funciones.duplicados import eliminar_duplicados
+from funciones.extraer import extraer_archivos_raiz
+from funciones.inventario import Inventario, mover_archivo
+from funciones.limpieza_final import limpiar_carpetas_temporales
+from funciones.ordenar import organizar_archivos_carpetas
+from funciones.planificador import PlanMovimientos
+
+def _sin_log(mensaje, nivel="info", exc_info=False):
+    pass
+
+@pytest.fixture(autouse=True)
+def cache_propio(tmp_path, monkeypatch):
+    cache = tmp_path / 'cache'
+    monkeypatch.setattr(cache_hashes, 'obtener_ruta_cache_hashes', lambda: str(cache / 'hashes.db'))
+    monkeypatch.setattr(manifiesto, 'obtener_ruta_manifiesto', lambda: str(cache / 'optimizados.db'))
+    monkeypatch.setattr(sondeo, 'obtener_ruta_cache_sondeos', lambda: str(cache / 'sondeos.db'))
+    # El árbol no tiene nada que convertir: FFmpeg no llega a ejecutarse
+    monkeypatch.setattr(conversiones, 'verificar_ffmpeg', lambda log_func: True)
+
+def _crear_arbol(ruta):
+    """Árbol con choques de nombre en cada paso: mismos nombres en varias carpetas, duplicados y 'basura' previa."""
+    archivos = {
+        'foto.jpg': 'A', 'foto_1.jpg': 'B', 'nota.txt': 'C',
+        'Imagenes/foto.jpg': 'D', 'Imagenes/foto_1.jpg': 'E',
+        'a/foto.jpg': 'F', 'a/b/foto.jpg': 'A', 'a/nota.txt': 'G',
+        'Documentos/nota.txt': 'H', 'c/nota.txt': 'C', 'c/d/foto.jpg': 'I',
+        'basura/foto.jpg': 'J', 'x/datos.xyz': 'K', 'datos.xyz': 'L', 'lista.xyz': 'M',
+    }
+    for relativa, contenido in archivos.items():
+        completa = os.path.join(ruta, relativa)
+        os.makedirs(os.path.dirname(completa), exist_ok=True)
+        with open(completa, 'w') as f:
+            f.write(contenido)
+    os.makedirs(os.path.join(ruta, 'vacia', 'sub'))
+
+def _foto(ruta):
+    """Estado del árbol: ruta relativa -> contenido (None para carpetas)."""
+    estado = {}
+    for root, dirs, files in os.walk(ruta):
+        for d in dirs:
+            estado[os.path.relpath(os.path.join(root, d), ruta) + '/'] = None
+        for f in files:
+            with open(os.path.join(root, f)) as archivo:
+                estado[os.path.relpath(os.path.join(root, f), ruta)] = archivo.read()
+    return estado
+
+def _pasos(ruta, inventario=None):
+    return [
+        lambda: eliminar_duplicados(ruta, _sin_log, True, inventario=inventario),
+        lambda: organizar_archivos_carpetas(ruta, _sin_log, inventario=inventario),
+        lambda: convertir_formatos_archivos(ruta, _sin_log, inventario=inventario),
+        lambda: extraer_archivos_raiz(ruta, _sin_log, True, inventario=inventario),
+    ]
+
+def _intercambiar(ruta_a, ruta_b, inventario=None):
+    """Intercambia dos archivos a través de un nombre intermedio (con plan, queda un ciclo a -> b -> a)."""
+    intermedio = ruta_a + '.intercambio'
+    mover_archivo(ruta_a, intermedio, inventario)
+    mover_archivo(ruta_b, ruta_a, inventario)
+    mover_archivo(intermedio, ruta_b, inventario)
+
+def test_modo_automatico_deja_el_mismo_arbol_que_los_pasos_sueltos(tmp_path):
+    secuencial, planificado = str(tmp_path / 'secuencial'), str(tmp_path / 'planificado')
+    _crear_arbol(secuencial)
+    _crear_arbol(planificado)
+
+    for paso in _pasos(secuencial):
+        paso()
+    limpiar_carpetas_temporales(secuencial, _sin_log)
+    assert ejecutar_modo_automatico(planificado, _sin_log, False) == {}
+
+    assert _foto(planificado) == _foto(secuencial)
+
+def test_plan_con_ciclo_deja_el_mismo_arbol_que_los_pasos_sueltos(tmp_path):
+    secuencial, planificado = str(tmp_path / 'secuencial'), str(tmp_path / 'planificado')
+    _crear_arbol(secuencial)
+    _crear_arbol(planificado)
+
+    for paso in _pasos(secuencial):
+        paso()
+    _intercambiar(os.path.join(secuencial, 'datos.xyz'), os.path.join(secuencial, 'lista.xyz'))
+
+    inventario = Inventario(planificado)
+    inventario.plan = plan = PlanMovimientos()
+    for paso in _pasos(planificado, inventario):
+        paso()
+    # Ninguno de los dos cambia de sitio en los pasos: en disco el intercambio es un ciclo puro
+    _intercambiar(os.path.join(planificado, 'datos.xyz'), os.path.join(planificado, 'lista.xyz'), inventario)
+    # Sin tocar el disco hasta aplicar el plan
+    assert _foto(planificado) != _foto(secuencial)
+    plan.aplicar(_sin_log)
+
+    assert _foto(planificado) == _foto(secuencial)
+    assert not [f for f in os.listdir(planificado) if f.endswith('.orgest_mov')]
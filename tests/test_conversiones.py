@@ -0,0 +1,51 @@
+import os
+import shutil
+import pytest
+from funciones import conversiones, manifiesto, sondeo
+
+Image = pytest.importorskip('PIL.Image')
+
+def _sin_log(mensaje, nivel="info", exc_info=False):
+    pass
+
+@pytest.fixture
+def carpeta(tmp_path, monkeypatch):
+    # Caché y manifiesto propios del test; las imágenes se convierten con Pillow, sin FFmpeg
+    monkeypatch.setattr(manifiesto, 'obtener_ruta_manifiesto', lambda: str(tmp_path / 'cache' / 'optimizados.db'))
+    monkeypatch.setattr(sondeo, 'obtener_ruta_cache_sondeos', lambda: str(tmp_path / 'cache' / 'sondeos.db'))
+    monkeypatch.setattr(conversiones, 'verificar_ffmpeg', lambda log_func: True)
+    ruta = tmp_path / 'carpeta'
+    ruta.mkdir()
+    return ruta
+
+def _webp(ruta, color):
+    Image.new('RGB', (16, 16), color).save(ruta, format='WEBP')
+
+def _mas_antiguo(ruta):
+    st = os.stat(ruta)
+    os.utime(ruta, ns=(st.st_atime_ns, st.st_mtime_ns - 10**10))
+
+def test_png_ajeno_con_el_mismo_nombre_no_cuenta_como_convertido(carpeta):
+    _webp(carpeta / 'foto.webp', 'red')
+    _mas_antiguo(carpeta / 'foto.webp')
+    (carpeta / 'foto.png').write_bytes(b'otro archivo')
+
+    res = conversiones.convertir_formatos_archivos(str(carpeta), _sin_log)
+
+    assert res == {'convertidos': 1}
+    assert (carpeta / 'foto.png').read_bytes() == b'otro archivo'
+    with Image.open(carpeta / 'foto_1.png') as img:
+        assert img.size == (16, 16)
+    assert (carpeta / 'basura' / 'foto.webp').exists()
+
+def test_conversion_anotada_solo_retira_el_original(carpeta):
+    _webp(carpeta / 'foto.webp', 'blue')
+    assert conversiones.convertir_formatos_archivos(str(carpeta), _sin_log) == {'convertidos': 1}
+    # El original vuelve (restaurado de 'basura') junto a su conversión, más nueva
+    shutil.move(carpeta / 'basura' / 'foto.webp', carpeta / 'foto.webp')
+    _mas_antiguo(carpeta / 'foto.webp')
+
+    res = conversiones.convertir_formatos_archivos(str(carpeta), _sin_log)
+
+    assert res == {'convertidos': 0, 'omitidos_ya_convertidos': 1}
+    assert sorted(os.listdir(carpeta)) == ['basura', 'foto.png']
@@ -0,0 +1,65 @@
+import hashlib
+import os
+from funciones.duplicados import TAMANO_BLOQUE_PARCIAL, agrupar_duplicados, encontrar_duplicados
+
+def _sin_log(mensaje, nivel="info", exc_info=False):
+    pass
+
+def _escribir(ruta, contenido):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as archivo:
+        archivo.write(contenido)
+
+def _grupos_md5(ruta):
+    """Referencia: MD5 del archivo completo, sin fases ni atajos (los vacíos nunca son duplicados)."""
+    por_hash = {}
+    for root, _, files in os.walk(ruta):
+        for f in files:
+            full_path = os.path.join(root, f)
+            with open(full_path, 'rb') as archivo:
+                contenido = archivo.read()
+            if contenido:
+                por_hash.setdefault(hashlib.md5(contenido).hexdigest(), set()).add(full_path)
+    return {frozenset(g) for g in por_hash.values() if len(g) > 1}
+
+def _arbol(tmp_path):
+    ruta = str(tmp_path)
+    # Mismo tamaño, mismos bloques inicial y final: solo el centro distingue a 'medio_b'
+    inicio, fin = os.urandom(TAMANO_BLOQUE_PARCIAL), os.urandom(TAMANO_BLOQUE_PARCIAL)
+    centro = os.urandom(4096)
+    distinto = bytes(b ^ 0xFF for b in centro[:1]) + centro[1:]
+    _escribir(os.path.join(ruta, 'medio_a.bin'), inicio + centro + fin)
+    _escribir(os.path.join(ruta, 'sub', 'medio_a_copia.bin'), inicio + centro + fin)
+    _escribir(os.path.join(ruta, 'medio_b.bin'), inicio + distinto + fin)
+    # Tamaños únicos (uno de ellos con el mismo inicio que los anteriores)
+    _escribir(os.path.join(ruta, 'unico_1.txt'), b'solo')
+    _escribir(os.path.join(ruta, 'unico_2.bin'), inicio + b'x')
+    # Vacíos
+    _escribir(os.path.join(ruta, 'vacio_1'), b'')
+    _escribir(os.path.join(ruta, 'sub', 'vacio_2'), b'')
+    # Pequeños (leídos completos en la fase 2): iguales y de igual tamaño pero distintos
+    _escribir(os.path.join(ruta, 'nota.txt'), b'hola mundo')
+    _escribir(os.path.join(ruta, 'sub', 'otra', 'nota.txt'), b'hola mundo')
+    _escribir(os.path.join(ruta, 'nota_distinta.txt'), b'hola Mundo')
+    return ruta
+
+def test_grupos_coinciden_con_md5_completo(tmp_path):
+    ruta = _arbol(tmp_path)
+    referencia = _grupos_md5(ruta)
+    assert len(referencia) == 2
+
+    grupos = agrupar_duplicados(ruta, _sin_log)
+
+    assert {frozenset(g) for g in grupos} == referencia
+
+def test_encontrar_duplicados_deja_un_original_por_grupo(tmp_path):
+    ruta = _arbol(tmp_path)
+    referencia = _grupos_md5(ruta)
+
+    duplicados = encontrar_duplicados(ruta, _sin_log)
+
+    assert len(duplicados) == len(set(duplicados)) == sum(len(g) - 1 for g in referencia)
+    en_grupos = set().union(*referencia)
+    assert set(duplicados) <= en_grupos
+    for grupo in referencia:
+        assert len(grupo - set(duplicados)) == 1
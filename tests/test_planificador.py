@@ -0,0 +1,53 @@
+import os
+from funciones.planificador import PlanMovimientos
+
+def _escribir(ruta, contenido):
+    with open(ruta, 'w') as f:
+        f.write(contenido)
+
+def _leer(ruta):
+    with open(ruta) as f:
+        return f.read()
+
+def _fallar_hacia(plan, ruta_fallida):
+    """Hace que el renombrado hacia 'ruta_fallida' falle como lo haría en disco."""
+    renombrar = plan._renombrar
+    def _renombrar(origen, destino):
+        if os.path.normpath(destino) == os.path.normpath(ruta_fallida):
+            raise PermissionError(13, "Permiso denegado", destino)
+        renombrar(origen, destino)
+    plan._renombrar = _renombrar
+
+def test_ciclo_que_falla_devuelve_el_apartado(tmp_path):
+    a, b, c = str(tmp_path / "a"), str(tmp_path / "b"), str(tmp_path / "c")
+    _escribir(a, "A")
+    _escribir(b, "B")
+    plan = PlanMovimientos()
+    # Intercambio a <-> b a través de un nombre intermedio: en disco es un ciclo
+    plan.mover(a, c)
+    plan.mover(b, a)
+    plan.mover(c, b)
+    # El último paso del ciclo (el archivo apartado hacia su destino) falla
+    _fallar_hacia(plan, a)
+
+    assert plan.aplicar() == 2
+    assert sorted(os.listdir(tmp_path)) == ["a", "b"]
+    assert _leer(a) == "A" and _leer(b) == "B"
+    assert plan.pendientes() == 0
+
+def test_fallo_del_que_bloquea_no_descarta_al_otro(tmp_path):
+    c, x, y = str(tmp_path / "c"), str(tmp_path / "x"), str(tmp_path / "y")
+    _escribir(c, "C")
+    _escribir(x, "X")
+    plan = PlanMovimientos()
+    # 'c' quiere ir a 'x', que primero debe dejar libre su ocupante (que no puede moverse)
+    plan.mover(x, y)
+    plan.mover(c, x)
+    _fallar_hacia(plan, y)
+    errores = []
+
+    assert plan.aplicar(lambda m, nivel="info": errores.append(m) if nivel == "error" else None) == 2
+    # Nadie se sobrescribe: ambos siguen donde estaban y los dos fallos quedan registrados
+    assert _leer(c) == "C" and _leer(x) == "X" and not os.path.exists(y)
+    assert any(str(tmp_path / "x") in m for m in errores) and any(str(tmp_path / "c") in m for m in errores)
+    assert plan.pendientes() == 0
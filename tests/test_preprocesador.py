@@ -0,0 +1,44 @@
+import os
+import pytest
+from funciones import preprocesador, manifiesto, sondeo
+
+Image = pytest.importorskip('PIL.Image')
+
+def _sin_log(mensaje, nivel="info", exc_info=False):
+    pass
+
+@pytest.fixture
+def memoria_minima(tmp_path, monkeypatch):
+    # Con 1 MB de límite, un PNG RGBA de 1000x1000 (~7 MB al decodificar y pasar a RGB) no cabe
+    monkeypatch.setattr(preprocesador, 'MEMORIA_MAXIMA_IMAGEN_MB', 1)
+    monkeypatch.setattr(manifiesto, 'obtener_ruta_manifiesto', lambda: str(tmp_path / 'optimizados.db'))
+    monkeypatch.setattr(sondeo, 'obtener_ruta_cache_sondeos', lambda: str(tmp_path / 'sondeos.db'))
+
+def _png_grande(ruta):
+    Image.new('RGBA', (1000, 1000), (10, 20, 30, 255)).save(ruta, format='PNG')
+
+def test_imagen_que_no_cabe_en_memoria_se_deja_como_esta(tmp_path, memoria_minima):
+    ruta = str(tmp_path / 'grande.png')
+    _png_grande(ruta)
+    antes = open(ruta, 'rb').read()
+
+    assert preprocesador.optimizar_imagen(ruta) is False
+
+    assert open(ruta, 'rb').read() == antes
+    assert os.listdir(tmp_path) == ['grande.png']
+
+def test_preprocesar_no_manda_a_fallos_la_imagen_demasiado_grande(tmp_path, memoria_minima):
+    carpeta = tmp_path / 'carpeta'
+    carpeta.mkdir()
+    _png_grande(str(carpeta / 'grande.png'))
+    Image.new('RGB', (50, 50), 'red').save(carpeta / 'normal.jpg')
+    niveles = []
+
+    res = preprocesador.preprocesar_contenido(str(carpeta), lambda m, nivel="info", exc_info=False: niveles.append(nivel),
+                                              procesos=1)
+
+    assert res['archivos_optimizados'] == 1
+    assert res['imagenes_omitidas_por_memoria'] == 1
+    assert (carpeta / 'grande.png').exists()
+    assert not (carpeta / 'fallos').exists()
+    assert 'error' not in niveles
@@ -0,0 +1,81 @@
+import os
+from funciones.referencia import indexar_referencia, deduplicar_contra_referencia
+from funciones import diario
+from funciones.simulacion import simular, ejecutar_plan
+
+def _sin_log(mensaje, nivel="info", exc_info=False):
+    pass
+
+def _escribir(ruta, contenido):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+
+def _biblioteca(tmp_path):
+    lib = tmp_path / 'lib'
+    _escribir(str(lib / 'a.bin'), b'contenido a')
+    _escribir(str(lib / 'sub' / 'b.bin'), b'contenido b')
+    _escribir(str(lib / 'nuevo' / 'x.bin'), b'contenido x')
+    indice = str(tmp_path / 'indice.db')
+    assert indexar_referencia(str(lib), _sin_log, ruta_indice=indice)['total_en_indice'] == 3
+    return lib, indice
+
+def _archivos(ruta):
+    return sorted(os.path.relpath(os.path.join(r, f), ruta) for r, _, fs in os.walk(ruta) for f in fs)
+
+def test_carpeta_dentro_de_la_biblioteca_se_rechaza(tmp_path):
+    lib, indice = _biblioteca(tmp_path)
+
+    res = deduplicar_contra_referencia(str(lib / 'nuevo'), _sin_log, ruta_indice=indice)
+
+    assert 'error' in res
+    assert _archivos(lib) == ['a.bin', os.path.join('nuevo', 'x.bin'), os.path.join('sub', 'b.bin')]
+
+def test_la_propia_biblioteca_se_rechaza(tmp_path):
+    lib, indice = _biblioteca(tmp_path)
+
+    res = deduplicar_contra_referencia(str(lib), _sin_log, ruta_indice=indice)
+
+    assert 'error' in res
+    assert not (lib / 'basura').exists()
+
+def test_solo_descarta_si_la_copia_de_referencia_sigue_igual(tmp_path):
+    lib, indice = _biblioteca(tmp_path)
+    entrante = tmp_path / 'entrante'
+    _escribir(str(entrante / 'a.bin'), b'contenido a')
+    _escribir(str(entrante / 'b.bin'), b'contenido b')
+    _escribir(str(entrante / 'otro.bin'), b'contenido o')
+    # La copia de b en la biblioteca cambió después de indexar
+    _escribir(str(lib / 'sub' / 'b.bin'), b'contenido B')
+
+    res = deduplicar_contra_referencia(str(entrante), _sin_log, ruta_indice=indice)
+
+    assert res['duplicados_en_referencia'] == 1
+    assert _archivos(entrante) == sorted(['b.bin', os.path.join('basura', 'a.bin'), 'otro.bin'])
+
+def test_simulacion_no_toca_el_disco_y_el_plan_mueve_igual(tmp_path):
+    lib, indice = _biblioteca(tmp_path)
+    entrante = tmp_path / 'entrante'
+    _escribir(str(entrante / 'a.bin'), b'contenido a')
+    _escribir(str(entrante / 'otro.bin'), b'contenido o')
+
+    acciones = list(simular(deduplicar_contra_referencia, str(entrante), _sin_log, ruta_indice=indice))
+
+    assert _archivos(entrante) == ['a.bin', 'otro.bin']
+    assert acciones[-1]['resultado']['duplicados_en_referencia'] == 1
+    ejecutar_plan(acciones[:-1], _sin_log)
+    assert _archivos(entrante) == sorted([os.path.join('basura', 'a.bin'), 'otro.bin'])
+
+def test_con_diario_se_puede_deshacer(tmp_path, monkeypatch):
+    lib, indice = _biblioteca(tmp_path)
+    entrante = tmp_path / 'entrante'
+    _escribir(str(entrante / 'a.bin'), b'contenido a')
+    _escribir(str(entrante / 'otro.bin'), b'contenido o')
+    monkeypatch.setattr(diario, 'obtener_ruta_diario', lambda ruta: str(tmp_path / 'diarios' / 'entrante.jsonl'))
+
+    res = diario.ejecutar_con_diario(deduplicar_contra_referencia, str(entrante), _sin_log, str(lib), ruta_indice=indice)
+
+    assert res['duplicados_en_referencia'] == 1
+    assert _archivos(entrante) == sorted([os.path.join('basura', 'a.bin'), 'otro.bin'])
+    diario.deshacer_diario(str(entrante), _sin_log)
+    assert _archivos(entrante) == ['a.bin', 'otro.bin']
@@ -0,0 +1,42 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from funciones import similares
+
+def _sin_log(mensaje, nivel="info", exc_info=False):
+    pass
+
+def _agrupar(tmp_path, monkeypatch, imagenes, umbral=similares.UMBRAL_SIMILITUD):
+    """imagenes: nombre -> (dhash, píxeles). Sin decodificar: el hash se toma del diccionario."""
+    for nombre in imagenes:
+        (tmp_path / nombre).write_bytes(b'x')
+    datos = {str(tmp_path / nombre): valor for nombre, valor in imagenes.items()}
+    monkeypatch.setattr(similares, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(similares, 'calcular_dhash', lambda ruta: (datos[ruta][0], datos[ruta][1], 1, None))
+    grupos = similares.agrupar_imagenes_similares(str(tmp_path), _sin_log, umbral)
+    return [[os.path.basename(p) for p in g] for g in grupos]
+
+def test_no_encadena_imagenes_lejanas_de_la_mejor_copia(tmp_path, monkeypatch):
+    # a~b y b~c (4 bits), pero a y c están a 8 bits: c no es "la misma foto" que a
+    grupos = _agrupar(tmp_path, monkeypatch, {
+        'a.jpg': (0b0000_0000, 4000),
+        'b.jpg': (0b0000_1111, 2000),
+        'c.jpg': (0b1111_1111, 1000),
+    })
+    assert grupos == [['a.jpg', 'b.jpg']]
+
+def test_cada_grupo_cerca_de_su_mejor_copia(tmp_path, monkeypatch):
+    imagenes = {
+        'mejor.jpg': (0b0000_0000, 4000),
+        'copia_1.jpg': (0b0000_0111, 3000),
+        'copia_2.jpg': (0b0011_0000, 2000),
+        'lejana.jpg': (0b0011_0111, 5000),
+        'otra.png': ((1 << 40) - 1, 100),
+    }
+    grupos = _agrupar(tmp_path, monkeypatch, imagenes, umbral=3)
+
+    # 'lejana' tiene más píxeles y se queda con las copias; 'mejor' está a 5 bits de ella y no se descarta
+    assert grupos == [['lejana.jpg', 'copia_1.jpg', 'copia_2.jpg']]
+    for grupo in grupos:
+        conservada = imagenes[grupo[0]]
+        assert all((imagenes[p][0] ^ conservada[0]).bit_count() <= 3 for p in grupo)
+        assert all(imagenes[p][1] <= conservada[1] for p in grupo)
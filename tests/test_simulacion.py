@@ -0,0 +1,53 @@
+import os
+import pytest
+from funciones import cache_hashes
+from funciones.duplicados import eliminar_duplicados
+from funciones.simulacion import simular, guardar_plan, ejecutar_plan
+
+def _sin_log(mensaje, nivel="info", exc_info=False):
+    pass
+
+@pytest.fixture(autouse=True)
+def cache_propio(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_hashes, 'obtener_ruta_cache_hashes', lambda: str(tmp_path / 'hashes.db'))
+
+def _escribir(ruta, contenido):
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+
+def _planificar_enlaces(ruta, tmp_path):
+    for nombre in ('a.bin', 'b.bin', 'c.bin'):
+        _escribir(os.path.join(ruta, nombre), b'mismo contenido')
+    plan = str(tmp_path / 'plan.jsonl')
+    guardar_plan(simular(lambda r, **k: eliminar_duplicados(r, _sin_log, True, accion='enlazar', **k), ruta), plan)
+    return plan
+
+def test_enlazar_no_pisa_un_duplicado_editado_tras_simular(tmp_path):
+    ruta = tmp_path / 'carpeta'
+    ruta.mkdir()
+    plan = _planificar_enlaces(str(ruta), tmp_path)
+    # Mismo tamaño, otro contenido y otra fecha: obliga a volver a calcular el hash
+    c = str(ruta / 'c.bin')
+    _escribir(c, b'datos   nuevos!')
+    st = os.stat(c)
+    os.utime(c, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    avisos = []
+
+    ejecutar_plan(plan, lambda m, nivel="info", exc_info=False: avisos.append(nivel))
+
+    assert (ruta / 'c.bin').read_bytes() == b'datos   nuevos!'
+    assert not os.path.samefile(ruta / 'a.bin', c)
+    assert os.path.samefile(ruta / 'a.bin', ruta / 'b.bin')
+    assert 'warning' in avisos
+
+def test_enlazar_no_pisa_si_cambia_el_original(tmp_path):
+    ruta = tmp_path / 'carpeta'
+    ruta.mkdir()
+    plan = _planificar_enlaces(str(ruta), tmp_path)
+    _escribir(str(ruta / 'a.bin'), b'original editado y mas largo')
+
+    ejecutar_plan(plan, _sin_log)
+
+    assert (ruta / 'a.bin').read_bytes() == b'original editado y mas largo'
+    assert (ruta / 'b.bin').read_bytes() == (ruta / 'c.bin').read_bytes() == b'mismo contenido'
+    assert not os.path.samefile(ruta / 'a.bin', ruta / 'b.bin')
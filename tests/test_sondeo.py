@@ -0,0 +1,37 @@
+import json
+import subprocess
+from funciones import sondeo
+
+def _salida_ffprobe(*tipos_extra):
+    streams = [
+        {'codec_type': 'video', 'codec_name': 'h264', 'width': 1920, 'height': 1080,
+         'avg_frame_rate': '30/1', 'bit_rate': '4000000'},
+        {'codec_type': 'audio', 'codec_name': 'aac'},
+    ]
+    streams += [{'codec_type': tipo, 'codec_name': 'subrip' if tipo == 'subtitle' else 'ttf'} for tipo in tipos_extra]
+    return json.dumps({'format': {'format_name': 'matroska,webm', 'duration': '60.0', 'bit_rate': '4200000'},
+                       'streams': streams})
+
+def _sondear_con(monkeypatch, salida):
+    monkeypatch.setattr(sondeo, 'resolver_comando', lambda cmd: cmd)
+    monkeypatch.setattr(subprocess, 'run',
+                        lambda cmd, **kw: subprocess.CompletedProcess(cmd, 0, stdout=salida, stderr=''))
+    return sondeo._ejecutar_ffprobe('video.mkv')
+
+def test_mkv_h264_aac_sin_otros_streams_se_remuxea(monkeypatch):
+    info = _sondear_con(monkeypatch, _salida_ffprobe())
+    assert info['otros'] == []
+    assert sondeo.decidir_video('video.mkv', info) == ('remuxear', 'contenedor')
+
+def test_mkv_con_subtitulos_se_recodifica(monkeypatch):
+    info = _sondear_con(monkeypatch, _salida_ffprobe('subtitle', 'attachment'))
+    assert info['otros'] == ['attachment', 'subtitle']
+    assert sondeo.decidir_video('video.mkv', info) == ('recodificar', 'otros_streams')
+
+def test_mp4_que_ya_cumple_se_salta_aunque_tenga_subtitulos(monkeypatch):
+    info = _sondear_con(monkeypatch, _salida_ffprobe('subtitle'))
+    assert sondeo.decidir_video('video.mp4', info) == ('saltar', 'ya_optimizado')
+
+def test_sondeo_sin_dato_de_otros_streams_no_se_remuxea():
+    info = {'video': 'h264', 'audio': 'aac', 'bitrate': 1000000, 'ancho': 1280, 'alto': 720, 'fps': 30}
+    assert sondeo.decidir_video('video.mkv', info)[0] == 'recodificar'